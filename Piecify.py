@@ -1,6 +1,5 @@
 import sys
 import gpxpy
-from math import sin, cos, sqrt, atan2, radians
 import datetime
 from datetime import datetime as dt
 import tkinter as tk
@@ -9,16 +8,7 @@ import tkinter.font as tkFont
 import subprocess
 import csv
 
-def get_distance(lat1, lon1, lat2, lon2):
-    R = 6371000
-
-    dlon = lon2 - lon1
-    dlat = lat2- lat1
-
-    a = sin(dlat / 2)**2 + cos(lat1) * cos(lat2) * sin(dlon / 2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    distance = R * c
-    return distance
+from track import Track
 
 def get_points(file_name):
     #Attempt to use the smoothed points  entered, otherwise use default
@@ -40,35 +30,21 @@ def get_points(file_name):
         #If it's not a gpx file then it must be a SpeedCoach CSV - right?
         points = parse_speedcoach(file_name)
 
-    total_distance = 0
-
-    for point in points:
-
-        if point['pt_no'] == 0:
+    # Distances and paces for every point in one vectorised pass (see track.py);
+    # the rest of the tool still works on the per-point dicts.
+    track = Track([point['time'].timestamp() for point in points],
+                  [point['latitude'] for point in points],
+                  [point['longitude'] for point in points],
+                  smooth_points=Smooth_Points)
 
+    for i, point in enumerate(points):
+        if i == 0:
             point['distance'] = 0
-
-        else:
-
-            distance = get_distance(radians(point['latitude']),radians(point['longitude']),radians(prev_point['latitude']),radians(prev_point['longitude']))
-            if distance == 0:
-                distance = 0.00001
-
-            point['distance'] = distance
-
-            total_distance = total_distance + distance
-            point['total_distance'] = total_distance
-
-            point['pace'] = (point['time'] - prev_point['time']) * 500 / distance
-
-            if point['pt_no'] >= Smooth_Points :
-                point['smoothed'] = (point['time'] - points[point['pt_no']-Smooth_Points]['time']) * 500 / (total_distance - points[point['pt_no']-Smooth_Points]['total_distance'])
-
-            else :
-                point['smoothed'] = point['pace']
-
-
-        prev_point = point
+            continue
+        point['distance'] = float(track.dist[i])
+        point['total_distance'] = float(track.cum[i])
+        point['pace'] = datetime.timedelta(seconds=float(track.pace[i]))
+        point['smoothed'] = datetime.timedelta(seconds=float(track.smoothed[i]))
 
     return points
     
@@ -0,0 +1,377 @@
+# activity.py
+"""
+One FIT/TCX file decoded once and shared by the importers.
+
+    activity = decode_activity(key, buf)
+    process_fit_sessions.parse_activity(activity, rest_hr, max_hr)   # session + HR zones
+    process_results.parse_activity(activity)                         # GPS track
+
+Decoding walks the file once and keeps only what the importers read: the
+session summary (sport, start, duration, distance), the heart-rate series and
+the position series, as flat arrays. The bytes and the fitparse objects are
+dropped. FIT files go through fit_decoder's fast path, which reads only those
+fields; files it doesn't handle fall back to fitparse. TCX files are streamed
+(tcx_reader), never held as a whole ElementTree.
+
+Decoded activities are cached by (S3 key, ETag) – a bounded in-memory LRU in
+front of a directory of .npz files – so a later stage or a reprocess skips
+fitparse, and with a listing ETag in hand skips the download too:
+
+    activity = ACTIVITY_CACHE.get(key, etag)
+    if activity is None:
+        activity = ACTIVITY_CACHE.decode(key, etag, buf)
+
+ACTIVITY_CACHE_DIR ('' disables the disk cache), ACTIVITY_CACHE_ITEMS and
+ACTIVITY_CACHE_MAX_MB size it.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import numpy as np
+from fitparse import FitFile
+
+import fit_decoder
+from tcx_reader import peek_start_time as _tcx_peek_start_time, read_tcx
+from track import Track, SMOOTH_POINTS
+
+logger = logging.getLogger(__name__)
+
+# Bump when decoding changes, so stale cache files are never read.
+DECODER_VERSION = 1
+
+SEMICIRCLES_TO_DEGREES = 180.0 / 2**31
+
+CACHE_DIR       = os.getenv("ACTIVITY_CACHE_DIR",
+                            os.path.join(os.path.expanduser("~"), ".cache", "crewoptic", "activities"))
+CACHE_ITEMS     = int(os.getenv("ACTIVITY_CACHE_ITEMS", "32"))
+CACHE_MAX_BYTES = int(float(os.getenv("ACTIVITY_CACHE_MAX_MB", "512")) * 2**20)
+
+_ARRAYS = ("hr_t", "hr", "pos_t", "lat", "lon")
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _tz_offset(tz) -> Optional[int]:
+    """Seconds east of UTC for a fixed-offset tzinfo (None for naive)."""
+    return None if tz is None else int(tz.utcoffset(None).total_seconds())
+
+def _tz(offset: Optional[int]):
+    return None if offset is None else timezone(timedelta(seconds=offset))
+
+def _epoch(ts: datetime) -> float:
+    """Seconds since the epoch; naive timestamps are UTC (as FIT's are)."""
+    return (ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)).timestamp()
+
+def _from_epoch(t: float, tz) -> datetime:
+    """Inverse of _epoch: aware in `tz`, or naive UTC if tz is None."""
+    when = _EPOCH_UTC + timedelta(microseconds=int(round(t * 1e6)))
+    return when.replace(tzinfo=None) if tz is None else when.astimezone(tz)
+
+class DecodedActivity:
+    """
+    What the importers need from one file (see module docstring). Summary
+    fields are None where the file doesn't say; the HR and position series are
+    epoch-second / value arrays, with the timezone the file wrote them in.
+    """
+
+    __slots__ = ("key", "kind", "sport", "sub_sport", "start_time", "duration_s", "distance_m",
+                 "has_summary", "hr_t", "hr", "hr_tz", "pos_t", "lat", "lon", "pos_tz")
+
+    def __init__(self, key: str, kind: str, **fields):
+        self.key = key
+        self.kind = kind              # "fit" or "tcx"
+        for name in self.__slots__[2:]:
+            setattr(self, name, fields.get(name))
+
+    def hr_series(self) -> list:
+        """[(timestamp, bpm)] as the HR parsers used to build it."""
+        return [(_from_epoch(t, self.hr_tz), int(bpm)) for t, bpm in zip(self.hr_t.tolist(), self.hr.tolist())]
+
+    def hr_time(self, i: int) -> datetime:
+        """Timestamp of HR sample i, as hr_series() gives it."""
+        return _from_epoch(float(self.hr_t[i]), self.hr_tz)
+
+    def track(self, smooth_points: int = SMOOTH_POINTS) -> Track:
+        return Track(self.pos_t, self.lat, self.lon, tz=self.pos_tz or timezone.utc,
+                     smooth_points=smooth_points)
+
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in _ARRAYS)
+
+    # ── (de)serialisation for the disk cache ──
+    def _meta(self) -> dict:
+        return {
+            "version": DECODER_VERSION, "key": self.key, "kind": self.kind,
+            "sport": self.sport, "sub_sport": self.sub_sport,
+            "start_time": self.start_time.isoformat() if self.start_time else None,
+            "duration_s": self.duration_s, "distance_m": self.distance_m,
+            "has_summary": self.has_summary,
+            "hr_tz": _tz_offset(self.hr_tz), "pos_tz": _tz_offset(self.pos_tz),
+        }
+
+    def save(self, path: str) -> None:
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(self._meta())),
+                     **{name: getattr(self, name) for name in _ARRAYS})
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["DecodedActivity"]:
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != DECODER_VERSION:
+                return None
+            arrays = {name: data[name] for name in _ARRAYS}
+        start = meta["start_time"]
+        return cls(meta["key"], meta["kind"], sport=meta["sport"], sub_sport=meta["sub_sport"],
+                   start_time=datetime.fromisoformat(start) if start else None,
+                   duration_s=meta["duration_s"], distance_m=meta["distance_m"],
+                   has_summary=meta["has_summary"],
+                   hr_tz=_tz(meta["hr_tz"]), pos_tz=_tz(meta["pos_tz"]), **arrays)
+
+def activity_kind(key: str):
+    """"fit", "tcx" or None for an S3 key / file name."""
+    low = key.lower()
+    if low.endswith(".fit"):
+        return "fit"
+    if low.endswith(".tcx"):
+        return "tcx"
+    return None
+
+class _Series:
+    """Growable (epoch seconds, value...) columns while decoding."""
+
+    def __init__(self, *columns):
+        self.cols = {name: array("d") for name in columns}
+        self.tz = None
+        self.first = True
+
+    def add(self, ts: datetime, *values) -> None:
+        if self.first:
+            self.tz = ts.tzinfo
+            self.first = False
+        cols = iter(self.cols.values())
+        next(cols).append(_epoch(ts))
+        for col, value in zip(cols, values):
+            col.append(value)
+
+    def arrays(self):
+        return [np.frombuffer(col, dtype=np.float64) if len(col) else np.zeros(0) for col in self.cols.values()]
+
+def _session_summary(d: Optional[dict]):
+    """(sport, sub_sport, duration_s, distance_m, start_time) from the first session's fields."""
+    sport = "unknown"; sub = None; dur_s = 0; dist_m = 0; dt: Optional[datetime] = None
+    if d is not None:
+        sport = str(d.get("sport", sport)).lower()
+        sub   = (str(d.get("sub_sport", "")).lower() or None)
+        dur_s = int(d.get("total_elapsed_time") or d.get("total_timer_time") or 0)
+        dist_m= int(d.get("total_distance") or 0)
+        dt    = d.get("start_time", dt)
+    return sport, sub, dur_s, dist_m, dt
+
+def _fit_activity(key: str, summary, dt, hr_t, hr_v, pos_t, lat, lon) -> DecodedActivity:
+    sport, sub, dur_s, dist_m, _ = summary
+    # FIT timestamps are UTC; the HR series keeps them naive as fitparse gives them
+    return DecodedActivity(key, "fit", sport=sport, sub_sport=sub, start_time=dt, duration_s=dur_s,
+                           distance_m=dist_m, has_summary=True,
+                           hr_t=hr_t, hr=hr_v, hr_tz=None, pos_t=pos_t, lat=lat, lon=lon, pos_tz=timezone.utc)
+
+def _decode_fit_fitparse(key: str, buf: bytes) -> DecodedActivity:
+    fit = FitFile(io.BytesIO(buf)); fit.parse()
+    session = None
+    for msg in fit.get_messages("session"):
+        session = {f.name: f.value for f in msg}
+        break
+    summary = _session_summary(session)
+    dt = summary[4]
+
+    if not dt:
+        for msg in fit.get_messages("activity"):
+            dt = msg.get_value("timestamp"); break
+
+    hr = _Series("t", "hr")
+    pos = _Series("t", "lat", "lon")
+    for rec in fit.get_messages("record"):
+        ts = rec.get_value("timestamp")
+        if ts is None:
+            continue
+        bpm = rec.get_value("heart_rate")
+        if bpm is not None:
+            hr.add(ts, bpm)
+        lat_semis = rec.get_value("position_lat")
+        lon_semis = rec.get_value("position_long")
+        if lat_semis is not None and lon_semis is not None:
+            pos.add(ts, lat_semis * SEMICIRCLES_TO_DEGREES, lon_semis * SEMICIRCLES_TO_DEGREES)
+
+    return _fit_activity(key, summary, dt, *hr.arrays(), *pos.arrays())
+
+def _column(values: array) -> np.ndarray:
+    return np.frombuffer(values, dtype=np.float64) if len(values) else np.zeros(0)
+
+def _decode_fit(key: str, buf: bytes) -> DecodedActivity:
+    """fit_decoder's fast path, or fitparse for the files it declines."""
+    try:
+        fit = fit_decoder.decode(buf)
+    except fit_decoder.FallbackRequired as exc:
+        logger.debug("%s: decoding with fitparse (%s)", key, exc)
+        return _decode_fit_fitparse(key, buf)
+
+    summary = _session_summary(fit.session)
+    dt = summary[4] or fit.activity_time
+    return _fit_activity(key, summary, dt, _column(fit.hr_t), _column(fit.hr), _column(fit.pos_t),
+                         _column(fit.lat) * SEMICIRCLES_TO_DEGREES, _column(fit.lon) * SEMICIRCLES_TO_DEGREES)
+
+def _decode_tcx(key: str, buf: bytes) -> DecodedActivity:
+    data = read_tcx(buf)
+    has_hr = ~np.isnan(data.hr)
+    has_pos = ~np.isnan(data.lat)
+    # DistanceMeters of the last heart-rate point that has one
+    dist = data.dist[has_hr]
+    dist = dist[~np.isnan(dist)]
+    dist_m = int(dist[-1]) if len(dist) else 0
+    return DecodedActivity(key, "tcx", sport=data.sport, sub_sport=None, start_time=data.start_time,
+                           duration_s=None, distance_m=dist_m, has_summary=data.has_activity,
+                           hr_t=data.t[has_hr], hr=data.hr[has_hr], hr_tz=data.hr_tz,
+                           pos_t=data.t[has_pos], lat=data.lat[has_pos], lon=data.lon[has_pos],
+                           pos_tz=data.pos_tz)
+
+def decode_activity(key: str, buf: bytes) -> DecodedActivity:
+    kind = activity_kind(key)
+    if kind == "fit":
+        return _decode_fit(key, buf)
+    if kind == "tcx":
+        return _decode_tcx(key, buf)
+    raise ValueError(f"Unsupported file type for key: {key}")
+
+def peek_start_time(key: str, head: bytes) -> Optional[datetime]:
+    """
+    When a file's activity started, from its first few KB: FIT file_id.time_created
+    (naive UTC) or the TCX Activity <Id>. None if those bytes don't say.
+    """
+    kind = activity_kind(key)
+    if kind == "fit":
+        return fit_decoder.time_created(head)
+    if kind == "tcx":
+        return _tcx_peek_start_time(head)
+    return None
+
+class ActivityCache:
+    """
+    Decoded activities by (key, ETag): an LRU of up to max_items in memory,
+    backed by one .npz per activity under `directory` (None = memory only).
+    Thread-safe; a corrupt or outdated cache file is treated as a miss.
+    """
+
+    def __init__(self, directory: Optional[str] = CACHE_DIR, max_items: int = CACHE_ITEMS,
+                 max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory or None
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = 0
+
+    def _cache_key(self, key: str, etag: str) -> str:
+        return key + "\0" + etag.strip('"')
+
+    def _path(self, cache_key: str) -> str:
+        digest = hashlib.sha1(f"{DECODER_VERSION}\0{cache_key}".encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}.npz")
+
+    def _remember(self, cache_key: str, activity: DecodedActivity) -> None:
+        with self._lock:
+            self._items[cache_key] = activity
+            self._items.move_to_end(cache_key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def get(self, key: str, etag: Optional[str]) -> Optional[DecodedActivity]:
+        if not etag:
+            return None
+        cache_key = self._cache_key(key, etag)
+        with self._lock:
+            activity = self._items.get(cache_key)
+            if activity is not None:
+                self._items.move_to_end(cache_key)
+                self.hits += 1
+                return activity
+        if self.directory:
+            path = self._path(cache_key)
+            try:
+                activity = DecodedActivity.load(path)
+            except FileNotFoundError:
+                activity = None
+            except Exception as exc:
+                logger.warning("activity cache: ignoring unreadable %s (%s)", path, exc)
+                activity = None
+            if activity is not None:
+                self.disk_hits += 1
+                self._remember(cache_key, activity)
+                return activity
+        self.misses += 1
+        return None
+
+    def contains(self, key: str, etag: Optional[str]) -> bool:
+        """Whether get() should find this version without loading it – for deciding what to download."""
+        if not etag:
+            return False
+        cache_key = self._cache_key(key, etag)
+        with self._lock:
+            if cache_key in self._items:
+                return True
+        return bool(self.directory) and os.path.exists(self._path(cache_key))
+
+    def put(self, key: str, etag: Optional[str], activity: DecodedActivity) -> None:
+        if not etag:
+            return
+        cache_key = self._cache_key(key, etag)
+        self._remember(cache_key, activity)
+        if self.directory:
+            path = self._path(cache_key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                activity.save(path)
+            except OSError as exc:
+                logger.warning("activity cache: could not write %s (%s)", path, exc)
+
+    def decode(self, key: str, etag: Optional[str], buf: bytes) -> DecodedActivity:
+        """Cached activity for this version of the file, else decode `buf` and cache it."""
+        activity = self.get(key, etag)
+        if activity is None:
+            activity = decode_activity(key, buf)
+            self.put(key, etag, activity)
+        return activity
+
+    def prune(self) -> int:
+        """Delete the least recently written cache files beyond max_bytes; returns files removed."""
+        if not self.directory or not os.path.isdir(self.directory):
+            return 0
+        files = []
+        for dirpath, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size; removed += 1
+        return removed
+
+ACTIVITY_CACHE = ActivityCache()
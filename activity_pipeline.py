@@ -0,0 +1,141 @@
+# activity_pipeline.py
+"""
+In-process import of newly fetched FIT/TCX files.
+
+get_fitfiles.py used to run process_fit_sessions.py and then process_results.py
+as separate processes for every new file; each re-imported everything,
+re-downloaded the object it had just been handed, opened its own DB connection
+and parsed the file again. Here the bytes already in memory are decoded once
+(activity.decode_activity) and the same decoded activity feeds both stages:
+
+    ctx = PipelineContext.load(tenant_key)            # inside tenant_context(...)
+    timings = import_athlete_files(ctx, aid, [(key, buf, etag), ...])
+    print(timings.format())
+
+An athlete's files share one connection and one transaction, committed at the
+end. Their sessions and both stages' ledger entries are queued as they go and
+written together just before the commit (process_fit_sessions.SessionBatch).
+"""
+import logging
+import threading
+import time
+from typing import Optional
+
+import process_fit_sessions
+import process_results
+from activity import ACTIVITY_CACHE
+from db import get_db_connection, current_tenant_key
+from import_ledger import ImportLedger, ensure_ledger_table, STAGE_SESSIONS, STAGE_RESULTS, ERROR
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("decode", "sessions", "results", "commit")
+
+class StageTimings:
+    """Seconds spent per pipeline stage, over however many files."""
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.files = 0
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.seconds[stage] += seconds
+
+    def merge(self, other: "StageTimings") -> None:
+        with self._lock:
+            for stage, seconds in other.seconds.items():
+                self.seconds[stage] += seconds
+            self.files += other.files
+
+    def format(self) -> str:
+        parts = [f"{stage} {self.seconds[stage]:.2f}s" for stage in STAGES]
+        return f"{self.files} files: " + ", ".join(parts)
+
+class PipelineContext:
+    """Per-tenant inputs read once per run: Season_Start and the results lookups."""
+
+    __slots__ = ("tenant_key", "season_start", "lookups")
+
+    def __init__(self, tenant_key: str, season_start, lookups):
+        self.tenant_key = tenant_key
+        self.season_start = season_start
+        self.lookups = lookups
+
+    @classmethod
+    def load(cls, tenant_key: Optional[str] = None) -> "PipelineContext":
+        tenant_key = tenant_key or current_tenant_key()
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                ensure_ledger_table(cur)
+                lookups = process_results.ResultLookups.load(cur)
+            conn.commit()
+        finally:
+            conn.close()
+        return cls(tenant_key, process_fit_sessions._season_start_date(), lookups)
+
+class _Timer:
+    def __init__(self, timings: StageTimings, stage: str):
+        self.timings = timings; self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.timings.add(self.stage, time.perf_counter() - self.start)
+
+def import_athlete_files(ctx: PipelineContext, aid, files) -> StageTimings:
+    """
+    Sessions + results for one athlete's new files, given as (key, bytes, ETag).
+    A file that won't parse is logged and recorded as an error, and the rest
+    carry on; a database error rolls the whole athlete back and is raised.
+    """
+    timings = StageTimings()
+    aid = int(aid)
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            sessions = ImportLedger(cur, ctx.tenant_key, STAGE_SESSIONS, load=False, buffered=True)
+            results  = ImportLedger(cur, ctx.tenant_key, STAGE_RESULTS, load=False, buffered=True)
+            batch = None
+
+            for key, buf, etag in files:
+                timings.files += 1
+                with _Timer(timings, "decode"):
+                    try:
+                        activity = ACTIVITY_CACHE.decode(key, etag, buf)
+                    except Exception as e:
+                        logger.error("    ! File parse failed (%s): %s", key, e)
+                        activity = None
+                if activity is None:
+                    sessions.record(key, etag, ERROR)
+                    results.record(key, etag, ERROR)
+                    continue
+
+                with _Timer(timings, "sessions"):
+                    batch = batch or process_fit_sessions.SessionBatch(cur, aid)
+                    outcome, day = process_fit_sessions.import_activity(cur, aid, activity, ctx.season_start,
+                                                                        batch)
+                    sessions.record(key, etag, outcome, day)
+
+                with _Timer(timings, "results"):
+                    outcome, day = process_results.match_activity(cur, aid, activity, ctx.lookups)
+                    results.record(key, etag, outcome, day)
+
+            with _Timer(timings, "sessions"):
+                if batch is not None:
+                    batch.flush()
+            with _Timer(timings, "commit"):
+                sessions.flush()
+                results.flush()
+
+        with _Timer(timings, "commit"):
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return timings
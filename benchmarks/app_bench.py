@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the main page and batch workloads, seeded from data_dump.json.
+
+The dump (plus the sessions/params derived in benchmarks/seed.py) is loaded into
+a scratch database registered as tenant "bench", then each workload is run
+--repeat times after one warm-up:
+
+  pages (Flask test client, logged in as a coach)
+    athlete_dashboard, squad_dashboard, results_view, lineup_view, sessions
+  jobs (tenant_context, no request)
+    add_elo, make_history (end to end, including its own add_elo pass)
+
+By default the database is SQLite behind benchmarks/sqlite_compat.py, so it runs
+anywhere. Point it at a real MySQL server for numbers closer to production; the
+target database is dropped and recreated, so it must not be a tenant's database.
+
+    python benchmarks/app_bench.py                          # table
+    python benchmarks/app_bench.py --json report.json       # machine-readable report
+    python benchmarks/app_bench.py --compare baseline.json  # diff against an earlier report
+    python benchmarks/app_bench.py --mysql-host localhost --mysql-user root \\
+                                   --mysql-database crewoptic_bench
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks import seed as bench_seed   # noqa: E402
+
+TENANT = "bench"
+
+def _git_revision() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+# ---------- database ----------
+def setup_sqlite(rows: dict, workdir: str) -> dict:
+    import db
+    from benchmarks import sqlite_compat
+
+    path = os.path.join(workdir, "bench.sqlite3")
+    conn = sqlite_compat.connect(database=path)
+    counts = bench_seed.seed(conn, rows, "sqlite")
+    conn.close()
+    db.connect_raw = sqlite_compat.connect
+    return {"backend": "sqlite", "db": {"host": "sqlite", "user": "bench",
+                                        "password": "bench", "database": path}, "rows": counts}
+
+def setup_mysql(rows: dict, args) -> dict:
+    import pymysql
+    from bootstrap import TENANTS
+
+    taken = {(cfg.get("db") or {}).get("database") for cfg in TENANTS.values()}
+    if args.mysql_database in taken:
+        raise SystemExit(f"Refusing to overwrite '{args.mysql_database}': it is a tenant database.")
+    cfg = {"host": args.mysql_host, "port": args.mysql_port, "user": args.mysql_user,
+           "password": args.mysql_password or "", "database": args.mysql_database}
+    conn = pymysql.connect(cursorclass=pymysql.cursors.DictCursor, **cfg)
+    try:
+        counts = bench_seed.seed(conn, rows, "mysql")
+    finally:
+        conn.close()
+    # _get_tenant_db_config() insists on a non-empty password
+    return {"backend": "mysql", "db": dict(cfg, password=cfg["password"] or " "), "rows": counts}
+
+# ---------- workloads ----------
+def _busiest(rows: dict, table: str, key: str) -> int:
+    counts = {}
+    for r in rows[table]:
+        counts[r[key]] = counts.get(r[key], 0) + 1
+    return max(counts, key=counts.get)
+
+def build_workloads(rows: dict) -> dict:
+    """{name: callable} – each call runs the workload once and raises on failure."""
+    import run
+    from db import tenant_context
+    from add_elo import add_elo
+    from make_history import make_history
+
+    app = run.app
+    app.secret_key = app.secret_key or "benchmark"
+    app.config["TESTING"] = True            # let view exceptions propagate
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = f"{TENANT}:{bench_seed.coach_id(rows)}"
+        sess["_fresh"] = True
+
+    crew_outing = {c["Crew_ID"]: c["Outing_ID"] for c in rows["Crews"]}
+    outing_id = max(crew_outing.values(), key=list(crew_outing.values()).count)
+    athlete_id = _busiest(rows, "Sessions", "Athlete_ID")
+
+    def page(path):
+        def fetch():
+            resp = client.get(f"/{TENANT}{path}")
+            if resp.status_code != 200:
+                raise RuntimeError(f"GET {path} -> {resp.status_code}")
+            resp.close()
+        return fetch
+
+    def job(fn):
+        def call():
+            with tenant_context(None, TENANT):
+                fn()
+        return call
+
+    return {
+        "athlete_dashboard": page(f"/athlete_dash?athlete_id={athlete_id}"),
+        "squad_dashboard":   page("/squad_dash"),
+        "results_view":      page(f"/results/{outing_id}"),
+        "lineup_view":       page(f"/lineups/{outing_id}"),
+        "sessions":          page("/sessions"),
+        "add_elo":           job(add_elo),
+        "make_history":      job(make_history),
+    }
+
+def measure(fn, repeat: int) -> dict:
+    import db
+
+    fn()                                    # warm-up: imports, templates, caches
+    samples, queries, db_ms = [], [], []
+    for _ in range(repeat):
+        db.reset_query_stats(TENANT)
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+        stats = db.query_stats_summary(TENANT, limit=10**6)
+        queries.append(sum(s["count"] for s in stats))
+        db_ms.append(sum(s["total_ms"] for s in stats))
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 2),
+        "min_ms":    round(min(samples) * 1000, 2),
+        "max_ms":    round(max(samples) * 1000, 2),
+        "mean_ms":   round(statistics.fmean(samples) * 1000, 2),
+        "queries":   round(statistics.median(queries)),
+        "db_ms":     round(statistics.median(db_ms), 2),
+    }
+
+# ---------- reporting ----------
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Workloads whose median got slower than baseline by more than `tolerance`."""
+    regressions = []
+    for name, entry in report["results"].items():
+        old = (baseline.get("results") or {}).get(name) or {}
+        if "median_ms" not in entry or "median_ms" not in old or not old["median_ms"]:
+            continue
+        change = entry["median_ms"] / old["median_ms"] - 1
+        entry["baseline_median_ms"] = old["median_ms"]
+        entry["change"] = round(change, 3)
+        if change > tolerance:
+            regressions.append(name)
+    return regressions
+
+def print_table(report: dict) -> None:
+    print(f"{report['backend']} backend, {report['git_revision'] or 'unknown revision'}, "
+          f"median of {report['repeat']} runs\n")
+    for name, entry in report["results"].items():
+        if "error" in entry:
+            print(f"  {name:<18} failed: {entry['error']}")
+            continue
+        line = (f"  {name:<18} {entry['median_ms']:>9.1f} ms  (min {entry['min_ms']:.1f})"
+                f"  {entry['queries']:>5} queries  {entry['db_ms']:>8.1f} ms in DB")
+        if "change" in entry:
+            line += f"  {entry['change']:+.0%} vs {entry['baseline_median_ms']:.1f}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", metavar="WORKLOAD", help="run just these workloads")
+    parser.add_argument("--json", metavar="PATH", help="write the JSON report here ('-' for stdout)")
+    parser.add_argument("--compare", metavar="PATH", help="earlier JSON report to diff against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="with --compare, exit 1 if a median is this much slower (default 0.2)")
+    parser.add_argument("--mysql-host")
+    parser.add_argument("--mysql-port", type=int, default=3306)
+    parser.add_argument("--mysql-user", default="root")
+    parser.add_argument("--mysql-password", default=os.getenv("BENCH_MYSQL_PASSWORD"))
+    parser.add_argument("--mysql-database", default="crewoptic_bench")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's INFO logging")
+    args = parser.parse_args()
+
+    rows = bench_seed.build_rows()
+    with tempfile.TemporaryDirectory() as workdir:
+        setup = setup_mysql(rows, args) if args.mysql_host else setup_sqlite(rows, workdir)
+
+        from bootstrap import TENANTS
+        TENANTS[TENANT] = {"display_name": "Benchmark", "db": setup["db"]}
+
+        # run.py prints on import; keep stdout clean for --json -
+        with contextlib.redirect_stdout(sys.stderr):
+            workloads = build_workloads(rows)
+        if not args.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+
+        # squad_dashboard reads History, so build it once up front
+        workloads["make_history"]()
+
+        report = {
+            "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "backend": setup["backend"],
+            "repeat": args.repeat,
+            "dataset": setup["rows"],
+            "results": {},
+        }
+        for name, fn in workloads.items():
+            if args.only and name not in args.only:
+                continue
+            try:
+                report["results"][name] = measure(fn, args.repeat)
+            except Exception as exc:
+                logging.getLogger(__name__).exception("benchmark %s failed", name)
+                report["results"][name] = {"error": f"{type(exc).__name__}: {exc}"}
+
+        import db
+        db.close_pools()
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+
+    if args.json == "-":
+        print(json.dumps(report, indent=2))
+    else:
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+        print_table(report)
+        if regressions:
+            print(f"\nSlower than baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+    if regressions or any("error" in e for e in report["results"].values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+FIT decoding: fit_decoder's fast path against fitparse, on synthetic files
+(1 Hz rowing sessions in the shapes Garmin and CoxOrb units write, plus the
+oddities the fast path must hand over to fitparse) and optionally a directory
+of real files. Every file must decode to the same DecodedActivity both ways
+– or fail both ways – before any timing is reported.
+
+    python benchmarks/fit_decode_bench.py                          # synthetic corpus
+    python benchmarks/fit_decode_bench.py --corpus ~/fit-samples   # ... plus every .fit in a directory
+    python benchmarks/fit_decode_bench.py --json
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import statistics
+import struct
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np                                        # noqa: E402
+import activity                                           # noqa: E402
+import fit_decoder                                        # noqa: E402
+
+FIT_EPOCH = datetime(1989, 12, 31, tzinfo=timezone.utc).timestamp()
+SEMICIRCLE = 180.0 / 2**31
+START = datetime(2025, 5, 1, 7, tzinfo=timezone.utc)
+
+# ── a minimal FIT writer ──
+def _definition(local, mesg, fields, big, dev_fields=()):
+    e = ">" if big else "<"
+    header = 0x40 | local | (0x20 if dev_fields else 0)
+    out = bytes([header, 0, int(big)]) + struct.pack(e + "H", mesg) + bytes([len(fields)])
+    for num, size, base in fields:
+        out += bytes([num, size, base])
+    if dev_fields:
+        out += bytes([len(dev_fields)]) + b"".join(bytes(f) for f in dev_fields)
+    return out
+
+def _data(local, fmt, values, big):
+    return bytes([local]) + struct.pack((">" if big else "<") + fmt, *values)
+
+def _file(body, header_size=14, header_crc=True, corrupt=False):
+    header = struct.pack("<BBHI4s", header_size, 0x20, 2132, len(body), b".FIT")
+    if header_size == 14:
+        header += struct.pack("<H", fit_decoder.fit_crc(header) if header_crc else 0)
+    data = header + body
+    crc = fit_decoder.fit_crc(data) ^ (1 if corrupt else 0)
+    return data + struct.pack("<H", crc)
+
+def synthetic_fit(n, seed, big=False, coxorb=False, hr_every=1, gps_gap=0.0, sport=15, sub_sport=14,
+                  session=True, start_time=True, compressed=False, developer=False, corrupt=False):
+    """
+    One outing of n seconds. Garmin-style files carry file_id, extra record
+    fields (distance, speed, cadence, altitude) and a 14-byte header; CoxOrb-
+    style files a 12-byte header, bare records and no GPS in some.
+    """
+    r = random.Random(seed)
+    ts0 = int(START.timestamp() - FIT_EPOCH) + seed * 86400
+    body = b""
+    if not coxorb:
+        body += _definition(0, 0, [(0, 1, 0x00), (1, 2, 0x84), (4, 4, 0x86), (8, 20, 0x07)], big)
+        body += _data(0, "BHI20s", [4, 1, ts0, b"Forerunner 965"], big)
+    if developer:
+        body += _definition(3, 207, [(3, 1, 0x02)], big) + _data(3, "B", [0], big)
+        body += _definition(3, 206, [(0, 1, 0x02), (1, 1, 0x02), (2, 1, 0x02), (3, 8, 0x07)], big)
+        body += _data(3, "BBB8s", [0, 0, 0x02, b"rating"], big)
+    rec_fields = [(253, 4, 0x86), (0, 4, 0x85), (1, 4, 0x85), (3, 1, 0x02)]
+    rec_fmt = "IiiB"
+    if not coxorb:
+        rec_fields += [(5, 4, 0x86), (6, 2, 0x84), (4, 1, 0x02), (2, 2, 0x84), (13, 1, 0x01)]
+        rec_fmt += "IHBHb"
+    body += _definition(1, 20, rec_fields, big,
+                        dev_fields=[(0, 1, 0)] if developer else ())
+    body += _definition(2, 20, [(253, 4, 0x86), (3, 1, 0x02)], big)
+    if compressed:
+        body += _definition(3, 20, [(3, 1, 0x02)], big)
+
+    lat, lon, dist = 55.95, -3.19, 0.0
+    for i in range(n):
+        lat += r.uniform(0, 4e-5); lon += r.uniform(-1e-5, 1e-5); dist += r.uniform(3, 5)
+        hr = r.randint(90, 185) if i % hr_every == 0 else 0xFF
+        if compressed and i % 4:
+            body += bytes([0x80 | (3 << 5) | ((ts0 + i) & 0x1F), hr])
+        elif r.random() < gps_gap:
+            body += _data(2, "IB", [ts0 + i, hr], big)
+        else:
+            values = [ts0 + i, int(lat / SEMICIRCLE), int(lon / SEMICIRCLE), hr]
+            if len(rec_fields) > 4:
+                values += [int(dist * 100), r.randint(3500, 5000), r.randint(18, 40), 2500, 12]
+            body += _data(1, rec_fmt, values, big) + (b"\x00" if developer else b"")
+        if i == n // 2 and not coxorb:
+            # devices redefine local types mid-file; keep the same layout under a new one
+            body += _definition(1, 20, rec_fields[:4], big)
+            rec_fmt, rec_fields = "IiiB", rec_fields[:4]
+            developer = False
+
+    if session:
+        fields = [(254, 2, 0x84), (5, 1, 0x00), (6, 1, 0x00), (7, 4, 0x86), (8, 4, 0x86), (9, 4, 0x86)]
+        values = [0, sport, sub_sport, n * 1000 + 123, n * 1000 - 4567, int(dist * 100)]
+        if start_time:
+            fields.insert(0, (2, 4, 0x86)); values.insert(0, ts0)
+        body += _definition(4, 18, fields, big)
+        body += _data(4, "".join({1: "B", 2: "H", 4: "I"}[f[1]] for f in fields), values, big)
+    body += _definition(5, 34, [(253, 4, 0x86), (1, 2, 0x84)], big)
+    body += _data(5, "IH", [ts0 + n, 1], big)
+    return _file(body, header_size=12 if coxorb else 14, corrupt=corrupt)
+
+CORPUS = {
+    "garmin 1h":                   dict(n=3600),
+    "garmin 1h big-endian":        dict(n=3600, big=True),
+    "garmin 2h, GPS dropouts":     dict(n=7200, gps_gap=0.2),
+    "garmin, no session":          dict(n=900, session=False),
+    "garmin, no start_time":       dict(n=900, start_time=False),
+    "garmin, unknown sport":       dict(n=900, sport=200, sub_sport=0xFF),
+    "coxorb 1h":                   dict(n=3600, coxorb=True),
+    "coxorb 1h, HR every 5s":      dict(n=3600, coxorb=True, hr_every=5),
+    "coxorb, no GPS":              dict(n=1800, coxorb=True, gps_gap=1.0),
+    "compressed timestamps":       dict(n=900, compressed=True),
+    "developer fields":            dict(n=900, developer=True),
+    "bad CRC":                     dict(n=300, corrupt=True),
+}
+
+def same(a, b) -> bool:
+    for name in activity.DecodedActivity.__slots__:
+        x, y = getattr(a, name), getattr(b, name)
+        if isinstance(x, np.ndarray) or isinstance(y, np.ndarray):
+            if not np.array_equal(x, y):
+                return False
+        elif x != y or type(x) is not type(y):
+            return False
+    return True
+
+def fast_path(buf) -> bool:
+    try:
+        fit_decoder.decode(buf)
+    except fit_decoder.FallbackRequired:
+        return False
+    return True
+
+def timed(fn, buf, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn("bench.fit", buf)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+def check(label, buf):
+    """Decode both ways; SystemExit unless they agree. Returns an error string if both failed."""
+    try:
+        ref = activity._decode_fit_fitparse("bench.fit", buf)
+    except Exception as exc:
+        try:
+            activity._decode_fit("bench.fit", buf)
+        except Exception:
+            return type(exc).__name__
+        raise SystemExit(f"{label}: fitparse fails ({exc}) but the fast path decodes it")
+    if not same(activity._decode_fit("bench.fit", buf), ref):
+        raise SystemExit(f"{label}: fast path and fitparse disagree")
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="directory of .fit files to check as well")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print a JSON report")
+    args = parser.parse_args()
+
+    files = {label: synthetic_fit(seed=seed, **opts) for seed, (label, opts) in enumerate(CORPUS.items())}
+    if args.corpus:
+        for path in sorted(glob.glob(os.path.join(os.path.expanduser(args.corpus), "**", "*.fit"),
+                                     recursive=True)):
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, args.corpus)] = f.read()
+
+    report = {"repeat": args.repeat, "results": {}}
+    for label, buf in files.items():
+        entry = {"bytes": len(buf), "fast_path": fast_path(buf)}
+        error = check(label, buf)
+        if error:
+            entry["error"] = error
+        else:
+            fast_s = timed(activity._decode_fit, buf, args.repeat)
+            ref_s = timed(activity._decode_fit_fitparse, buf, args.repeat)
+            entry.update(fast_ms=round(fast_s * 1000, 2), fitparse_ms=round(ref_s * 1000, 1),
+                         speedup=round(ref_s / fast_s, 1))
+        report["results"][label] = entry
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{len(files)} files, all identical to fitparse")
+    for label, e in report["results"].items():
+        if "error" in e:
+            print(f"  {label:<32} both raise {e['error']}")
+            continue
+        path = "fast" if e["fast_path"] else "fallback"
+        print(f"  {label:<32} {path:<8} {e['fast_ms']:>8.2f} ms   fitparse {e['fitparse_ms']:>8.1f} ms"
+              f"  x{e['speedup']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Session import: process_fit_sessions.import_parallel (a process pool parsing,
+one writer) against import_sequential, on the SQLite stand-in
+(benchmarks/sqlite_compat.py) seeded by benchmarks/seed.py and a local S3
+stand-in (benchmarks/s3_local.py). Each run starts from the same database
+copy; every pool size must leave the same Sessions (IDs included), Zones and
+import ledger rows as the sequential run, so reruns stay idempotent whichever
+path imported the files.
+
+    python benchmarks/import_parallel_bench.py                   # table
+    python benchmarks/import_parallel_bench.py --athletes 12 --files 8 --workers 1,2,4
+    python benchmarks/import_parallel_bench.py --json
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# spawned pool workers inherit this: every run decodes from the bodies it downloads
+os.environ.setdefault("ACTIVITY_CACHE_DIR", "")
+
+import db                                                  # noqa: E402
+import process_fit_sessions                                # noqa: E402
+from activity import ACTIVITY_CACHE                        # noqa: E402
+from benchmarks import seed as bench_seed, sqlite_compat  # noqa: E402
+from benchmarks.fit_decode_bench import synthetic_fit      # noqa: E402
+from benchmarks.s3_local import LocalS3                    # noqa: E402
+from bootstrap import TENANTS                              # noqa: E402
+from import_ledger import ImportLedger, STAGE_SESSIONS     # noqa: E402
+from s3_index import S3Index                               # noqa: E402
+
+BUCKET = "bench-bucket"
+PREFIX = "fitfiles/bench"
+PARAMS = {"HR_Z0": 0.5, "HR_Z1": 0.6, "HR_Z2": 0.7, "HR_Z3": 0.8, "HR_Z4": 0.9, "HR_Z5": 0.95,
+          "HR_Z0_W": 0.5, "HR_Z1_W": 1, "HR_Z2_W": 1.5, "HR_Z3_W": 2, "HR_Z4_W": 3, "HR_Z5_W": 4,
+          "Water": 1, "Other": 1, "Erg": 0.9}
+
+def seed_database(path: str, athletes: int) -> list:
+    """The seed rows plus zone Params; the first `athletes` athletes get a link (and most an HR range)."""
+    conn = sqlite_compat.connect(database=path)
+    bench_seed.seed(conn, bench_seed.build_rows(), "sqlite")
+    cur = conn.cursor()
+    for param, value in PARAMS.items():
+        cur.execute("INSERT INTO Params (Param, Value) VALUES (%s, %s)", (param, str(value)))
+    cur.execute("UPDATE Athletes SET Rest_HR = 50, Max_HR = 190 WHERE Athlete_ID % 3 != 0")
+    cur.execute("ALTER TABLE Athletes ADD COLUMN DropBox TEXT")
+    cur.execute("SELECT Athlete_ID FROM Athletes ORDER BY Athlete_ID")
+    aids = [row["Athlete_ID"] for row in cur.fetchall()][:athletes]
+    cur.execute("UPDATE Athletes SET DropBox = 'x' WHERE Athlete_ID <= %s", (aids[-1],))
+    conn.commit()
+    conn.close()
+    return aids
+
+def populate(s3: LocalS3, aids: list, files: int, seconds: int) -> None:
+    """Per athlete: `files` outings (two on some days, water and erg) and one file that won't parse."""
+    for i, aid in enumerate(aids):
+        for j in range(files):
+            body = synthetic_fit(n=seconds, seed=i * files + j // 2, sub_sport=14 if j % 2 else 0)
+            s3.put_object(Bucket=BUCKET, Key=f"{PREFIX}/{aid}/{j:03d}.fit", Body=body)
+        s3.put_object(Bucket=BUCKET, Key=f"{PREFIX}/{aid}/broken.fit", Body=b"not a fit file")
+
+def snapshot(cur) -> tuple:
+    cur.execute("SELECT Session_ID, Athlete_ID, Session_Date, Activity, Duration, Distance, T2Minutes, "
+                "Comment, Source FROM Sessions WHERE Source IS NOT NULL ORDER BY Session_ID")
+    sessions = [tuple(row.values()) for row in cur.fetchall()]
+    cur.execute("SELECT * FROM Zones ORDER BY Session_ID, Zone")
+    zones = [tuple(row.values()) for row in cur.fetchall()]
+    cur.execute("SELECT S3_Key, ETag, Activity_Date, Outcome FROM Import_Ledger ORDER BY S3_Key")
+    ledger = [tuple(row.values()) for row in cur.fetchall()]
+    return sessions, zones, ledger
+
+def run(base: str, workdir: str, index: S3Index, workers: int, fetch_workers: int):
+    """One import into a fresh copy of `base`; returns (seconds, snapshot)."""
+    label = "seq" if workers == 0 else f"par{workers}"
+    path = os.path.join(workdir, f"{label}.sqlite3")
+    shutil.copy(base, path)
+    tenant = f"bench_{label}_{time.time_ns()}"         # connections are cached per tenant
+    TENANTS[tenant] = {"display_name": "Benchmark",
+                       "db": {"host": "sqlite", "user": "bench", "password": "bench", "database": path}}
+    ACTIVITY_CACHE._items.clear()
+    with db.tenant_context(None, tenant), db.pinned_params():
+        conn = db.get_db_connection()
+        cur = conn.cursor()
+        ledger = ImportLedger(cur, tenant, STAGE_SESSIONS, buffered=True)
+        start = time.perf_counter()
+        if workers:
+            process_fit_sessions.import_parallel(conn, cur, ledger, None, workers, None, index, fetch_workers)
+        else:
+            process_fit_sessions.import_sequential(cur, ledger, None, index, fetch_workers)
+            conn.commit()
+        seconds = time.perf_counter() - start
+        return seconds, snapshot(cur)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--athletes", type=int, default=8)
+    parser.add_argument("--files", type=int, default=6, help="activity files per athlete")
+    parser.add_argument("--seconds", type=int, default=3600, help="length of each synthetic session")
+    parser.add_argument("--workers", default="1,2,4", help="pool sizes to try")
+    parser.add_argument("--fetch-workers", type=int, default=4)
+    parser.add_argument("--json", action="store_true", help="print a JSON report")
+    parser.add_argument("--verbose", action="store_true", help="keep the importer's logging")
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.CRITICAL)     # the broken files log errors on purpose
+
+    report = {"athletes": args.athletes, "files_per_athlete": args.files, "results": {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        base = os.path.join(workdir, "base.sqlite3")
+        aids = seed_database(base, args.athletes)
+        db.connect_raw = sqlite_compat.connect
+        s3 = LocalS3(os.path.join(workdir, "s3"))
+        populate(s3, aids, args.files, args.seconds)
+        process_fit_sessions.configure_storage(BUCKET, PREFIX, s3)
+        index = S3Index(BUCKET, PREFIX, s3)
+        index.refresh()
+
+        seconds, expected = run(base, workdir, index, 0, args.fetch_workers)
+        report["results"]["sequential"] = round(seconds, 2)
+        report["sessions"], report["zones"], report["ledger"] = (len(part) for part in expected)
+        for workers in (int(w) for w in args.workers.split(",")):
+            seconds, got = run(base, workdir, index, workers, args.fetch_workers)
+            for name, a, b in zip(("Sessions", "Zones", "ledger"), expected, got):
+                if a != b:
+                    raise SystemExit(f"{workers} workers left different {name} rows than the sequential import")
+            report["results"][f"pool x{workers}"] = round(seconds, 2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{args.athletes} athletes x {args.files} files: {report['sessions']} sessions, "
+          f"{report['zones']} zone rows, {report['ledger']} ledger rows – identical every way")
+    for label, seconds in report["results"].items():
+        print(f"  {label:<12} {seconds:>7.2f} s")
+
+if __name__ == "__main__":
+    main()
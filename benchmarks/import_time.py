@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Cold-start import benchmark for the batch jobs.
+
+Each target is imported in a fresh interpreter (`python -c "import X"`) several
+times and the median wall time is reported, so .pyc caches are warm but nothing
+is shared between runs. Compares the old batch-job entry point (`run`, i.e. the
+whole Flask app) with the app-less bootstrap the jobs use now.
+
+    python benchmarks/import_time.py               # table
+    python benchmarks/import_time.py --json        # machine-readable
+    python benchmarks/import_time.py --importtime  # plus top modules by -X importtime
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    "flask app (run)":           "import run",
+    "bootstrap + db":            "import bootstrap, db",
+    "process_fit_sessions":      "import process_fit_sessions",
+    "process_results":           "import process_results",
+    "make_history":              "import make_history",
+}
+
+def time_import(stmt: str, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", stmt], cwd=ROOT,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        elapsed = time.perf_counter() - start
+        if proc.returncode != 0:
+            return None, proc.stderr.decode(errors="replace").strip().splitlines()[-1:]
+        samples.append(elapsed)
+    return samples, None
+
+def top_imports(stmt: str, n: int = 10):
+    """Largest cumulative entries from `python -X importtime`."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", stmt], cwd=ROOT,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    rows = []
+    for line in proc.stderr.decode(errors="replace").splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cum_us, name = line.split("|", 2)
+        if not name[1:].startswith(" "):       # top-level imports only
+            rows.append((int(cum_us), name.strip()))
+    return sorted(rows, reverse=True)[:n]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="print a JSON report")
+    parser.add_argument("--importtime", action="store_true", help="show top-level modules by import cost")
+    args = parser.parse_args()
+
+    report = {"python": sys.version.split()[0], "repeat": args.repeat, "results": {}}
+    for label, stmt in TARGETS.items():
+        samples, error = time_import(stmt, args.repeat)
+        entry = {"stmt": stmt}
+        if samples is None:
+            entry["error"] = error
+        else:
+            entry.update(median_ms=round(statistics.median(samples) * 1000, 1),
+                         min_ms=round(min(samples) * 1000, 1))
+            if args.importtime:
+                entry["top_imports_ms"] = [(name, round(us / 1000, 1)) for us, name in top_imports(stmt)]
+        report["results"][label] = entry
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Python {report['python']}, median of {args.repeat} cold starts\n")
+    for label, entry in report["results"].items():
+        if "error" in entry:
+            print(f"  {label:<24} failed: {' '.join(entry['error'])}")
+            continue
+        print(f"  {label:<24} {entry['median_ms']:>8.1f} ms   (min {entry['min_ms']:.1f})")
+        for name, ms in entry.get("top_imports_ms", []):
+            print(f"      {ms:>8.1f} ms  {name}")
+
+if __name__ == "__main__":
+    main()
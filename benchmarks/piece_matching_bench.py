@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Piece matching: the binary-search engine (piece_matching.py) against the
+quadratic scan process_results.get_results used to do (plus its same-distance
+reordering and chronology check), on synthetic 1 Hz outings. Wherever the old
+code accepted the outing, start/end/time must be identical; where it rejected
+it, the new placement must still be overlap-free and in Piece_ID order.
+
+    python benchmarks/piece_matching_bench.py                 # table
+    python benchmarks/piece_matching_bench.py --json          # machine-readable
+    python benchmarks/piece_matching_bench.py --legacy-max 3000  # skip the slow scan above N points
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np                                     # noqa: E402
+from piece_matching import match_pieces                # noqa: E402
+
+def legacy_get_results(points, pieces):
+    """process_results.get_results before the matching engine (reference only)."""
+    pieces.sort(key=lambda x: x['Distance'], reverse=True)
+    for piece in pieces:
+        piece['start'] = -1; piece['end'] = -1; piece['time'] = timedelta(days=1)
+
+    for i, piece in enumerate(pieces):
+        for start_index, point in enumerate(points):
+            end_index = start_index
+            while (end_index < len(points) - 1 and
+                   points[end_index]['total_distance'] - point['total_distance'] < piece['Distance']):
+                end_index += 1
+            if end_index >= len(points): continue
+
+            time_taken = points[end_index]['time'] - point['time']
+            distance_covered = points[end_index]['total_distance'] - point['total_distance']
+
+            if time_taken < piece['time'] and distance_covered >= piece['Distance']:
+                proposed_start = point['pt_no']; proposed_end = points[end_index]['pt_no']
+                overlap = any(not (proposed_end <= p['start'] or proposed_start >= p['end'])
+                              for p in pieces[:i])
+                if not overlap:
+                    piece['start'] = proposed_start
+                    piece['end']   = proposed_end
+                    piece['time']  = time_taken * piece['Distance'] / (
+                        points[piece['end']]['total_distance'] - points[piece['start']]['total_distance']
+                    )
+    return pieces
+
+def legacy_reorder(pieces):
+    """process_results.reorder_same_distance_pieces + check_chronological_validity."""
+    groups = {}
+    for piece in pieces: groups.setdefault(piece['Distance'], []).append(piece)
+    reordered = []
+    for group in groups.values():
+        results = [(p['start'], p['end'], p['time']) for p in sorted(group, key=lambda p: p['start'])]
+        by_id = sorted(group, key=lambda p: p['Piece_ID'])
+        for piece, (start, end, took) in zip(by_id, results):
+            piece['start'], piece['end'], piece['time'] = start, end, took
+        reordered.extend(by_id)
+    pieces[:] = reordered
+    ids = [p['Piece_ID'] for p in sorted(pieces, key=lambda p: p['start'])]
+    return ids == sorted(ids)
+
+def legacy_pipeline(points, pieces):
+    legacy_get_results(points, pieces)
+    return pieces if legacy_reorder(pieces) else None
+
+def is_consistent(pieces) -> bool:
+    """Matched pieces don't overlap and run in Piece_ID order."""
+    matched = sorted((p['start'], p['end'], p['Piece_ID']) for p in pieces if p['start'] >= 0)
+    return all(a[1] <= b[0] and a[2] < b[2] for a, b in zip(matched, matched[1:]))
+
+def new_get_results(points, pieces):
+    t0 = points[0]['time']
+    cum = np.array([p['total_distance'] for p in points], dtype=np.float64)
+    t_us = np.array([(p['time'] - t0) // timedelta(microseconds=1) for p in points], dtype=np.int64)
+    return match_pieces(cum, t_us, pieces)
+
+def synthetic_outing(n_points: int, distances, seed: int):
+    """1 Hz track: ~3 m/s paddling with each piece rowed at ~4.5 m/s, plus GPS noise."""
+    rng = random.Random(seed)
+    speeds = [rng.uniform(2.5, 3.5) for _ in range(n_points)]
+    gap = n_points // (len(distances) + 1)
+    for k, dist in enumerate(distances, 1):
+        start = k * gap
+        for i in range(start, min(n_points, start + int(dist / 4.5) + 5)):
+            speeds[i] = rng.uniform(4.2, 4.8)
+
+    t0 = datetime(2025, 3, 1, 7, 0, tzinfo=timezone.utc)
+    points, total = [], 0.0
+    for i, speed in enumerate(speeds):
+        if i:
+            total += max(0.00001, speed + rng.gauss(0, 0.3))
+        points.append({'pt_no': i, 'time': t0 + timedelta(seconds=i, milliseconds=rng.choice((0, 0, 1))),
+                       'total_distance': total if i else 0})
+    pieces = [{'Piece_ID': k, 'Distance': d} for k, d in enumerate(distances, 1)]
+    return points, pieces
+
+CASES = {
+    "short outing (2k pts, 4 pieces)":   (2000, [1000, 1000, 500, 500]),
+    "long outing (5k pts, 8 pieces)":    (5000, [2000, 1500, 1000, 1000, 750, 500, 500, 250]),
+    "rate ladder (7.2k pts, 20 pieces)": (7200, [500] * 4 + [250] * 16),
+    "head race (10k pts, 3 pieces)":     (10000, [5000, 2000, 1000]),
+    "250m bursts (6k pts, 24 pieces)":   (6000, [250] * 24),
+}
+
+def timed(fn, points, pieces, repeat):
+    samples, result = [], None
+    for _ in range(repeat):
+        work = copy.deepcopy(pieces)
+        start = time.perf_counter()
+        result = fn(points, work)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+def summary(pieces):
+    return sorted((p['Piece_ID'], p['start'], p['end'], p['time']) for p in pieces)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--legacy-max", type=int, default=10000,
+                        help="only run the quadratic scan on tracks up to this many points")
+    parser.add_argument("--json", action="store_true", help="print a JSON report")
+    args = parser.parse_args()
+
+    report = {"repeat": args.repeat, "results": {}}
+    for seed, (label, (n, distances)) in enumerate(CASES.items()):
+        points, pieces = synthetic_outing(n, distances, seed)
+        new_s, new_result = timed(new_get_results, points, pieces, args.repeat)
+        entry = {"points": n, "pieces": len(pieces), "new_ms": round(new_s * 1000, 2)}
+        if n <= args.legacy_max:
+            old_s, old_result = timed(legacy_pipeline, points, pieces, 1)
+            if old_result is not None and summary(old_result) != summary(new_result):
+                raise SystemExit(f"{label}: results differ from the legacy scan")
+            entry.update(legacy_ms=round(old_s * 1000, 1), speedup=round(old_s / new_s, 1),
+                         identical=old_result is not None)
+        if not is_consistent(new_result):
+            raise SystemExit(f"{label}: overlapping or out-of-order placement")
+        report["results"][label] = entry
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for label, e in report["results"].items():
+        legacy = (f"{e['legacy_ms']:>10.1f} ms  x{e['speedup']:<7}" if "legacy_ms" in e else f"{'skipped':>13}")
+        note = "" if e.get("identical", True) else "  (legacy rejected the outing)"
+        print(f"  {label:<36} new {e['new_ms']:>8.2f} ms   legacy {legacy}{note}")
+
+if __name__ == "__main__":
+    main()
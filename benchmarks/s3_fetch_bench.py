@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Download + decode: S3Fetcher (s3_fetcher.py) prefetching on a thread pool
+against one get_object(...).read() after another, on a local S3 stand-in
+(benchmarks/s3_local.py) with a simulated round trip per request. The files
+are synthetic 1 Hz FIT sessions (see fit_decode_bench.py) and every one is
+decoded, so the fetcher's ideal is the decode time alone.
+Both must decode the same activities in the same order.
+
+    python benchmarks/s3_fetch_bench.py                          # table
+    python benchmarks/s3_fetch_bench.py --files 200 --latency-ms 60 --workers 1,4,16
+    python benchmarks/s3_fetch_bench.py --json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from activity import decode_activity                       # noqa: E402
+from benchmarks.fit_decode_bench import synthetic_fit      # noqa: E402
+from benchmarks.s3_local import LocalS3                    # noqa: E402
+from s3_fetcher import S3Fetcher, get_object_bytes         # noqa: E402
+
+BUCKET = "bench-bucket"
+
+def sequential(s3, keys):
+    out = []
+    for key in keys:
+        _, body = get_object_bytes(s3, BUCKET, key)
+        out.append(decode_activity(key, body).duration_s)
+    return out
+
+def prefetched(s3, keys, sizes, workers):
+    fetcher = S3Fetcher(s3, BUCKET, workers)
+    out = []
+    for f in fetcher.fetch((None, key, None, sizes[key]) for key in keys):
+        _, body = f.result()
+        out.append(decode_activity(f.key, body).duration_s)
+    return out
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=80)
+    parser.add_argument("--seconds", type=int, default=3600, help="length of each synthetic session")
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="simulated round trip per request")
+    parser.add_argument("--workers", default="1,4,8,16", help="fetcher pool sizes to try")
+    parser.add_argument("--json", action="store_true", help="print a JSON report")
+    args = parser.parse_args()
+
+    report = {"files": args.files, "latency_ms": args.latency_ms, "results": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        s3 = LocalS3(tmp)
+        keys, sizes = [], {}
+        for i in range(args.files):
+            key = f"fitfiles/bench/{i % 10}/{i:05d}.fit"
+            body = synthetic_fit(n=args.seconds, seed=i)
+            s3.put_object(Bucket=BUCKET, Key=key, Body=body)
+            keys.append(key); sizes[key] = len(body)
+        report["mb"] = round(sum(sizes.values()) / 2**20, 1)
+
+        start = time.perf_counter()
+        for key in keys:
+            decode_activity(key, s3.get_object(Bucket=BUCKET, Key=key)["Body"].read())
+        report["decode_only_s"] = round(time.perf_counter() - start, 2)
+
+        s3.latency = args.latency_ms / 1000.0
+        start = time.perf_counter()
+        expected = sequential(s3, keys)
+        report["results"]["sequential"] = round(time.perf_counter() - start, 2)
+        for workers in (int(w) for w in args.workers.split(",")):
+            start = time.perf_counter()
+            if prefetched(s3, keys, sizes, workers) != expected:
+                raise SystemExit(f"fetcher with {workers} workers decoded different activities")
+            report["results"][f"fetcher x{workers}"] = round(time.perf_counter() - start, 2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{args.files} files ({report['mb']} MB), {args.latency_ms:g} ms a request; "
+          f"decoding alone takes {report['decode_only_s']:.2f} s")
+    for label, seconds in report["results"].items():
+        print(f"  {label:<14} {seconds:>7.2f} s")
+
+if __name__ == "__main__":
+    main()
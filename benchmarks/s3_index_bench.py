@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+S3 listing: one S3Index over the tenant's prefix (s3_index.py) against a
+list_objects_v2 paginator per athlete, on a local S3 stand-in
+(benchmarks/s3_local.py) with a simulated round trip per request. Both must
+give every athlete the same (key, ETag) list; reported are LIST requests and
+wall time for one importer's pass over all athletes, then the requests a
+later run makes with the saved index: none while it is younger than
+S3_INDEX_MAX_AGE, a full listing (which must see the uploads since) after.
+
+    python benchmarks/s3_index_bench.py                      # table
+    python benchmarks/s3_index_bench.py --athletes 120 --files 400 --latency-ms 30
+    python benchmarks/s3_index_bench.py --json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import process_fit_sessions                                # noqa: E402
+import s3_index                                            # noqa: E402
+from benchmarks.s3_local import LocalS3                    # noqa: E402
+
+BUCKET = "bench-bucket"
+PREFIX = "fitfiles/bench"
+
+def populate(s3: LocalS3, athletes: int, files: int) -> None:
+    for aid in range(1, athletes + 1):
+        for i in range(files):
+            ext = ".tcx" if i % 10 == 9 else ".fit"
+            s3.put_object(Bucket=BUCKET, Key=f"{PREFIX}/{aid}/2025-{i:04d}{ext}", Body=f"{aid}:{i}".encode())
+        s3.put_object(Bucket=BUCKET, Key=f"{PREFIX}/{aid}/notes.txt", Body=b"not an activity")
+
+def per_athlete(s3, athletes):
+    return {aid: list(process_fit_sessions.iter_fit_objects_for_athlete(aid, BUCKET, PREFIX, s3))
+            for aid in athletes}
+
+def from_index(index, athletes):
+    return {aid: list(process_fit_sessions.iter_fit_objects_for_athlete(aid, index=index))
+            for aid in athletes}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--athletes", type=int, default=60)
+    parser.add_argument("--files", type=int, default=150, help="activity files per athlete")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="simulated round trip per request")
+    parser.add_argument("--json", action="store_true", help="print a JSON report")
+    args = parser.parse_args()
+
+    report = {"athletes": args.athletes, "files_per_athlete": args.files, "latency_ms": args.latency_ms}
+    with tempfile.TemporaryDirectory() as tmp:
+        s3 = LocalS3(os.path.join(tmp, "s3"))
+        populate(s3, args.athletes, args.files)
+        s3.latency = args.latency_ms / 1000.0
+        athletes = list(range(1, args.athletes + 1))
+        state_dir = os.path.join(tmp, "index")
+
+        s3.calls.clear()
+        start = time.perf_counter()
+        listed = per_athlete(s3, athletes)
+        report["per_athlete"] = {"list_requests": s3.calls["ListObjectsV2"],
+                                 "seconds": round(time.perf_counter() - start, 3)}
+
+        s3.calls.clear()
+        start = time.perf_counter()
+        index = s3_index.tenant_index(BUCKET, PREFIX, s3, max_age=0, directory=state_dir)
+        indexed = from_index(index, athletes)
+        report["index"] = {"list_requests": s3.calls["ListObjectsV2"],
+                           "seconds": round(time.perf_counter() - start, 3)}
+        if indexed != listed:
+            raise SystemExit("index and per-athlete listing disagree")
+
+        # next run, in a new process: a few uploads since, then the saved index again
+        s3.latency = 0.0
+        added = {f"{PREFIX}/{aid}/2026-new.fit" for aid in athletes[:3]}
+        for key in sorted(added):
+            s3.put_object(Bucket=BUCKET, Key=key, Body=key.encode())
+        s3.latency = args.latency_ms / 1000.0
+
+        s3.calls.clear()
+        s3_index.load_index(BUCKET, PREFIX, s3, max_age=3600, directory=state_dir)
+        report["rerun_saved"] = {"list_requests": s3.calls["ListObjectsV2"]}
+
+        s3.calls.clear()
+        index = s3_index.load_index(BUCKET, PREFIX, s3, max_age=0, directory=state_dir)
+        seen = {o.key for aid in athletes for o in index.objects(aid)}
+        if not added <= seen:
+            raise SystemExit(f"relisted index is missing {len(added - seen)} of the new uploads")
+        report["rerun"] = {"list_requests": s3.calls["ListObjectsV2"]}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    pa, ix = report["per_athlete"], report["index"]
+    print(f"{args.athletes} athletes x {args.files} files, {args.latency_ms:g} ms a request; "
+          f"same (key, ETag) lists both ways")
+    print(f"  per-athlete listing   {pa['list_requests']:>5} LIST   {pa['seconds']:>7.2f} s")
+    print(f"  one prefix index      {ix['list_requests']:>5} LIST   {ix['seconds']:>7.2f} s")
+    print(f"  rerun within max age  {report['rerun_saved']['list_requests']:>5} LIST")
+    print(f"  rerun past max age    {report['rerun']['list_requests']:>5} LIST   sees the uploads since")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# benchmarks/s3_local.py
+"""
+Local stand-in for a boto3 S3 client, just enough for the importers' calls to
+run offline against a directory (`<root>/<bucket>/<key>`):
+
+  - put_object / get_object / head_object, with ETag = quoted MD5 of the body
+    and LastModified = the file's mtime in UTC, to the second as S3 gives it;
+  - list_objects_v2 (Prefix, StartAfter, MaxKeys, ContinuationToken) in key
+    order, and get_paginator("list_objects_v2") over it, 1000 keys a page;
+  - get_object's Range ("bytes=a-b", "bytes=a-") and IfMatch, answering
+    with ContentRange / PreconditionFailed as S3 does;
+  - a missing key raises botocore's ClientError (NoSuchKey), as boto3 does.
+
+`calls` counts requests by operation (and body bytes sent, as "bytes"), so benchmarks can compare how many
+each approach makes; `latency` (seconds) is added to every request to stand
+in for the round trip:
+
+    s3 = LocalS3(tmpdir, latency=0.02)
+    s3.put_object(Bucket="b", Key="fitfiles/eubc/12/a.fit", Body=b"...")
+    s3.calls["ListObjectsV2"]
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+PAGE_SIZE = 1000
+
+class _Body(io.BytesIO):
+    """get_object's StreamingBody: read() and close() are all the importers use."""
+
+class _Paginator:
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, **kwargs):
+        token = None
+        while True:
+            page = self.client.list_objects_v2(**kwargs, **({"ContinuationToken": token} if token else {}))
+            yield page
+            if not page.get("IsTruncated"):
+                return
+            token = page["NextContinuationToken"]
+
+class LocalS3:
+    def __init__(self, root: str, latency: float = 0.0):
+        self.root = root
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, op: str) -> None:
+        with self._lock:
+            self.calls[op] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, *key.split("/"))
+
+    def _meta(self, bucket: str, key: str) -> dict:
+        path = self._path(bucket, key)
+        try:
+            st = os.stat(path)
+            with open(path, "rb") as f:
+                etag = f'"{hashlib.md5(f.read()).hexdigest()}"'
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": f"No such key: {key}"}}, "GetObject")
+        modified = datetime.fromtimestamp(int(st.st_mtime), timezone.utc)
+        return {"Key": key, "Size": st.st_size, "ETag": etag, "LastModified": modified}
+
+    def put_object(self, Bucket: str, Key: str, Body=b"", **_):
+        self._count("PutObject")
+        body = Body.read() if hasattr(Body, "read") else bytes(Body)
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)
+        return {"ETag": f'"{hashlib.md5(body).hexdigest()}"'}
+
+    def head_object(self, Bucket: str, Key: str, **_):
+        self._count("HeadObject")
+        meta = self._meta(Bucket, Key)
+        return {"ContentLength": meta["Size"], "ETag": meta["ETag"], "LastModified": meta["LastModified"]}
+
+    def get_object(self, Bucket: str, Key: str, Range: str = None, IfMatch: str = None, **_):
+        self._count("GetObject")
+        meta = self._meta(Bucket, Key)
+        if IfMatch is not None and IfMatch != meta["ETag"]:
+            raise ClientError({"Error": {"Code": "PreconditionFailed", "Message": "At least one of the "
+                               "pre-conditions you specified did not hold"}}, "GetObject")
+        with open(self._path(Bucket, Key), "rb") as f:
+            body = f.read()
+        out = {"ContentLength": meta["Size"], "ETag": meta["ETag"], "LastModified": meta["LastModified"]}
+        if Range:
+            first, _, last = Range[len("bytes="):].partition("-")
+            first, last = int(first), min(int(last) if last else meta["Size"] - 1, meta["Size"] - 1)
+            if first >= meta["Size"]:
+                raise ClientError({"Error": {"Code": "InvalidRange", "Message": Range}}, "GetObject")
+            body = body[first:last + 1]
+            out.update(ContentLength=len(body), ContentRange=f"bytes {first}-{last}/{meta['Size']}")
+        with self._lock:
+            self.calls["bytes"] += len(body)
+        out["Body"] = _Body(body)
+        return out
+
+    def _keys(self, bucket: str):
+        base = os.path.join(self.root, bucket)
+        for dirpath, _, names in os.walk(base):
+            rel = os.path.relpath(dirpath, base)
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                yield name if rel == "." else "/".join(rel.split(os.sep) + [name])
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = "", StartAfter: str = "", MaxKeys: int = PAGE_SIZE,
+                        ContinuationToken: str = None, **_):
+        self._count("ListObjectsV2")
+        after = ContinuationToken or StartAfter or ""
+        keys = sorted(k for k in self._keys(Bucket) if k.startswith(Prefix) and k > after)
+        page, rest = keys[:MaxKeys], keys[MaxKeys:]
+        out = {"KeyCount": len(page), "IsTruncated": bool(rest), "Prefix": Prefix}
+        if page:
+            out["Contents"] = [self._meta(Bucket, key) for key in page]
+        if rest:
+            out["NextContinuationToken"] = page[-1]
+        return out
+
+    def get_paginator(self, operation: str) -> _Paginator:
+        if operation != "list_objects_v2":
+            raise NotImplementedError(operation)
+        return _Paginator(self)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Season_Start prefilter: S3Fetcher with process_fit_sessions.SeasonPrefilter
+against downloading and decoding every file, over an archive that goes back
+years, on a local S3 stand-in (benchmarks/s3_local.py) with a simulated round
+trip per request. Some of the old files keep their upload time (skipped from
+LastModified); the rest were re-uploaded this season, so only their first
+S3_PEEK_BYTES can date them. Both ways must keep the same files; reported
+are GET requests, bytes read and wall time.
+
+    python benchmarks/season_prefilter_bench.py                      # table
+    python benchmarks/season_prefilter_bench.py --files 300 --in-season 0.1 --latency-ms 40
+    python benchmarks/season_prefilter_bench.py --json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from activity import decode_activity                       # noqa: E402
+from benchmarks.fit_decode_bench import START, synthetic_fit   # noqa: E402
+from benchmarks.s3_local import LocalS3                    # noqa: E402
+from process_fit_sessions import SeasonPrefilter           # noqa: E402
+from s3_fetcher import S3Fetcher                           # noqa: E402
+
+BUCKET = "bench-bucket"
+SEASON_START = date(2025, 5, 1)
+
+def populate(s3: LocalS3, root: str, files: int, in_season: float, seconds: int):
+    """Keys in listing order with (size, LastModified); seeds set each file's start date."""
+    r = random.Random(7)
+    items = []
+    for i in range(files):
+        key = f"fitfiles/bench/{i % 10}/{i:05d}.fit"
+        # synthetic_fit starts on START + seed days: seeds below 0 date it before the season
+        seed = r.randrange(0, 120) if r.random() < in_season else -r.randrange(2, 4 * 365)
+        body = synthetic_fit(n=seconds, seed=seed)
+        s3.put_object(Bucket=BUCKET, Key=key, Body=body)
+        started = START + timedelta(days=seed)
+        if seed < 0 and r.random() < 0.5:       # never re-uploaded: LastModified is the day after
+            uploaded = (started + timedelta(days=1)).timestamp()
+            os.utime(os.path.join(root, BUCKET, *key.split("/")), (uploaded, uploaded))
+        meta = s3.head_object(Bucket=BUCKET, Key=key)
+        items.append((None, key, meta["ETag"], len(body), meta["LastModified"]))
+    s3.calls.clear()
+    return items
+
+def kept(s3, items, workers, drop=None):
+    out = []
+    for f in S3Fetcher(s3, BUCKET, workers).fetch(items, drop=drop):
+        if f.dropped is not None:
+            continue
+        _, body = f.result()
+        started = decode_activity(f.key, body).start_time or datetime.now(timezone.utc)
+        if started.date() >= SEASON_START:
+            out.append(f.key)
+    return out
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=120)
+    parser.add_argument("--in-season", type=float, default=0.2, help="share of files from this season")
+    parser.add_argument("--seconds", type=int, default=3600, help="length of each synthetic session")
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="simulated round trip per request")
+    parser.add_argument("--workers", type=int, default=8, help="fetcher pool size")
+    parser.add_argument("--json", action="store_true", help="print a JSON report")
+    args = parser.parse_args()
+
+    report = {"files": args.files, "in_season": args.in_season, "latency_ms": args.latency_ms, "results": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        s3 = LocalS3(tmp)
+        items = populate(s3, tmp, args.files, args.in_season, args.seconds)
+        s3.latency = args.latency_ms / 1000.0
+
+        expected = None
+        for label, drop in (("full download", None), ("prefilter", SeasonPrefilter(SEASON_START))):
+            s3.calls.clear()
+            start = time.perf_counter()
+            keys = kept(s3, items, args.workers, drop)
+            seconds = time.perf_counter() - start
+            if expected is None:
+                expected = keys
+            elif keys != expected:
+                raise SystemExit(f"{label} kept {len(keys)} files, full download {len(expected)}")
+            report["results"][label] = {"get_requests": s3.calls["GetObject"],
+                                        "mb": round(s3.calls["bytes"] / 2**20, 1),
+                                        "seconds": round(seconds, 2)}
+        report["kept"] = len(expected)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{args.files} files, {report['kept']} from Season_Start {SEASON_START} on, "
+          f"{args.latency_ms:g} ms a request; same files kept both ways")
+    for label, r in report["results"].items():
+        print(f"  {label:<14} {r['get_requests']:>5} GET  {r['mb']:>7.1f} MB  {r['seconds']:>7.2f} s")
+
+if __name__ == "__main__":
+    main()
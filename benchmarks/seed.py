@@ -0,0 +1,161 @@
+# benchmarks/seed.py
+"""
+Build a benchmark database from `Data Model.json` + `data_dump.json`.
+
+The dump covers Athletes, Outings, Crews, Seats, Pieces and Results. On top of
+that we derive, deterministically:
+  - Hulls from the Hull_IDs/Boat_Types the crews use;
+  - a Water session per athlete per outing they rowed in, plus a monthly erg
+    test, so the dashboards and make_history() have Sessions to chew on;
+  - a coach login and the Params the jobs read (Season_Start, Elo_Gearing).
+
+Dates are shifted by whole weeks so the last outing lands in the current week;
+otherwise every "last 12 weeks" query would come back empty.
+"""
+import json
+import os
+import random
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_MODEL = os.path.join(ROOT, "Data Model.json")
+DATA_DUMP  = os.path.join(ROOT, "data_dump.json")
+
+# Columns the code uses that postdate Data Model.json.
+EXTRA_COLUMNS = {
+    "Athletes": [("Start_Rating", "int"), ("Last_Login", "datetime"), ("Rest_HR", "int"), ("Max_HR", "int")],
+    "Results":  [("Unrated", "tinyint"), ("Exp_Percent", "float"), ("Net_Gain", "float"),
+                 ("Source", "varchar")],
+    "Sessions": [("Source", "varchar")],
+    "History":  [("OTW_ELO", "float")],
+}
+EXTRA_TABLES = {
+    "Params": [("Param", "varchar"), ("Value", "varchar"), ("Description", "text")],
+    "Zones":  [("Session_ID", "int"), ("Zone", "int"), ("Time_In_Zone", "time"),
+               ("Activity_Factor", "float"), ("Zone_Factor", "float"), ("T2 Minutes", "float")],
+}
+PRIMARY_KEYS = {
+    "Athletes": ("Athlete_ID",), "Outings": ("Outing_ID",), "Crews": ("Crew_ID",),
+    "Pieces": ("Piece_ID",), "Hulls": ("Hull_ID",), "Sessions": ("Session_ID",),
+    "Seats": ("Crew_ID", "Seat"), "Results": ("Piece_ID", "Crew_ID"),
+    "History": ("Athlete_ID", "Date"), "GMTs": ("Boat_Type",),
+    "Params": ("Param",), "Zones": ("Session_ID", "Zone"),
+}
+# Only DDL differences between the two backends.
+_TYPES = {
+    "int": "INT", "tinyint": "TINYINT", "varchar": "VARCHAR(100)", "text": "TEXT",
+    "date": "DATE", "datetime": "DATETIME", "time": "TIME(6)", "decimal": "DECIMAL(10,2)",
+    "float": "FLOAT",
+}
+_AUTO_INCREMENT = {"mysql": "INT AUTO_INCREMENT", "sqlite": "INTEGER"}
+
+def load_schema() -> dict:
+    """{table: [(column, type), ...]} – Data Model.json plus EXTRA_COLUMNS/TABLES."""
+    with open(DATA_MODEL) as f:
+        schema = {t["table_name"]: [(c["column_name"], c["data_type"]) for c in t["columns"]]
+                  for t in json.load(f)}
+    for table, cols in EXTRA_COLUMNS.items():
+        known = {c for c, _ in schema[table]}
+        schema[table] += [(c, t) for c, t in cols if c not in known]
+    schema.update(EXTRA_TABLES)
+    return schema
+
+def create_table_sql(table: str, columns, dialect: str) -> str:
+    pk = PRIMARY_KEYS.get(table, ())
+    lines = []
+    for name, dtype in columns:
+        if pk == (name,) and dtype == "int":
+            lines.append(f"`{name}` {_AUTO_INCREMENT[dialect]} PRIMARY KEY")
+        else:
+            lines.append(f"`{name}` {_TYPES[dtype]}")
+    if len(pk) > 1:
+        lines.append("PRIMARY KEY (" + ", ".join(f"`{c}`" for c in pk) + ")")
+    return f"CREATE TABLE `{table}` (\n  " + ",\n  ".join(lines) + "\n)"
+
+def load_dump() -> dict:
+    with open(DATA_DUMP) as f:
+        return {t["table_name"]: t["data"] for t in json.load(f)}
+
+def _week_shift(dump: dict, today: date) -> timedelta:
+    latest = max(date.fromisoformat(o["Outing_Date"]) for o in dump["Outings"])
+    return timedelta(weeks=(today - latest).days // 7)
+
+def build_rows(today: date = None, seed: int = 2024) -> dict:
+    """Every table's rows as a list of dicts, ready to insert."""
+    today = today or date.today()
+    rng = random.Random(seed)
+    dump = load_dump()
+    rows = {table: [dict(r) for r in data] for table, data in dump.items()}
+
+    shift = _week_shift(dump, today)
+    for outing in rows["Outings"]:
+        outing["Outing_Date"] = date.fromisoformat(outing["Outing_Date"]) + shift
+    outing_dates = {o["Outing_ID"]: o["Outing_Date"] for o in rows["Outings"]}
+
+    coach_id = max(a["Athlete_ID"] for a in rows["Athletes"]) + 1
+    rows["Athletes"].append({"Athlete_ID": coach_id, "Full_Name": "Benchmark Coach",
+                             "Initials": "BC", "Side": "Neither", "M_W": "M", "Coach": 1,
+                             "Sculls": 0, "Email": "coach@example.invalid"})
+
+    hulls = {}
+    for crew in rows["Crews"]:
+        if crew.get("Hull_ID"):
+            hulls.setdefault(crew["Hull_ID"], crew["Boat_Type"])
+    rows["Hulls"] = [{"Hull_ID": hid, "Hull_Name": f"Hull {hid}", "Boat_Type": bt, "Max_Weight": 90}
+                     for hid, bt in sorted(hulls.items())]
+
+    crew_outing = {c["Crew_ID"]: c["Outing_ID"] for c in rows["Crews"]}
+    rowed = sorted({(s["Athlete_ID"], outing_dates[crew_outing[s["Crew_ID"]]])
+                    for s in rows["Seats"] if s["Seat"] != "Cox" and s["Crew_ID"] in crew_outing})
+    sessions = []
+    for athlete_id, day in rowed:
+        minutes = rng.choice((60, 75, 90, 105))
+        sessions.append({"Athlete_ID": athlete_id, "Session_Date": day, "Activity": "Water",
+                         "Type": "UT2", "Duration": timedelta(minutes=minutes),
+                         "Distance": minutes * 200, "T2Minutes": minutes})
+    first_day = min(outing_dates.values())
+    for athlete in rows["Athletes"]:
+        if athlete["Side"] == "Cox" or athlete["Coach"]:
+            continue
+        base = rng.uniform(400, 480)              # 2k seconds
+        day = first_day + timedelta(days=athlete["Athlete_ID"] % 28)
+        while day <= today:
+            two_k = timedelta(seconds=round(base, 1))
+            sessions.append({"Athlete_ID": athlete["Athlete_ID"], "Session_Date": day,
+                             "Activity": "Erg", "Type": "Test", "Distance": 2000,
+                             "Duration": two_k, "Split": two_k / 4, "2k_Equiv": two_k,
+                             "T2Minutes": 30, "Comment": "2k"})
+            base -= rng.uniform(0, 2.5)
+            day += timedelta(weeks=4)
+    for i, session in enumerate(sessions, 1):
+        session["Session_ID"] = i
+    rows["Sessions"] = sessions
+
+    rows["Params"] = [
+        {"Param": "Season_Start", "Value": first_day.isoformat(), "Description": "benchmark"},
+        {"Param": "Elo_Gearing", "Value": "8", "Description": "benchmark"},
+    ]
+    return rows
+
+def coach_id(rows: dict) -> int:
+    return next(a["Athlete_ID"] for a in rows["Athletes"] if a["Coach"])
+
+def seed(conn, rows: dict, dialect: str) -> dict:
+    """(Re)create every table on `conn` and insert `rows`. Returns {table: row count}."""
+    schema = load_schema()
+    counts = {}
+    with conn.cursor() as cursor:
+        for table, columns in schema.items():
+            cursor.execute(f"DROP TABLE IF EXISTS `{table}`")
+            cursor.execute(create_table_sql(table, columns, dialect))
+            data = rows.get(table) or []
+            names = [c for c, _ in columns]
+            if data:
+                cursor.executemany(
+                    f"INSERT INTO `{table}` (" + ", ".join(f"`{c}`" for c in names) + ") "
+                    "VALUES (" + ", ".join(["%s"] * len(names)) + ")",
+                    [tuple(r.get(c) for c in names) for r in data],
+                )
+            counts[table] = len(data)
+    conn.commit()
+    return counts
@@ -0,0 +1,282 @@
+# benchmarks/sqlite_compat.py
+"""
+SQLite stand-in for PyMySQL, just enough for the app's own SQL to run offline.
+
+`connect(**kwargs)` accepts the same keyword arguments db.py passes to
+pymysql.connect() (host/user/... are ignored; `database` is the SQLite file) and
+returns a connection that behaves like a PyMySQL one with DictCursor:
+
+  - %s / %(name)s placeholders and %% escapes;
+  - the MySQL functions our queries use: CURDATE(), NOW(), YEARWEEK(d, 3),
+    WEEKDAY(), STR_TO_DATE(), CONCAT(), plus `x - INTERVAL n DAY|WEEK|MONTH`;
+  - INSERT IGNORE and ON DUPLICATE KEY UPDATE ... VALUES(col);
+  - DATE / TIME / DATETIME columns come back as date / timedelta / datetime,
+    and so do date-shaped results of expressions such as MAX(Date);
+  - sqlite3 errors are re-raised as the matching pymysql.err classes.
+
+Timings against this are only comparable with other runs on SQLite.
+"""
+import re
+import sqlite3
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import pymysql
+from pymysql.constants import SERVER_STATUS
+
+# ---------- SQL translation ----------
+_PLACEHOLDER = re.compile(r"%%|%\((\w+)\)s|%s")
+_INTERVAL    = re.compile(r"(CURDATE\(\)|NOW\(\)|\?|[\w.`]+)\s*([-+])\s*INTERVAL\s+(\d+)\s+(DAY|WEEK|MONTH)\b", re.I)
+_INSERT_IGN  = re.compile(r"\bINSERT\s+IGNORE\b", re.I)
+_ON_DUP      = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I)
+_VALUES_COL  = re.compile(r"\bVALUES\(\s*(`[^`]+`|\w+)\s*\)", re.I)
+
+def _translate(sql: str) -> str:
+    sql = _PLACEHOLDER.sub(lambda m: "%" if m.group(0) == "%%" else (f":{m.group(1)}" if m.group(1) else "?"), sql)
+    sql = _INTERVAL.sub(lambda m: f"DATE_ADD({m.group(1)}, {'-' if m.group(2) == '-' else ''}{m.group(3)}, '{m.group(4).upper()}')", sql)
+    sql = _INSERT_IGN.sub("INSERT OR IGNORE", sql)
+    if _ON_DUP.search(sql):
+        head, tail = _ON_DUP.split(sql, 1)
+        sql = head + " ON CONFLICT DO UPDATE SET " + _VALUES_COL.sub(r"excluded.\1", tail)
+    return sql
+
+# ---------- MySQL functions ----------
+def _as_date(value):
+    if value is None:
+        return None
+    return date.fromisoformat(str(value)[:10])
+
+def _yearweek(value, mode=0):
+    d = _as_date(value)
+    if d is None:
+        return None
+    if mode == 3:
+        year, week, _ = d.isocalendar()
+    else:  # mode 0: weeks start on Sunday
+        first_sunday = date(d.year, 1, 1) + timedelta(days=(6 - date(d.year, 1, 1).weekday()) % 7)
+        year, week = d.year, ((d - first_sunday).days // 7 + 1 if d >= first_sunday else 0)
+    return year * 100 + week
+
+def _weekday(value):
+    d = _as_date(value)
+    return None if d is None else d.weekday()
+
+_MYSQL_TO_STRPTIME = {"%X": "%G", "%x": "%G", "%V": "%V", "%v": "%V", "%W": "%A", "%M": "%B",
+                      "%i": "%M", "%s": "%S", "%e": "%d", "%c": "%m"}
+
+def _str_to_date(value, fmt):
+    if value is None or fmt is None:
+        return None
+    py_fmt = re.sub(r"%\w", lambda m: _MYSQL_TO_STRPTIME.get(m.group(0), m.group(0)), fmt)
+    try:
+        parsed = datetime.strptime(str(value), py_fmt)
+    except ValueError:
+        return None
+    has_time = any(t in fmt for t in ("%H", "%i", "%s", "%T"))
+    return parsed.isoformat(sep=" ") if has_time else parsed.date().isoformat()
+
+def _date_add(value, n, unit):
+    if value is None:
+        return None
+    text = str(value)
+    base = datetime.fromisoformat(text) if len(text) > 10 else datetime.fromisoformat(text[:10])
+    if unit == "MONTH":
+        month = base.month - 1 + n
+        year, month = base.year + month // 12, month % 12 + 1
+        day = min(base.day, [31, 29 if year % 4 == 0 and (year % 100 or year % 400 == 0) else 28,
+                             31, 30, 31, 30, 31, 31, 30, 31, 30, 31][month - 1])
+        base = base.replace(year=year, month=month, day=day)
+    else:
+        base += timedelta(days=n * (7 if unit == "WEEK" else 1))
+    return base.isoformat(sep=" ") if len(text) > 10 else base.date().isoformat()
+
+def _concat(*parts):
+    return None if any(p is None for p in parts) else "".join(str(p) for p in parts)
+
+_FUNCTIONS = {
+    "CURDATE":     (0, lambda: date.today().isoformat()),
+    "NOW":         (0, lambda: datetime.now().replace(microsecond=0).isoformat(sep=" ")),
+    "YEARWEEK":    (-1, _yearweek),
+    "WEEKDAY":     (1, _weekday),
+    "STR_TO_DATE": (2, _str_to_date),
+    "DATE_ADD":    (3, _date_add),
+    "CONCAT":      (-1, _concat),
+}
+
+# ---------- type conversion ----------
+class _Text(str):
+    """Marks values read from declared text columns so they are never re-parsed."""
+
+def _to_timedelta(text: str) -> timedelta:
+    sign = -1 if text.startswith("-") else 1
+    h, m, s = text.lstrip("-").split(":")
+    return sign * timedelta(hours=int(h), minutes=int(m), seconds=float(s))
+
+_DATE_RE     = re.compile(r"\d{4}-\d{2}-\d{2}")
+_DATETIME_RE = re.compile(r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(\.\d+)?")
+_TIME_RE     = re.compile(r"-?\d{1,3}:\d{2}:\d{2}(\.\d+)?")
+
+def _from_expression(value):
+    # Untyped expression results (MAX(Date), STR_TO_DATE(...)) are plain strings in SQLite.
+    if _DATE_RE.fullmatch(value):
+        return date.fromisoformat(value)
+    if _TIME_RE.fullmatch(value):
+        return _to_timedelta(value)
+    if _DATETIME_RE.fullmatch(value):
+        return datetime.fromisoformat(value)
+    return value
+
+def _convert_row(values):
+    return [str(v) if type(v) is _Text else _from_expression(v) if type(v) is str else v
+            for v in values]
+
+for _name in ("VARCHAR", "TEXT", "CHAR"):
+    sqlite3.register_converter(_name, lambda b: _Text(b.decode()))
+sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()[:10]))
+sqlite3.register_converter("DATETIME", lambda b: datetime.fromisoformat(b.decode()))
+sqlite3.register_converter("TIME", lambda b: _to_timedelta(b.decode()))
+
+def _format_timedelta(td: timedelta) -> str:
+    total = td.total_seconds()
+    sign, total = ("-" if total < 0 else ""), abs(total)
+    h, rem = divmod(total, 3600)
+    m, s = divmod(rem, 60)
+    return f"{sign}{int(h):02d}:{int(m):02d}:{s:09.6f}"
+
+def _adapt(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return _format_timedelta(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+def _adapt_args(args):
+    if args is None:
+        return ()
+    if isinstance(args, dict):
+        return {k: _adapt(v) for k, v in args.items()}
+    if isinstance(args, (list, tuple)):
+        return [_adapt(v) for v in args]
+    return [_adapt(args)]          # pymysql also accepts a single bare value
+
+_ERRORS = (
+    (sqlite3.IntegrityError,   pymysql.err.IntegrityError),
+    (sqlite3.ProgrammingError, pymysql.err.ProgrammingError),
+    (sqlite3.OperationalError, pymysql.err.OperationalError),
+    (sqlite3.Error,            pymysql.err.DatabaseError),
+)
+
+def _reraise(exc: sqlite3.Error, sql: str):
+    for sqlite_cls, mysql_cls in _ERRORS:
+        if isinstance(exc, sqlite_cls):
+            raise mysql_cls(0, f"{exc} [sqlite: {sql.strip()[:200]}]") from exc
+
+# ---------- DB-API objects ----------
+class Cursor:
+    """DictCursor look-alike."""
+
+    def __init__(self, conn: "Connection", as_dict: bool = True):
+        self.connection = conn
+        self._cur = conn._db.cursor()
+        self._as_dict = as_dict
+        self.rowcount = -1
+        self.lastrowid = None
+        self.description = None
+
+    def _run(self, method, sql, args):
+        translated = _translate(sql)
+        try:
+            getattr(self._cur, method)(translated, args)
+        except sqlite3.Error as exc:
+            _reraise(exc, translated)
+        self.rowcount = self._cur.rowcount
+        self.lastrowid = self._cur.lastrowid
+        self.description = self._cur.description
+        return self.rowcount
+
+    def execute(self, query, args=None):
+        return self._run("execute", query, _adapt_args(args))
+
+    def executemany(self, query, args):
+        return self._run("executemany", query, [_adapt_args(a) for a in args])
+
+    def _row(self, raw):
+        if raw is None:
+            return None
+        values = _convert_row(raw)
+        if not self._as_dict:
+            return tuple(values)
+        return dict(zip((d[0] for d in self._cur.description), values))
+
+    def fetchone(self):
+        return self._row(self._cur.fetchone())
+
+    def fetchmany(self, size=None):
+        return [self._row(r) for r in self._cur.fetchmany(size or self._cur.arraysize)]
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cur.fetchall()]
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._cur.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Connection:
+    """Just the pymysql.Connection surface db.py and the app use."""
+
+    def __init__(self, path: str, cursorclass=None):
+        self._db = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES,
+                                   check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA foreign_keys = OFF")
+        for name, (nargs, fn) in _FUNCTIONS.items():
+            self._db.create_function(name, nargs, fn, deterministic=name not in ("CURDATE", "NOW"))
+        self._dict_rows = cursorclass is None or issubclass(cursorclass, pymysql.cursors.DictCursor)
+        self.open = True
+
+    def cursor(self, cursor=None):
+        as_dict = self._dict_rows if cursor is None else issubclass(cursor, pymysql.cursors.DictCursor)
+        return Cursor(self, as_dict)
+
+    @property
+    def server_status(self) -> int:
+        return SERVER_STATUS.SERVER_STATUS_IN_TRANS if self._db.in_transaction else 0
+
+    def begin(self):
+        if not self._db.in_transaction:
+            self._db.execute("BEGIN")
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def ping(self, reconnect=False):
+        if not self.open:
+            raise pymysql.err.InterfaceError(0, "Connection closed")
+
+    def autocommit(self, value):
+        self._db.isolation_level = None if value else ""
+
+    def close(self):
+        if self.open:
+            self.open = False
+            self._db.close()
+
+def connect(database=None, cursorclass=None, **_ignored):
+    """Drop-in for pymysql.connect(); `database` is the SQLite file path."""
+    return Connection(database, cursorclass=cursorclass)
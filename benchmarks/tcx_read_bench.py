@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+TCX reading: the streaming reader (tcx_reader.read_tcx, behind
+activity._decode_tcx) against the ET.fromstring + find() decoder it replaced,
+on synthetic Strava/TrainingPeaks-style exports – 1 Hz trackpoints with HR,
+distance and speed/power extensions – from one hour up to ~40 MB. Both must
+produce the same DecodedActivity; throughput is MB/s of XML and memory is the
+tracemalloc peak while decoding (the input bytes themselves not counted).
+
+    python benchmarks/tcx_read_bench.py                 # table
+    python benchmarks/tcx_read_bench.py --json          # machine-readable
+    python benchmarks/tcx_read_bench.py --legacy-max 30000   # skip the old decoder on bigger files
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np                                        # noqa: E402
+from activity import DecodedActivity, _Series, _decode_tcx  # noqa: E402
+
+TCX_NS = {'tcx': 'http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2'}
+
+CASES = {
+    "1h rowing":                 3600,
+    "6h (~10 MB)":               6 * 3600,
+    "24h (~40 MB)":              24 * 3600,
+}
+
+def synthetic_tcx(n_points: int, seed: int) -> bytes:
+    r = random.Random(seed)
+    start = datetime(2025, 5, 1, 7, tzinfo=timezone.utc)
+    lat, lon, dist = 55.95, -3.19, 0.0
+    out = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2"'
+           ' xmlns:ns3="http://www.garmin.com/xmlschemas/ActivityExtension/v2">\n'
+           ' <Activities>\n  <Activity Sport="Other">\n'
+           f'   <Id>{start.strftime("%Y-%m-%dT%H:%M:%SZ")}</Id>\n'
+           f'   <Lap StartTime="{start.strftime("%Y-%m-%dT%H:%M:%SZ")}">\n'
+           f'    <TotalTimeSeconds>{n_points}</TotalTimeSeconds>\n    <Track>\n']
+    for i in range(n_points):
+        lat += r.uniform(0, 4e-5); lon += r.uniform(-1e-5, 1e-5); dist += r.uniform(3, 5)
+        when = (start + timedelta(seconds=i)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        pos = "" if r.random() < 0.02 else (
+            f"      <Position><LatitudeDegrees>{lat:.7f}</LatitudeDegrees>"
+            f"<LongitudeDegrees>{lon:.7f}</LongitudeDegrees></Position>\n")
+        hr = "" if i % 7 == 3 else f"      <HeartRateBpm><Value>{r.randint(90, 185)}</Value></HeartRateBpm>\n"
+        out.append(
+            f"     <Trackpoint>\n      <Time>{when}</Time>\n{pos}"
+            f"      <AltitudeMeters>{r.uniform(1, 3):.1f}</AltitudeMeters>\n"
+            f"      <DistanceMeters>{dist:.1f}</DistanceMeters>\n{hr}"
+            f"      <Cadence>{r.randint(18, 40)}</Cadence>\n"
+            f"      <Extensions><ns3:TPX><ns3:Speed>{r.uniform(3, 5):.3f}</ns3:Speed>"
+            f"<ns3:Watts>{r.randint(100, 400)}</ns3:Watts></ns3:TPX></Extensions>\n"
+            f"     </Trackpoint>\n")
+    out.append('    </Track>\n   </Lap>\n  </Activity>\n </Activities>\n</TrainingCenterDatabase>\n')
+    return "".join(out).encode()
+
+def _legacy_time(node):
+    if node is None or not node.text:
+        return None
+    try:
+        return datetime.fromisoformat(node.text.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+def legacy_decode_tcx(key: str, buf: bytes) -> DecodedActivity:
+    """activity._decode_tcx before the streaming reader (reference only)."""
+    root = ET.fromstring(buf)
+    activity_node = root.find(".//tcx:Activity", TCX_NS)
+    sport = dt = None
+    if activity_node is not None:
+        sport = activity_node.attrib.get("Sport", "Other")
+        dt = _legacy_time(activity_node.find("tcx:Id", TCX_NS))
+
+    dist_m = 0
+    hr = _Series("t", "hr")
+    pos = _Series("t", "lat", "lon")
+    for tp in root.iter(f"{{{TCX_NS['tcx']}}}Trackpoint"):
+        ts = _legacy_time(tp.find("tcx:Time", TCX_NS))
+        if ts is None:
+            continue
+        hr_node = tp.find("tcx:HeartRateBpm/tcx:Value", TCX_NS)
+        if hr_node is not None:
+            hr.add(ts, int(hr_node.text))
+            dist_node = tp.find("tcx:DistanceMeters", TCX_NS)
+            if dist_node is not None and dist_node.text:
+                dist_m = int(float(dist_node.text))
+        pos_node = tp.find("tcx:Position", TCX_NS)
+        if pos_node is not None:
+            lat_node = pos_node.find("tcx:LatitudeDegrees", TCX_NS)
+            lon_node = pos_node.find("tcx:LongitudeDegrees", TCX_NS)
+            if lat_node is not None and lon_node is not None:
+                try:
+                    pos.add(ts, float(lat_node.text), float(lon_node.text))
+                except (TypeError, ValueError):
+                    pass
+
+    hr_t, hr_v = hr.arrays()
+    pos_t, lat, lon = pos.arrays()
+    return DecodedActivity(key, "tcx", sport=sport, sub_sport=None, start_time=dt, duration_s=None,
+                           distance_m=dist_m, has_summary=activity_node is not None,
+                           hr_t=hr_t, hr=hr_v, hr_tz=hr.tz, pos_t=pos_t, lat=lat, lon=lon, pos_tz=pos.tz)
+
+def same(a, b) -> bool:
+    for name in DecodedActivity.__slots__:
+        x, y = getattr(a, name), getattr(b, name)
+        if isinstance(x, np.ndarray) or isinstance(y, np.ndarray):
+            if not np.array_equal(x, y):
+                return False
+        elif x != y:
+            return False
+    return True
+
+def timed(fn, buf, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn("bench.tcx", buf)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+def peak_mb(fn, buf) -> float:
+    tracemalloc.start()
+    try:
+        fn("bench.tcx", buf)
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--legacy-max", type=int, default=10**9,
+                        help="only run the ElementTree decoder on files up to this many trackpoints")
+    parser.add_argument("--json", action="store_true", help="print a JSON report")
+    args = parser.parse_args()
+
+    report = {"repeat": args.repeat, "results": {}}
+    for seed, (label, n) in enumerate(CASES.items()):
+        buf = synthetic_tcx(n, seed)
+        mb = len(buf) / 2**20
+        new_s, new_result = timed(_decode_tcx, buf, args.repeat)
+        entry = {"points": n, "mb": round(mb, 1), "new_mb_s": round(mb / new_s, 1),
+                 "new_peak_mb": round(peak_mb(_decode_tcx, buf), 1)}
+        if n <= args.legacy_max:
+            old_s, old_result = timed(legacy_decode_tcx, buf, 1)
+            if not same(old_result, new_result):
+                raise SystemExit(f"{label}: streaming reader disagrees with the ElementTree decoder")
+            entry.update(legacy_mb_s=round(mb / old_s, 1),
+                         legacy_peak_mb=round(peak_mb(legacy_decode_tcx, buf), 1))
+        report["results"][label] = entry
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for label, e in report["results"].items():
+        legacy = (f"legacy {e['legacy_mb_s']:>6.1f} MB/s  peak {e['legacy_peak_mb']:>7.1f} MB"
+                  if "legacy_mb_s" in e else "legacy skipped")
+        print(f"  {label:<16} {e['mb']:>6.1f} MB   new {e['new_mb_s']:>6.1f} MB/s  peak {e['new_peak_mb']:>6.1f} MB"
+              f"   {legacy}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# bootstrap.py
+"""
+Minimal tenant/config bootstrap for batch jobs.
+
+run.py builds the whole web app (Flask-Login, Socket.IO, every blueprint) just to
+get at TENANTS. Cron/CLI scripts import this instead:
+
+    from bootstrap import require_tenant, tenant_storage
+    from db import tenant_context
+
+    cfg = require_tenant(args.tenant)
+    with tenant_context(None, args.tenant):
+        ...
+
+Nothing here imports Flask.
+"""
+import os
+
+import yaml
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_S3_BUCKET = os.getenv("S3_BUCKET", "eubctrackingdata")
+DEFAULT_S3_PREFIX = os.getenv("S3_PREFIX", "fitfiles")
+
+def load_tenants(path=None):
+    path = path or os.path.join(HERE, "tenants.yaml")
+    with open(path, "r") as f:
+        data = yaml.safe_load(f) or {}
+    # normalize to lowercase keys
+    return {str(k).strip().lower(): v for k, v in data.items()}
+
+TENANTS = load_tenants()
+
+def require_tenant(tenant_key: str) -> dict:
+    """Tenant config for a CLI --tenant argument, or exit with the valid choices."""
+    key = (tenant_key or "").strip().lower()
+    if key not in TENANTS:
+        raise SystemExit(f"Unknown tenant '{tenant_key}'. Available: {list(TENANTS.keys())}")
+    return TENANTS[key]
+
+def tenant_storage(tenant_key: str):
+    """(bucket, prefix) for a tenant's FIT/TCX files; prefix is namespaced by tenant."""
+    cfg = TENANTS.get(tenant_key) or {}
+    bucket = cfg.get("s3_bucket", DEFAULT_S3_BUCKET)
+    base   = cfg.get("s3_prefix", DEFAULT_S3_PREFIX)
+    return bucket, f"{base}/{tenant_key}"
@@ -1,12 +1,49 @@
 # db.py
+import os
+import re
+import sys
+import time
+import atexit
+import logging
+import threading
+from collections import deque, Counter, OrderedDict
+from functools import lru_cache
+
 import pymysql
-from types import SimpleNamespace
+from pymysql.constants import SERVER_STATUS
+from types import SimpleNamespace, MappingProxyType
 from contextlib import contextmanager
-from contextvars import ContextVar
-from flask import g, has_request_context, current_app
+from contextvars import ContextVar, copy_context
+
+logger = logging.getLogger(__name__)
+
+# Flask is only looked up lazily: batch jobs (see bootstrap.py) never import it,
+# and without Flask loaded there can't be a request context to consult.
+def has_request_context() -> bool:
+    flask = sys.modules.get("flask")
+    return flask is not None and flask.has_request_context()
+
+class _FlaskGlobal:
+    """Late-bound stand-in for flask.g / flask.request; only used inside a request."""
+
+    def __init__(self, name):
+        object.__setattr__(self, "_name", name)
+
+    def _target(self):
+        return getattr(sys.modules["flask"], self._name)
+
+    def __getattr__(self, attr):
+        return getattr(self._target(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._target(), attr, value)
+
+g = _FlaskGlobal("g")
+request = _FlaskGlobal("request")
 
 # For background jobs (no request), we store the active tenant in a contextvar.
 _active_tenant = ContextVar("_active_tenant", default=None)
+_active_tenant_key = ContextVar("_active_tenant_key", default=None)
 
 def _get_active_tenant():
     """
@@ -24,9 +61,27 @@ def _get_active_tenant():
     raise RuntimeError(
         "No active tenant bound. In web requests ensure routes are under '/<club>' "
         "and your url_value_preprocessor sets g.tenant. For background jobs, wrap the "
-        "work with tenant_context(app, '<club>')."
+        "work with tenant_context(None, '<club>')."
     )
 
+def _get_active_tenant_key():
+    """Tenant key matching _get_active_tenant() (used to pick the connection pool)."""
+    if has_request_context() and hasattr(g, "tenant"):
+        return getattr(g, "tenant_key", None)
+    return _active_tenant_key.get()
+
+def current_tenant_key():
+    """Key of the tenant bound by the current request or tenant_context(), if any."""
+    return _get_active_tenant_key()
+
+def _tenant_cache_key(db_config=None) -> str:
+    """Key for per-tenant caches/pools: the tenant key, else host/database."""
+    key = _get_active_tenant_key()
+    if key:
+        return key
+    cfg = db_config or _get_tenant_db_config()
+    return f"{cfg['host']}/{cfg['database']}"
+
 def _get_tenant_db_config():
     tenant = _get_active_tenant()
     cfg = (tenant or {}).get("db") or {}
@@ -47,26 +102,524 @@ def _get_tenant_db_config():
         "write_timeout": 15,
     }
 
-def get_db_connection():
-    """Return a new PyMySQL connection for the active tenant."""
-    return pymysql.connect(**_get_tenant_db_config())
+# -------- Connection pool --------
+# Optional per-tenant overrides live next to the credentials in tenants.yaml:
+#   db:
+#     pool_size: 5        # max open connections per tenant (per process)
+#     pool_recycle: 300   # close idle connections older than this (seconds)
+#     pool_timeout: 10    # wait this long for a free connection before failing
+DEFAULT_POOL_SIZE    = int(os.getenv("DB_POOL_SIZE", "5"))
+DEFAULT_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+DEFAULT_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Connections returned more recently than this are handed out without a ping.
+_PING_AFTER = 5.0
+# Opens a raw connection from the tenant's connect kwargs. benchmarks/ swaps in
+# an SQLite stand-in here; everything else talks to MySQL through PyMySQL.
+connect_raw = pymysql.connect
 
-def get_param(name: str, default=None):
+class ConnectionPool:
+    """Bounded pool of PyMySQL connections for one tenant database."""
+
+    def __init__(self, key: str, connect_kwargs: dict, size: int = DEFAULT_POOL_SIZE,
+                 recycle: int = DEFAULT_POOL_RECYCLE, timeout: float = DEFAULT_POOL_TIMEOUT):
+        self.key = key
+        self.connect_kwargs = connect_kwargs
+        self.size = max(1, int(size))
+        self.recycle = recycle
+        self.timeout = timeout
+        self._idle = deque()          # (raw_conn, returned_at)
+        self._open = 0                # idle + checked out
+        self._cond = threading.Condition()
+
+    def acquire(self) -> "PooledConnection":
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, returned_at = self._idle.pop()   # LIFO keeps the hot ones warm
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    raw = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    raise RuntimeError(
+                        f"Timed out after {self.timeout}s waiting for a DB connection "
+                        f"(pool size {self.size})."
+                    )
+
+        try:
+            if raw is not None:
+                raw = self._checked(raw, returned_at)
+            if raw is None:
+                raw = connect_raw(**self.connect_kwargs)
+        except Exception:
+            self._forget()
+            raise
+        return PooledConnection(self, raw)
+
+    def _checked(self, raw, returned_at):
+        """Return raw if it is still usable, else close it and return None."""
+        idle_for = time.monotonic() - returned_at
+        if self.recycle and idle_for > self.recycle:
+            self._close_quietly(raw)
+            return None
+        if idle_for > _PING_AFTER:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                self._close_quietly(raw)
+                return None
+        return raw
+
+    def release(self, raw) -> None:
+        try:
+            if raw.open and raw.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                # Never hand out a connection with a half-finished (or stale
+                # REPEATABLE READ) transaction – same effect as close() had.
+                raw.rollback()
+        except Exception:
+            self._close_quietly(raw)
+        if not raw.open:
+            self._forget()
+            return
+        with self._cond:
+            self._idle.append((raw, time.monotonic()))
+            self._cond.notify()
+
+    def _forget(self) -> None:
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def close(self) -> None:
+        """Close every idle connection (checked-out ones close on release)."""
+        with self._cond:
+            while self._idle:
+                raw, _ = self._idle.pop()
+                self._open -= 1
+                self._close_quietly(raw)
+
+    @staticmethod
+    def _close_quietly(raw) -> None:
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+class PooledConnection:
     """
-    Fetch a parameter by name from Params and return an object with `.value`.
-    Usage: foo = get_param("Foo").value
+    Thin proxy around a pooled PyMySQL connection. Behaves like the real thing
+    except close() hands it back to the pool instead of tearing down the socket.
+    """
+
+    def __init__(self, pool: ConnectionPool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def cursor(self, *args, **kwargs):
+        # The cursor keeps this handle alive, so a throwaway
+        # `get_db_connection().cursor()` can't return the socket to the pool early.
+        return InstrumentedCursor(self._raw.cursor(*args, **kwargs), self)
+
+    def close(self) -> None:
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool.release(raw)
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get("_raw")
+        if raw is None:
+            raise pymysql.err.InterfaceError(0, "Connection already returned to the pool")
+        return getattr(raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self._raw is not None:
+            try:
+                self._raw.rollback()
+            except Exception:
+                pass
+        self.close()
+
+    def __del__(self):
+        # Callers that forget conn.close() shouldn't leak a pool slot.
+        if self.__dict__.get("_raw") is not None:
+            self.close()
+
+# -------- Query instrumentation --------
+# Every execute/executemany through get_db_connection() is timed and recorded:
+#  - per request (or per tenant_context() job): query count + total DB time,
+#    logged at the end with a warning for any statement repeated more than
+#    DB_N1_THRESHOLD times (the usual N+1 pattern);
+#  - per tenant: an aggregate by SQL fingerprint, shown at /<club>/admin/db_stats.
+DB_N1_THRESHOLD = int(os.getenv("DB_N1_THRESHOLD", "10"))
+_MAX_FINGERPRINTS = 500   # per tenant; anything beyond is lumped together
+
+_SQL_COMMENT     = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_SQL_STRING      = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_SQL_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s")
+_SQL_NUMBER      = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SQL_LIST        = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SQL_ROWS        = re.compile(r"\(\?\+\)(?:\s*,\s*\(\?\+\))+")
+_SQL_SPACE       = re.compile(r"\s+")
+
+@lru_cache(maxsize=2048)
+def fingerprint_sql(sql: str) -> str:
+    """Normalise a statement so the same query shape always maps to one key."""
+    fp = _SQL_COMMENT.sub(" ", sql)
+    fp = _SQL_STRING.sub("?", fp)
+    fp = _SQL_PLACEHOLDER.sub("?", fp)
+    fp = _SQL_NUMBER.sub("?", fp)
+    fp = _SQL_LIST.sub("(?+)", fp)        # IN (?, ?, ?) and VALUES (?, ?)
+    fp = _SQL_ROWS.sub("(?+)", fp)        # multi-row VALUES
+    return _SQL_SPACE.sub(" ", fp).strip()
+
+class QueryStats:
+    """Queries issued by one request or one background job."""
+
+    __slots__ = ("count", "total", "by_fingerprint")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.by_fingerprint = Counter()
+
+    def add(self, fingerprint: str, duration: float) -> None:
+        self.count += 1
+        self.total += duration
+        self.by_fingerprint[fingerprint] += 1
+
+    def log(self, origin: str) -> None:
+        if not self.count:
+            return
+        logger.info("db: %s – %d queries, %.1f ms", origin, self.count, self.total * 1000)
+        for fingerprint, n in self.by_fingerprint.most_common():
+            if n <= DB_N1_THRESHOLD:
+                break
+            logger.warning("db: %s ran the same statement %d times (possible N+1): %s",
+                           origin, n, fingerprint)
+
+_job_query_stats = ContextVar("_job_query_stats", default=None)
+_tenant_query_stats = {}      # tenant key -> {fingerprint: aggregate dict}
+_query_stats_lock = threading.Lock()
+
+def _job_name() -> str:
+    return f"cli:{os.path.basename(sys.argv[0] or 'python')}"
+
+def _query_origin() -> str:
+    if has_request_context():
+        return request.endpoint or request.path
+    return _job_name()
+
+def _current_query_stats():
+    if has_request_context():
+        stats = g.get("_db_query_stats")
+        if stats is None:
+            stats = g._db_query_stats = QueryStats()
+        return stats
+    return _job_query_stats.get()
+
+def _record_query(tenant_key: str, sql: str, duration: float, rowcount) -> None:
+    fingerprint = fingerprint_sql(sql) if isinstance(sql, str) else repr(sql)
+    origin = _query_origin()
+
+    stats = _current_query_stats()
+    if stats is not None:
+        stats.add(fingerprint, duration)
+
+    with _query_stats_lock:
+        per_tenant = _tenant_query_stats.setdefault(tenant_key, {})
+        if fingerprint not in per_tenant and len(per_tenant) >= _MAX_FINGERPRINTS:
+            fingerprint = "<other statements>"
+        agg = per_tenant.get(fingerprint)
+        if agg is None:
+            agg = per_tenant[fingerprint] = {
+                "count": 0, "total": 0.0, "max": 0.0, "rows": 0, "origins": Counter(),
+            }
+        agg["count"] += 1
+        agg["total"] += duration
+        agg["max"] = max(agg["max"], duration)
+        agg["rows"] += rowcount if isinstance(rowcount, int) and rowcount > 0 else 0
+        agg["origins"][origin] += 1
+
+    logger.debug("db: %.1f ms rows=%s [%s] %s", duration * 1000, rowcount, origin, fingerprint)
+
+def query_stats_summary(tenant_key: str, limit: int = 100) -> list:
+    """Aggregated query stats for a tenant, most expensive statements first."""
+    with _query_stats_lock:
+        items = [(fp, dict(agg, origins=agg["origins"].most_common(3)))
+                 for fp, agg in (_tenant_query_stats.get(tenant_key) or {}).items()]
+    items.sort(key=lambda item: item[1]["total"], reverse=True)
+    return [{
+        "fingerprint": fp,
+        "count":       agg["count"],
+        "total_ms":    round(agg["total"] * 1000, 1),
+        "avg_ms":      round(agg["total"] * 1000 / agg["count"], 2),
+        "max_ms":      round(agg["max"] * 1000, 1),
+        "rows":        agg["rows"],
+        "origins":     agg["origins"],
+    } for fp, agg in items[:limit]]
+
+def reset_query_stats(tenant_key: str) -> None:
+    with _query_stats_lock:
+        _tenant_query_stats.pop(tenant_key, None)
+
+class InstrumentedCursor:
+    """Cursor proxy that records every execute/executemany (see _record_query)."""
+
+    def __init__(self, cursor, handle: PooledConnection):
+        self._cursor = cursor
+        self._handle = handle
+
+    def execute(self, query, args=None):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(query, args)
+        finally:
+            _record_query(self._handle._pool.key, query,
+                          time.perf_counter() - start, self._cursor.rowcount)
+
+    def executemany(self, query, args):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, args)
+        finally:
+            _record_query(self._handle._pool.key, query,
+                          time.perf_counter() - start, self._cursor.rowcount)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+def _finish_request_query_stats(_exc=None):
+    stats = g.pop("_db_query_stats", None)
+    if stats is not None:
+        stats.log(request.endpoint or request.path)
+
+def _release_request_connections(exc=None):
+    conns = g.pop("_db_connections", None)
+    if conns:
+        _release_connections(conns, commit=exc is None)
+
+def init_app(app) -> None:
+    """Wire the per-request DB hooks into the Flask app."""
+    app.teardown_request(_release_request_connections)
+    app.teardown_request(_finish_request_query_stats)
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+def _reset_pools_after_fork():
+    """
+    Forget the parent's pools in a forked child (gunicorn --preload workers).
+    The sockets are shared with the parent, so they're dropped, never closed.
     """
+    global _pools, _pools_lock, _pools_pid
+    _pools = {}
+    _pools_lock = threading.Lock()
+    _pools_pid = os.getpid()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+def _get_pool() -> ConnectionPool:
+    if os.getpid() != _pools_pid:
+        _reset_pools_after_fork()
+
+    kwargs = _get_tenant_db_config()
+    key = _tenant_cache_key(kwargs)
+    pool = _pools.get(key)
+    if pool is not None:
+        return pool
+
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            cfg = (_get_active_tenant() or {}).get("db") or {}
+            pool = ConnectionPool(
+                key,
+                kwargs,
+                size=cfg.get("pool_size", DEFAULT_POOL_SIZE),
+                recycle=cfg.get("pool_recycle", DEFAULT_POOL_RECYCLE),
+                timeout=cfg.get("pool_timeout", DEFAULT_POOL_TIMEOUT),
+            )
+            _pools[key] = pool
+        return pool
+
+class SharedConnection:
+    """
+    Handle onto the connection shared by a whole request (or tenant_context job).
+    commit()/rollback()/cursor() act on the shared connection; close() is a
+    no-op because the owner (teardown / tenant_context exit) releases it.
+    """
+
+    def __init__(self, conn: PooledConnection):
+        self._conn = conn
+
+    def close(self) -> None:
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            try:
+                self._conn.rollback()
+            except Exception:
+                pass
+
+# Shared connections of the current tenant_context() job: {tenant key: PooledConnection}
+_job_connections = ContextVar("_job_connections", default=None)
+
+def _shared_connections():
+    """The dict holding this request's / job's shared connections, or None."""
+    if has_request_context():
+        conns = g.get("_db_connections")
+        if conns is None:
+            conns = g._db_connections = {}
+        return conns
+    return _job_connections.get()
+
+def _release_connections(conns: dict, commit: bool) -> None:
+    while conns:
+        key, conn = conns.popitem()
+        try:
+            # Skip the round trip if the caller already committed/rolled back;
+            # a rollback of anything still open happens in ConnectionPool.release().
+            if commit and conn.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                conn.commit()
+        except Exception:
+            logger.exception("db: commit failed for tenant '%s'", key)
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+        finally:
+            conn.close()
+
+def get_db_connection():
+    """
+    Return a PyMySQL connection for the active tenant.
+
+    Inside a request (views, load_user, Socket.IO handlers) or a tenant_context()
+    job, every call returns a handle onto one lazily opened connection per tenant,
+    committed and returned to the pool when the request/job ends (rolled back on
+    an unhandled error). Anywhere else you get a pooled connection of your own;
+    conn.close() returns it to the tenant's pool.
+    """
+    conns = _shared_connections()
+    if conns is None:
+        return _get_pool().acquire()
+
+    key = _tenant_cache_key()
+    conn = conns.get(key)
+    if conn is None or conn._raw is None:
+        conn = conns[key] = _get_pool().acquire()
+    return SharedConnection(conn)
+
+def close_pools() -> None:
+    """Close all idle pooled connections (e.g. at process shutdown)."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+
+atexit.register(close_pools)
+
+# -------- Params snapshot cache --------
+# The whole Params table is small, so each tenant keeps one in-memory snapshot
+# loaded with a single query. Edits made through routes/params.py invalidate it
+# straight away (in this process); other workers pick changes up within the TTL.
+PARAMS_CACHE_TTL = float(os.getenv("PARAMS_CACHE_TTL", "60"))
+
+_params_cache = {}          # tenant key -> (loaded_at, snapshot)
+_params_generation = {}     # tenant key -> bumped on every invalidation
+_params_lock = threading.Lock()
+# Batch jobs can pin one snapshot for a whole run (see pinned_params()).
+_pinned_params = ContextVar("_pinned_params", default=None)
+
+def _load_params():
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
-            cur.execute("SELECT Value FROM Params WHERE Param = %s", (name,))
-            row = cur.fetchone()
-            if row is not None and "Value" in row:
-                return SimpleNamespace(value=row["Value"])
-            return SimpleNamespace(value=default)
+            cur.execute("SELECT Param, Value FROM Params")
+            return MappingProxyType({row["Param"]: row["Value"] for row in cur.fetchall()})
     finally:
         conn.close()
 
+def get_params():
+    """
+    Return a read-only {Param: Value} snapshot of the active tenant's Params table.
+    Served from memory until PARAMS_CACHE_TTL expires or invalidate_params() runs.
+    """
+    pinned = _pinned_params.get()
+    if pinned is not None:
+        return pinned
+
+    key = _tenant_cache_key()
+    cached = _params_cache.get(key)
+    if cached and time.monotonic() - cached[0] < PARAMS_CACHE_TTL:
+        return cached[1]
+
+    generation = _params_generation.get(key, 0)
+    loaded_at = time.monotonic()
+    snapshot = _load_params()
+    with _params_lock:
+        # Don't resurrect a snapshot that was invalidated while we were loading it.
+        if _params_generation.get(key, 0) == generation:
+            _params_cache[key] = (loaded_at, snapshot)
+    return snapshot
+
+def invalidate_params() -> None:
+    """Drop the active tenant's Params snapshot (call after writing to Params)."""
+    key = _tenant_cache_key()
+    with _params_lock:
+        _params_generation[key] = _params_generation.get(key, 0) + 1
+        _params_cache.pop(key, None)
+
+@contextmanager
+def pinned_params():
+    """
+    Pin one freshly loaded Params snapshot for the duration of a batch run, so
+    every get_param() in the job sees the same values without re-querying.
+    """
+    token = _pinned_params.set(_load_params())
+    try:
+        yield
+    finally:
+        _pinned_params.reset(token)
+
+def get_param(name: str, default=None):
+    """
+    Fetch a parameter by name from Params and return an object with `.value`.
+    Usage: foo = get_param("Foo").value
+    """
+    params = get_params()
+    if name in params:
+        return SimpleNamespace(value=params[name])
+    # Params.Param uses a case-insensitive collation in MySQL; keep that behaviour.
+    folded = name.strip().casefold()
+    for param, value in params.items():
+        if param.casefold() == folded:
+            return SimpleNamespace(value=value)
+    return SimpleNamespace(value=default)
+
 def get_param_int(name, default=None):
     v = get_param(name, default).value
     try:
@@ -80,28 +633,124 @@ def get_param_bool(name, default=None):
     if v in ("0","false","no","off"): return False
     return default
 
+# -------- Login user cache --------
+# Flask-Login reloads the user on every authenticated request. Keep the few
+# columns User needs in a small per-tenant LRU with a TTL; athlete edits and
+# password changes call invalidate_user() so this worker sees them at once.
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "512"))
+USER_CACHE_TTL  = float(os.getenv("USER_CACHE_TTL", "60"))
+
+_user_cache = OrderedDict()      # (tenant key, athlete id) -> (loaded_at, row)
+_user_cache_generation = 0
+_user_cache_lock = threading.Lock()
+
+def get_user_fields(athlete_id):
+    """
+    Return {Athlete_ID, Full_Name, Email, Coach} for an athlete of the active
+    tenant, or None. Only a cache miss touches the DB.
+    """
+    key = (_tenant_cache_key(), int(athlete_id))
+    now = time.monotonic()
+    with _user_cache_lock:
+        cached = _user_cache.get(key)
+        if cached and now - cached[0] < USER_CACHE_TTL:
+            _user_cache.move_to_end(key)
+            return cached[1]
+        generation = _user_cache_generation
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT Athlete_ID, Full_Name, Email, Coach FROM Athletes WHERE Athlete_ID = %s",
+                (key[1],)
+            )
+            row = cur.fetchone()
+    finally:
+        conn.close()
+
+    if row is not None:
+        with _user_cache_lock:
+            if generation == _user_cache_generation:
+                _user_cache[key] = (now, row)
+                _user_cache.move_to_end(key)
+                while len(_user_cache) > USER_CACHE_SIZE:
+                    _user_cache.popitem(last=False)
+    return row
+
+def invalidate_user(athlete_id) -> None:
+    """Forget the cached login fields for one athlete of the active tenant."""
+    global _user_cache_generation
+    key = (_tenant_cache_key(), int(athlete_id))
+    with _user_cache_lock:
+        _user_cache_generation += 1
+        _user_cache.pop(key, None)
+
 # -------- Background jobs helper --------
 @contextmanager
 def tenant_context(app, tenant_key: str):
     """
-    Use in cron/CLI tasks where there's no request.
+    Use in cron/CLI tasks where there's no request. All get_db_connection()
+    calls inside share one connection per tenant, committed on a clean exit
+    and rolled back if the block raises.
+
+    Pass app=None to use the tenants from bootstrap.py without importing the
+    Flask app at all (what the batch jobs do).
     Example:
-        from run import app
         from db import tenant_context, get_param
-        with app.app_context():
-            with tenant_context(app, 'sabc'):
-                print(get_param('ClubTitle').value)
+        with tenant_context(None, 'sabc'):
+            print(get_param('ClubTitle').value)
     """
-    if app is None:
-        raise RuntimeError("tenant_context requires the Flask app instance")
-    tenants = app.config.get("TENANTS", {}) or {}
+    if app is not None:
+        tenants = app.config.get("TENANTS", {}) or {}
+    else:
+        from bootstrap import TENANTS as tenants
     key = (tenant_key or "").strip().lower()
     tenant = tenants.get(key)
     if not tenant:
         raise RuntimeError(f"Unknown tenant '{tenant_key}'. Available: {list(tenants.keys())}")
 
     token = _active_tenant.set(tenant)
+    key_token = _active_tenant_key.set(key)
+    # Outside a request, the (outermost) job shares one connection per tenant
+    # and gets its own query count / DB time summary.
+    in_request = has_request_context()
+    owns_conns = not in_request and _job_connections.get() is None
+    conns_token = _job_connections.set({}) if owns_conns else None
+    stats_token = None if in_request else _job_query_stats.set(QueryStats())
+    failed = False
     try:
         yield
+    except BaseException:
+        failed = True
+        raise
     finally:
+        if conns_token is not None:
+            _release_connections(_job_connections.get(), commit=not failed)
+            _job_connections.reset(conns_token)
+        if stats_token is not None:
+            _job_query_stats.get().log(f"{_job_name()} [{key}]")
+            _job_query_stats.reset(stats_token)
+        _active_tenant_key.reset(key_token)
         _active_tenant.reset(token)
+
+def tenant_task(fn):
+    """
+    Wrap fn for a worker thread of a batch job: each call runs with the caller's
+    tenant (and pinned Params) bound, but in its own tenant_context(), so it gets
+    its own pooled connection instead of sharing the caller's across threads.
+    Not for use inside a request.
+    """
+    key = _active_tenant_key.get()
+    if not key:
+        raise RuntimeError("tenant_task() needs an active tenant_context().")
+    ctx = copy_context()
+
+    def run_bound(*args, **kwargs):
+        _job_connections.set(None)
+        with tenant_context(None, key):
+            return fn(*args, **kwargs)
+
+    def call(*args, **kwargs):
+        return ctx.copy().run(run_bound, *args, **kwargs)
+    return call
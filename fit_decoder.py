@@ -0,0 +1,309 @@
+# fit_decoder.py
+"""
+Fast path for the handful of FIT fields the importers read.
+
+fitparse decodes every field of every message – components, subfields, units –
+in pure Python, and the importers then keep four record fields and a few from
+the first session:
+
+    record    timestamp, position_lat, position_long, heart_rate
+    session   start_time, sport, sub_sport, total_elapsed_time, total_timer_time, total_distance
+    activity  timestamp (start time fallback)
+
+decode() walks the file once. Each definition message is compiled to one
+struct.Struct that unpacks only those fields (everything else is pad bytes),
+so a data message costs one unpack_from; record values go straight into flat
+arrays. Values come out as fitparse gives them: invalid values are None,
+timestamps are seconds since the Unix epoch, enums are their profile names and
+scaled fields are divided by the profile scale.
+
+Anything unusual raises FallbackRequired and the caller uses fitparse:
+compressed-timestamp headers, developer fields, chained or truncated files,
+a bad CRC, a wanted field that isn't a single integer, relative date_time
+values. fitparse then either decodes the file or reports the real error.
+"""
+import struct
+from array import array
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fitparse.profile import MESSAGE_TYPES
+
+FIT_EPOCH_S = 631065600          # 1989-12-31T00:00:00Z, FIT time zero, in Unix seconds
+MIN_DATE_TIME = 0x10000000       # smaller date_time values are relative, not absolute
+
+MESG_SESSION  = 18
+MESG_RECORD   = 20
+MESG_ACTIVITY = 34
+MESG_FIELD_DESCRIPTION  = 206
+MESG_DEVELOPER_DATA_ID  = 207
+
+# global message -> {field number: field name} for the fields we keep
+WANTED = {
+    MESG_RECORD:   {253: "timestamp", 0: "position_lat", 1: "position_long", 3: "heart_rate"},
+    MESG_SESSION:  {2: "start_time", 5: "sport", 6: "sub_sport", 7: "total_elapsed_time",
+                    8: "total_timer_time", 9: "total_distance"},
+    MESG_ACTIVITY: {253: "timestamp"},
+}
+RECORD_FIELDS = ("timestamp", "position_lat", "position_long", "heart_rate")
+
+# base type -> (struct code, size, invalid value) for integer types; other
+# types only ever appear as skipped fields, which just need their size
+INT_TYPES = {
+    0x00: ("B", 1, 0xFF),   0x01: ("b", 1, 0x7F),   0x02: ("B", 1, 0xFF),
+    0x83: ("h", 2, 0x7FFF), 0x84: ("H", 2, 0xFFFF),
+    0x85: ("i", 4, 0x7FFFFFFF), 0x86: ("I", 4, 0xFFFFFFFF),
+    0x0A: ("B", 1, 0),      0x8B: ("H", 2, 0),      0x8C: ("I", 4, 0),
+    0x8E: ("q", 8, 0x7FFFFFFFFFFFFFFF), 0x8F: ("Q", 8, 0xFFFFFFFFFFFFFFFF), 0x90: ("Q", 8, 0),
+}
+OTHER_SIZES = {0x07: 1, 0x88: 4, 0x89: 8, 0x0D: 1}
+
+def _profile_field(mesg: int, name: str):
+    for field in MESSAGE_TYPES[mesg].fields.values():
+        if field.name == name:
+            return field
+    raise KeyError(name)
+
+# enum names and scales straight from fitparse's profile, so both paths agree
+ENUMS = {name: _profile_field(MESG_SESSION, name).type.values for name in ("sport", "sub_sport")}
+SCALES = {name: _profile_field(MESG_SESSION, name).scale
+          for name in ("total_elapsed_time", "total_timer_time", "total_distance")}
+
+class FallbackRequired(Exception):
+    """The file needs something only fitparse handles."""
+
+def _crc_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+_CRC_TABLE = _crc_table()
+
+def fit_crc(data, crc: int = 0) -> int:
+    """FIT's CRC-16 (poly 0xA001, reflected); over data + its little-endian CRC it is 0."""
+    table = _CRC_TABLE
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+class _Definition:
+    """One local message type: its global number, size, and how to pull out the wanted fields."""
+
+    __slots__ = ("mesg", "size", "unpack", "names", "invalid")
+
+    def __init__(self, mesg: int, size: int, unpack, names: tuple, invalid: tuple):
+        self.mesg = mesg
+        self.size = size
+        self.unpack = unpack          # Struct.unpack_from, or None if nothing is wanted
+        self.names = names
+        self.invalid = invalid
+
+    @classmethod
+    def compile(cls, endian: str, mesg: int, field_defs: bytes) -> "_Definition":
+        wanted = WANTED.get(mesg, {})
+        fmt = [endian]; names = []; invalid = []; size = 0
+        for i in range(0, len(field_defs), 3):
+            num, field_size, base = field_defs[i], field_defs[i + 1], field_defs[i + 2]
+            int_type = INT_TYPES.get(base)
+            base_size = int_type[1] if int_type else OTHER_SIZES.get(base, 1)
+            if field_size == 0 or field_size % base_size:
+                raise FallbackRequired(f"field {num} of message {mesg} has size {field_size}")
+            size += field_size
+            name = wanted.get(num)
+            if name is None:
+                fmt.append(f"{field_size}x")
+                continue
+            if int_type is None or field_size != base_size or name in names:
+                raise FallbackRequired(f"unexpected layout for {name} in message {mesg}")
+            fmt.append(int_type[0]); names.append(name); invalid.append(int_type[2])
+        unpack = struct.Struct("".join(fmt)).unpack_from if names else None
+        return cls(mesg, size, unpack, tuple(names), tuple(invalid))
+
+    def values(self, buf, pos: int) -> dict:
+        return {name: (None if value == bad else value)
+                for name, value, bad in zip(self.names, self.unpack(buf, pos), self.invalid)}
+
+class FitData:
+    """
+    Decoded fields. `session` holds the first session's wanted fields (None if
+    the file has no session), `activity_time` the first activity timestamp;
+    the series are epoch seconds, raw semicircles and bpm as float arrays.
+    """
+
+    __slots__ = ("session", "activity_time", "hr_t", "hr", "pos_t", "lat", "lon")
+
+    def __init__(self):
+        self.session = None
+        self.activity_time = None
+        self.hr_t = array("d"); self.hr = array("d")
+        self.pos_t = array("d"); self.lat = array("d"); self.lon = array("d")
+
+def _date_time(value):
+    if value is None:
+        return None
+    if value < MIN_DATE_TIME:
+        raise FallbackRequired("relative date_time value")
+    return datetime(1970, 1, 1) + timedelta(seconds=FIT_EPOCH_S + value)
+
+def _session(values: dict) -> dict:
+    """Raw session values rendered the way fitparse renders them."""
+    out = {}
+    for name, value in values.items():
+        if name == "start_time":
+            value = _date_time(value)
+        elif name in ENUMS and value is not None:
+            value = ENUMS[name].get(value, value)
+        elif name in SCALES and value is not None:
+            value = float(value) / SCALES[name]
+        out[name] = value
+    return out
+
+def _record_reader(definition: _Definition):
+    """Indices of the record fields in the unpacked tuple (None if not defined) plus invalid values."""
+    index = [definition.names.index(name) if name in definition.names else None for name in RECORD_FIELDS]
+    invalid = [definition.invalid[i] if i is not None else None for i in index]
+    return index, invalid
+
+def decode(buf: bytes) -> FitData:
+    """Decode the wanted fields of one FIT file; raises FallbackRequired if fitparse is needed."""
+    n = len(buf)
+    if n < 14 or buf[8:12] != b".FIT":
+        raise FallbackRequired("not a FIT header")
+    header_size = buf[0]
+    if header_size not in (12, 14):
+        raise FallbackRequired(f"header size {header_size}")
+    end = header_size + struct.unpack_from("<I", buf, 4)[0]
+    if end + 2 != n:
+        raise FallbackRequired("data size doesn't match the file (chained or truncated)")
+    if header_size == 14:
+        header_crc = struct.unpack_from("<H", buf, 12)[0]
+        if header_crc and fit_crc(buf[:12]) != header_crc:
+            raise FallbackRequired("header CRC mismatch")
+    if fit_crc(buf) != 0:
+        raise FallbackRequired("file CRC mismatch")
+
+    out = FitData()
+    hr_t, hr = out.hr_t.append, out.hr.append
+    pos_t, lat, lon = out.pos_t.append, out.lat.append, out.lon.append
+    defs = {}
+    seen_activity = False
+    readers = {}              # local type -> record field indices, for record definitions
+    pos = header_size
+    try:
+        while pos < end:
+            header = buf[pos]
+            pos += 1
+            if header & 0x80:
+                raise FallbackRequired("compressed timestamp header")
+            local = header & 0x0F
+
+            if header & 0x40:
+                if header & 0x20:
+                    raise FallbackRequired("developer fields")
+                endian = ">" if buf[pos + 1] else "<"
+                mesg, num_fields = struct.unpack_from(endian + "HB", buf, pos + 2)
+                if mesg in (MESG_FIELD_DESCRIPTION, MESG_DEVELOPER_DATA_ID):
+                    raise FallbackRequired("developer data")
+                pos += 5
+                definition = _Definition.compile(endian, mesg, buf[pos:pos + 3 * num_fields])
+                pos += 3 * num_fields
+                defs[local] = definition
+                if mesg == MESG_RECORD:
+                    readers[local] = _record_reader(definition)
+                else:
+                    readers.pop(local, None)
+                continue
+
+            definition = defs.get(local)
+            if definition is None:
+                raise FallbackRequired(f"data message for undefined local type {local}")
+
+            reader = readers.get(local)
+            if reader is not None:
+                (i_ts, i_lat, i_lon, i_hr), (bad_ts, bad_lat, bad_lon, bad_hr) = reader
+                if i_ts is not None:
+                    values = definition.unpack(buf, pos)
+                    ts = values[i_ts]
+                    if ts != bad_ts:
+                        if ts < MIN_DATE_TIME:
+                            raise FallbackRequired("relative record timestamp")
+                        t = float(FIT_EPOCH_S + ts)
+                        if i_hr is not None and values[i_hr] != bad_hr:
+                            hr_t(t); hr(values[i_hr])
+                        if (i_lat is not None and i_lon is not None
+                                and values[i_lat] != bad_lat and values[i_lon] != bad_lon):
+                            pos_t(t); lat(values[i_lat]); lon(values[i_lon])
+            elif definition.mesg == MESG_SESSION:
+                if out.session is None:
+                    out.session = _session(definition.values(buf, pos) if definition.unpack else {})
+            elif definition.mesg == MESG_ACTIVITY and not seen_activity:
+                seen_activity = True
+                if definition.unpack:
+                    out.activity_time = _date_time(definition.values(buf, pos)["timestamp"])
+            pos += definition.size
+    except (struct.error, IndexError) as exc:
+        raise FallbackRequired(f"truncated message ({exc})") from exc
+    if pos != end:
+        raise FallbackRequired("last message runs past the data")
+    return out
+
+def time_created(head) -> Optional[datetime]:
+    """
+    file_id.time_created from the first bytes of a FIT file (naive UTC, as
+    fitparse gives it), or None if those bytes don't reach it. Reads only
+    message headers and sizes; no CRC check, since the file isn't all there.
+    """
+    n = len(head)
+    if n < 12 or head[8:12] != b".FIT" or head[0] not in (12, 14):
+        return None
+    pos = head[0]
+    sizes = {}                  # local type -> data message size
+    file_id = {}                # local type -> (offset of time_created, struct code) if defined
+    try:
+        while pos < n:
+            header = head[pos]
+            pos += 1
+            if header & 0x80:                       # compressed timestamp data message
+                local = (header >> 5) & 0x03
+            else:
+                local = header & 0x0F
+                if header & 0x40:
+                    endian = ">" if head[pos + 1] else "<"
+                    mesg, num_fields = struct.unpack_from(endian + "HB", head, pos + 2)
+                    pos += 5
+                    size, where = 0, None
+                    for i in range(num_fields):
+                        num, field_size, base = head[pos:pos + 3]
+                        if mesg == 0 and num == 4 and field_size == 4 and base in (0x86, 0x8C):
+                            where = (size, endian + "I")
+                        size += field_size
+                        pos += 3
+                    if header & 0x20:               # developer fields
+                        for _ in range(head[pos]):
+                            size += head[pos + 2]
+                            pos += 3
+                        pos += 1
+                    sizes[local] = size
+                    if mesg == 0:
+                        file_id[local] = where
+                    else:
+                        file_id.pop(local, None)
+                    continue
+            if local not in sizes:
+                return None
+            if local in file_id:
+                where = file_id[local]
+                if where is None or pos + sizes[local] > n:
+                    return None
+                value = struct.unpack_from(where[1], head, pos + where[0])[0]
+                if value == 0xFFFFFFFF or value < MIN_DATE_TIME:
+                    return None
+                return _date_time(value)
+            pos += sizes[local]
+    except (struct.error, IndexError, ValueError):
+        return None
+    return None
@@ -1,6 +1,5 @@
 # get_fitfiles.py
 import argparse
-import subprocess
 import os
 from os.path import basename
 import io
@@ -8,18 +7,22 @@ import gzip
 import boto3
 import dropbox
 import json, requests
+import threading
 from dropbox.files import SharedLink, FileMetadata, FolderMetadata
 import process_fit_sessions
+from activity import ACTIVITY_CACHE
+from activity_pipeline import PipelineContext, StageTimings, import_athlete_files
+from s3_index import S3Index, tenant_index
 
 
 import logging
 logging.getLogger().setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
-# CrewOptic app / DB tenant plumbing
-from run import app                    # Flask app (has TENANTS loaded)
-from db import tenant_context, get_db_connection
-from flask import current_app
+# CrewOptic tenant / DB plumbing (no Flask app needed)
+from bootstrap import TENANTS, tenant_storage
+from db import get_db_connection, pinned_params
+from tenant_jobs import DEFAULT_WORKERS, run_for_tenants, map_in_tenant, format_summary
 
 # -------------- Dropbox + S3 helpers (constructed per tenant) ---------------
 
@@ -42,16 +45,28 @@ def make_dropbox_client(cfg: dict) -> dropbox.Dropbox:
         app_secret=app_sec,
     )
 
+_local = threading.local()
+
+def dropbox_for(tenant_key: str, cfg: dict) -> dropbox.Dropbox:
+    """One Dropbox client per worker thread per tenant (the SDK's session isn't thread-safe)."""
+    clients = getattr(_local, "dropbox", None)
+    if clients is None:
+        clients = _local.dropbox = {}
+    if tenant_key not in clients:
+        clients[tenant_key] = make_dropbox_client(cfg)
+    return clients[tenant_key]
+
 def make_s3_client(_cfg: dict):
     # If you need per-tenant role/creds, pull from cfg here
     return boto3.client('s3')
 
 # ------------------------------- core logic ---------------------------------
 
-def upload_to_s3(s3, bucket: str, buf: io.BytesIO, key: str) -> None:
-    buf.seek(0)
-    s3.upload_fileobj(buf, bucket, key)
+def upload_to_s3(s3, bucket: str, body: bytes, key: str) -> str:
+    """Upload and return the new object's ETag (for the import ledger)."""
+    resp = s3.put_object(Bucket=bucket, Key=key, Body=body)
     print(f"      ↳ s3://{bucket}/{key}")
+    return resp.get("ETag")
 
 def link_root_path(dbx: dropbox.Dropbox, link_url: str) -> str:
     meta = dbx.sharing_get_shared_link_metadata(link_url)
@@ -87,14 +102,13 @@ def already_in_s3(aid, filename, s3_keys):
     want = basename(filename).strip().lower()
     return any(basename(key).strip().lower() == want for key in s3_keys)
 
-def process_athlete(dbx, s3, bucket: str, s3_prefix: str, aid: str, link: str, tenant_key: str) -> None:
-    print(f"\n• Athlete {aid}")
-    # NOTE: process_fit_sessions.iter_fit_keys_for_athlete must read from the correct S3 location.
-    # If it’s tenant-aware, pass `tenant_key` into it. Otherwise keep as-is.
-
-    process_fit_sessions.configure_storage(bucket=bucket, prefix=s3_prefix, client=s3)
-
-    s3_keys = list(process_fit_sessions.iter_fit_keys_for_athlete(aid))
+def process_athlete(dbx, s3, bucket: str, s3_prefix: str, aid: str, link: str, tenant_key: str,
+                    pipeline: PipelineContext, totals: StageTimings, index: S3Index) -> None:
+    tag = f"[{tenant_key}:{aid}]"
+    print(f"\n• {tag} Athlete {aid}")
+    # The tenant's index, not configure_storage(): that sets module globals,
+    # which other tenants' threads would be overwriting.
+    s3_keys = list(process_fit_sessions.iter_fit_keys_for_athlete(aid, index=index))
     new_files = []
 
     try:
@@ -109,54 +123,50 @@ def process_athlete(dbx, s3, bucket: str, s3_prefix: str, aid: str, link: str, t
             final_name = entry.name[:-3] if is_gz else entry.name  # strip .gz
 
             if already_in_s3(aid, final_name, s3_keys):
-                print(f"   – skipping {final_name} (already in S3)")
+                print(f"   {tag} – skipping {final_name} (already in S3)")
                 continue
 
             path = f"/{rel}/{entry.name}" if rel else f"/{entry.name}"
-            print(f"   – downloading {path.lstrip('/')}")
+            print(f"   {tag} – downloading {path.lstrip('/')}")
 
             _, resp = dbx.sharing_get_shared_link_file(url=link, path=path)
             file_bytes = gzip.GzipFile(fileobj=io.BytesIO(resp.content)).read() if is_gz else resp.content
 
             # Upload to S3 (namespace by tenant → s3_prefix already includes it)
             s3_key = f"{s3_prefix}/{aid}/{final_name}"
-            print(f"   – uploading {final_name} to S3 path: {s3_key}")
-            upload_to_s3(s3, bucket, io.BytesIO(file_bytes), s3_key)
+            print(f"   {tag} – uploading {final_name} to S3 path: {s3_key}")
+            etag = upload_to_s3(s3, bucket, file_bytes, s3_key)
+            index.add(s3_key, etag, len(file_bytes))
 
-            new_files.append(s3_key)
+            new_files.append((s3_key, file_bytes, etag))
 
     except Exception as exc:
-        print("   ! error:", exc)
+        print(f"   {tag} ! error:", exc)
         return
 
-    # Process new files (pass tenant to subprocesses so they use the same DB)
-    for s3_key in new_files:
-        print(f"   → processing {s3_key}")
-        subprocess.run(["python3", "process_fit_sessions.py",
-                        "--tenant", tenant_key, "--aid", str(aid), "--file", s3_key],
-                       check=False)
+    if not new_files:
+        return
 
-        print(f"   → processing results: {s3_key}")
-        subprocess.run(["python3", "process_results.py",
-                        "--tenant", tenant_key, "--aid", str(aid), "--file", s3_key],
-                       check=False)
+    # Sessions + results straight from the bytes we just uploaded (see activity_pipeline.py)
+    print(f"   {tag} → processing {len(new_files)} new files")
+    timings = import_athlete_files(pipeline, aid, new_files)
+    totals.merge(timings)
+    print(f"   {tag} ✓ {timings.format()}")
 
 def get_fitfiles_for_tenant(tenant_key: str):
     """
     Run the job for a single tenant. Assumes we're already inside:
-      with app.app_context():
-          with tenant_context(app, tenant_key):
-              get_fitfiles_for_tenant(tenant_key)
+      with tenant_context(None, tenant_key):
+          get_fitfiles_for_tenant(tenant_key)
+    Athletes are processed in parallel, up to the tenant's jobs.concurrency.
     """
-    cfg = current_app.config["TENANTS"][tenant_key]
+    cfg = TENANTS[tenant_key]
 
     # Per-tenant storage settings (adjust your tenants.yaml accordingly)
-    bucket    = cfg.get("s3_bucket", "eubctrackingdata")
-    base_pref = cfg.get("s3_prefix", "fitfiles")
-    s3_prefix = f"{base_pref}/{tenant_key}"  # namespacing by tenant
+    bucket, s3_prefix = tenant_storage(tenant_key)  # prefix is namespaced by tenant
 
-    dbx = make_dropbox_client(cfg)
-    s3  = make_s3_client(cfg)
+    s3  = make_s3_client(cfg)   # boto3 clients are thread-safe
+    index = tenant_index(bucket, s3_prefix, s3)   # one listing for all the tenant's athletes
 
     # Pull athletes from the tenant DB
     conn = get_db_connection()
@@ -171,11 +181,24 @@ def get_fitfiles_for_tenant(tenant_key: str):
     finally:
         conn.close()
 
-    for row in rows:
-        aid  = str(row["Athlete_ID"])
-        link = row["DropBox"]
-        print(f"Athlete {aid} → {link}")
-        process_athlete(dbx, s3, bucket, s3_prefix, aid, link, tenant_key)
+    totals = StageTimings()
+
+    with pinned_params():
+        pipeline = PipelineContext.load(tenant_key)
+
+        def athlete_job(row):
+            aid  = str(row["Athlete_ID"])
+            link = row["DropBox"]
+            print(f"[{tenant_key}] Athlete {aid} → {link}")
+            process_athlete(dropbox_for(tenant_key, cfg), s3, bucket, s3_prefix, aid, link, tenant_key,
+                            pipeline, totals, index)
+
+        failed = map_in_tenant(athlete_job, rows)
+    index.save()
+
+    print(f"[{tenant_key}] pipeline: {totals.format()}")
+    if failed:
+        raise RuntimeError(f"{failed} of {len(rows)} athletes failed")
 
 # ----------------------------------- CLI ------------------------------------
 
@@ -184,21 +207,23 @@ def main():
     grp = parser.add_mutually_exclusive_group(required=True)
     grp.add_argument("--tenant", help="Tenant key, e.g. 'eubc' or 'sabc'")
     grp.add_argument("--all", action="store_true", help="Process all tenants")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Tenants processed at once (default {DEFAULT_WORKERS})")
     args = parser.parse_args()
 
-    with app.app_context():
-        tenants = list(app.config.get("TENANTS", {}).keys())
-        keys = tenants if args.all else [args.tenant]
+    tenants = list(TENANTS.keys())
+    keys = tenants if args.all else [args.tenant]
 
-        # Basic validation
-        for k in keys:
-            if k not in tenants:
-                raise SystemExit(f"Unknown tenant '{k}'. Available: {tenants}")
+    # Basic validation
+    for k in keys:
+        if k not in tenants:
+            raise SystemExit(f"Unknown tenant '{k}'. Available: {tenants}")
 
-        for k in keys:
-            print(f"\n================= TENANT: {k} =================")
-            with tenant_context(app, k):
-                get_fitfiles_for_tenant(k)
+    runs = run_for_tenants(keys, get_fitfiles_for_tenant, workers=args.workers)
+    ACTIVITY_CACHE.prune()
+    print("\n" + format_summary(runs, "get_fitfiles"))
+    if not all(run.ok for run in runs):
+        raise SystemExit(1)
 
 if __name__ == "__main__":
     main()
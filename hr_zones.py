@@ -0,0 +1,45 @@
+# hr_zones.py
+"""
+Time in each heart-rate zone, computed over whole arrays.
+
+Each sample's zone is set by its heart-rate reserve fraction,
+
+    pct = (hr - rest_hr) / (max_hr - rest_hr)
+
+against the HR_Z0..HR_Z5 thresholds. A sample below HR_Z0 counts for nothing;
+otherwise it lands in the first zone k whose upper threshold HR_Z(k+1) it is
+below, and in zone 5 if it is below none. The time since the previous sample
+is credited to that sample's zone, so the first sample only sets the clock.
+
+Gaps are taken in whole microseconds, so the seconds match the per-sample
+timedelta loop this replaces exactly. If max_gap_s is given, no single gap
+counts for more than that, so a watch left running through a pause doesn't
+credit the pause to whichever zone the next sample lands in.
+"""
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+ZONES = 6
+
+def zone_seconds(t, hr, rest_hr: float, max_hr: float, thresholds: Sequence[float],
+                 max_gap_s: Optional[float] = None) -> List[float]:
+    """
+    Seconds in zones 0-5 for HR samples `hr` at epoch seconds `t` (arrays in
+    file order). `thresholds` are HR_Z0..HR_Z5 as reserve fractions.
+    """
+    t_us = np.rint(np.asarray(t, dtype=np.float64) * 1e6).astype(np.int64)
+    if len(t_us) < 2:
+        return [0.0] * ZONES
+    gaps = np.diff(t_us) / 1e6
+    if max_gap_s is not None:
+        gaps = np.minimum(gaps, float(max_gap_s))
+
+    pct = (np.asarray(hr, dtype=np.float64)[1:] - float(rest_hr)) / float(max_hr - rest_hr)
+    lower, upper = float(thresholds[0]), np.asarray(thresholds[1:], dtype=np.float64)
+    below = pct[:, None] < upper[None, :]
+    zone = np.where(below.any(axis=1), below.argmax(axis=1), ZONES - 1)
+    counted = pct >= lower
+    # bincount adds in sample order, as the loop did, so the sums are bit-identical
+    sums = np.bincount(zone[counted], weights=gaps[counted], minlength=ZONES)
+    return sums.astype(np.float64).tolist()        # float even when nothing counted
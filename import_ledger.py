@@ -0,0 +1,177 @@
+# import_ledger.py
+"""
+Ledger of S3 files the importers have already handled.
+
+process_fit_sessions.py and process_results.py list every athlete's prefix on
+each run. With the ledger they skip, before downloading, any file whose ETag
+matches the last time that stage processed it:
+
+    Import_Ledger (Tenant, Stage, S3_Key) -> ETag, Activity_Date, Processed_At, Outcome
+
+Stages are independent, so results can be rerun (e.g. after Pieces change)
+without re-importing sessions:
+
+    python process_results.py --tenant eubc --force                  # ignore the ledger this run
+    python import_ledger.py --tenant eubc --reset results            # forget every results entry
+    python import_ledger.py --tenant eubc --reset results --aid 12   # ... for one athlete
+
+A file whose last attempt ended in ERROR is always retried. The sessions
+stage re-checks a SKIPPED file against the current Params.Season_Start, so
+moving the season earlier imports the files it now covers.
+"""
+import argparse
+import logging
+from datetime import date, datetime
+from typing import Optional
+
+from bootstrap import require_tenant, tenant_storage
+from db import get_db_connection, tenant_context
+
+logger = logging.getLogger(__name__)
+
+STAGE_SESSIONS = "sessions"
+STAGE_RESULTS  = "results"
+STAGES = (STAGE_SESSIONS, STAGE_RESULTS)
+
+OK       = "ok"          # imported
+SKIPPED  = "skipped"     # deliberately not imported (e.g. before Season_Start)
+NO_MATCH = "no_match"    # nothing to match it against yet (no outing / pieces that day)
+ERROR    = "error"       # download or parse failed – retried next run
+
+LEDGER_DDL = """
+    CREATE TABLE IF NOT EXISTS Import_Ledger (
+        Tenant        VARCHAR(64)  NOT NULL,
+        Stage         VARCHAR(16)  NOT NULL,
+        S3_Key        VARCHAR(512) NOT NULL,
+        ETag          VARCHAR(128),
+        Activity_Date DATE,
+        Processed_At  DATETIME     NOT NULL,
+        Outcome       VARCHAR(16)  NOT NULL,
+        PRIMARY KEY (Tenant, Stage, S3_Key)
+    )
+"""
+
+LEDGER_UPSERT = (
+    "INSERT INTO Import_Ledger (Tenant, Stage, S3_Key, ETag, Activity_Date, Processed_At, Outcome)"
+    " VALUES (%s, %s, %s, %s, %s, %s, %s)"
+    " ON DUPLICATE KEY UPDATE"
+    "   ETag=VALUES(ETag),"
+    "   Activity_Date=VALUES(Activity_Date),"
+    "   Processed_At=VALUES(Processed_At),"
+    "   Outcome=VALUES(Outcome)"
+)
+
+def ensure_ledger_table(cur) -> None:
+    cur.execute(LEDGER_DDL)
+
+def normalize_etag(etag: Optional[str]) -> Optional[str]:
+    """S3 returns ETags quoted; store them bare."""
+    return etag.strip('"') if etag else None
+
+class LedgerEntry:
+    __slots__ = ("etag", "activity_date", "outcome")
+
+    def __init__(self, etag, activity_date, outcome):
+        self.etag = etag
+        self.activity_date = activity_date
+        self.outcome = outcome
+
+class ImportLedger:
+    """
+    One stage's ledger for one tenant, read once up front. record() writes
+    through the importer's cursor, so entries commit with the rows they
+    describe. With force=True every file is processed (and still recorded).
+    load=False skips creating and reading the table, for callers that only
+    record (ensure_ledger_table() must have run first). With buffered=True
+    record() only queues the row and flush() writes the queue in one
+    statement – call it before committing.
+    """
+
+    def __init__(self, cur, tenant_key: str, stage: str, force: bool = False, load: bool = True,
+                 buffered: bool = False):
+        if stage not in STAGES:
+            raise ValueError(f"Unknown ledger stage '{stage}'")
+        self.cur = cur
+        self.tenant_key = tenant_key
+        self.stage = stage
+        self.force = force
+        self.buffered = buffered
+        self.entries = {}
+        self.pending = []
+        if not load:
+            return
+        ensure_ledger_table(cur)
+        cur.execute(
+            "SELECT S3_Key, ETag, Activity_Date, Outcome FROM Import_Ledger "
+            "WHERE Tenant = %s AND Stage = %s",
+            (tenant_key, stage),
+        )
+        for row in cur.fetchall():
+            if isinstance(row, dict):
+                key, etag, day, outcome = row["S3_Key"], row["ETag"], row["Activity_Date"], row["Outcome"]
+            else:
+                key, etag, day, outcome = row
+            self.entries[key] = LedgerEntry(etag, day, outcome)
+
+    def get(self, key: str) -> Optional[LedgerEntry]:
+        return self.entries.get(key)
+
+    def is_current(self, key: str, etag: Optional[str]) -> bool:
+        """True if this stage already handled this exact version of the file."""
+        if self.force:
+            return False
+        entry = self.entries.get(key)
+        etag = normalize_etag(etag)
+        return (entry is not None and etag is not None and entry.etag == etag
+                and entry.outcome != ERROR)
+
+    def record(self, key: str, etag: Optional[str], outcome: str,
+               activity_date: Optional[date] = None) -> None:
+        etag = normalize_etag(etag)
+        self.pending.append((self.tenant_key, self.stage, key, etag, activity_date,
+                             datetime.now().replace(microsecond=0), outcome))
+        self.entries[key] = LedgerEntry(etag, activity_date, outcome)
+        if not self.buffered:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the recorded entries not written yet."""
+        if not self.pending:
+            return
+        rows, self.pending = self.pending, []
+        # PyMySQL sends an INSERT ... VALUES executemany as one multi-row statement.
+        self.cur.executemany(LEDGER_UPSERT, rows)
+
+def reset(cur, tenant_key: str, stage: str, key_prefix: Optional[str] = None) -> int:
+    """Forget a stage's entries (optionally only keys under key_prefix); returns rows removed."""
+    ensure_ledger_table(cur)
+    sql = "DELETE FROM Import_Ledger WHERE Tenant = %s AND Stage = %s"
+    params = [tenant_key, stage]
+    if key_prefix:
+        sql += " AND S3_Key LIKE %s"
+        params.append(key_prefix.replace("%", r"\%").replace("_", r"\_") + "%")
+    cur.execute(sql, tuple(params))
+    return cur.rowcount
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or reset the import ledger")
+    parser.add_argument("--tenant", required=True, help="Tenant key, e.g. 'eubc' or 'sabc'")
+    parser.add_argument("--reset", choices=STAGES, required=True,
+                        help="stage whose entries to forget, so its next run reprocesses them")
+    parser.add_argument("--aid", type=int, help="only this athlete's files")
+    args = parser.parse_args()
+
+    require_tenant(args.tenant)
+    _, prefix = tenant_storage(args.tenant)
+    key_prefix = f"{prefix}/{args.aid}/" if args.aid else None
+
+    with tenant_context(None, args.tenant):
+        conn = get_db_connection()
+        with conn.cursor() as cur:
+            removed = reset(cur, args.tenant, args.reset, key_prefix)
+        conn.commit(); conn.close()
+    print(f"Removed {removed} '{args.reset}' ledger entries for {args.tenant}"
+          + (f" (athlete {args.aid})" if args.aid else ""))
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,11 @@ from collections import defaultdict
 import argparse
 import logging
 
-# ✅ CrewOptic app + tenant context
-from run import app
-from db import get_db_connection, tenant_context, get_param
+# ✅ CrewOptic tenant context (no Flask app needed)
+from bootstrap import TENANTS, require_tenant
+from db import get_db_connection, get_param, pinned_params
 from add_elo import add_elo
+from tenant_jobs import DEFAULT_WORKERS, run_for_tenants, format_summary
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)-7s %(message)s")
 log = logging.getLogger(__name__)
@@ -129,20 +130,33 @@ def make_history(elo_history=None):
              season_start, end_date, len(history_records))
 
 
+def rebuild_tenant(tenant_key: str) -> None:
+    """ELO then History for one tenant; run inside tenant_context(None, tenant_key)."""
+    with pinned_params():
+        elo_history = add_elo()     # compute ELO first (tenant-aware)
+        make_history(elo_history)   # then write History for the season window
+
+
 def main():
     parser = argparse.ArgumentParser(description="Rebuild History for a tenant.")
-    parser.add_argument("--tenant", required=True, help="Tenant key, e.g. 'eubc' or 'sabc'")
+    grp = parser.add_mutually_exclusive_group(required=True)
+    grp.add_argument("--tenant", help="Tenant key, e.g. 'eubc' or 'sabc'")
+    grp.add_argument("--all", action="store_true", help="Rebuild every tenant")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Tenants rebuilt at once, one process each (default {DEFAULT_WORKERS})")
     args = parser.parse_args()
 
-    # Bind tenant so add_elo() and get_db_connection() use the right schema
-    with app.app_context():
-        tenants = app.config.get("TENANTS", {})
-        if args.tenant not in tenants:
-            raise SystemExit(f"Unknown tenant '{args.tenant}'. Available: {list(tenants.keys())}")
-
-        with tenant_context(app, args.tenant):
-            elo_history = add_elo()     # compute ELO first (tenant-aware)
-            make_history(elo_history)   # then write History for the season window
+    if args.all:
+        keys = list(TENANTS.keys())
+    else:
+        require_tenant(args.tenant)
+        keys = [args.tenant.strip().lower()]
+
+    # The rebuild is CPU-bound Python, so tenants run in separate processes.
+    runs = run_for_tenants(keys, rebuild_tenant, workers=args.workers, processes=True)
+    log.info("%s", format_summary(runs, "make_history"))
+    if not all(run.ok for run in runs):
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
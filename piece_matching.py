@@ -0,0 +1,162 @@
+# piece_matching.py
+"""
+Find where each piece of an outing was rowed in a GPS track.
+
+For a piece of distance D the candidate window starting at point s ends at the
+first point e with cum[e] - cum[s] >= D (or at the last point). Cumulative
+distance never decreases, so every end comes from one binary search over the
+cum array – O(N log N) per piece instead of walking e forward for each s.
+
+Windows are then taken in start order and a window replaces the current best
+when its raw duration beats the best (distance-normalised) time so far – the
+rule process_results has always used. Pieces are placed longest first; placed
+pieces are kept in a sorted interval list (Placements), and a new piece may
+only use the gap between the pieces either side of it by Piece_ID, so the
+result never overlaps and always runs in Piece_ID order. Whenever the old
+place-then-check code accepted an outing the results are identical.
+"""
+from bisect import bisect_left, bisect_right, insort
+from datetime import timedelta
+from itertools import groupby
+
+import numpy as np
+
+_US = timedelta(microseconds=1)
+_NOT_FOUND = timedelta(days=1)
+_NEVER = np.iinfo(np.int64).max
+_BLOCK = 1024
+
+def window_ends(cum, distance) -> np.ndarray:
+    """For every start s, the first e >= s with cum[e] - cum[s] >= distance, else the last index."""
+    n = len(cum)
+    starts = np.arange(n)
+    ends = np.clip(np.searchsorted(cum, cum + distance, side="left"), starts, n - 1)
+    # cum[s] + D and cum[e] - cum[s] can round differently; settle on the
+    # subtraction, which is what the comparison has always been.
+    while True:
+        short = (ends < n - 1) & (cum[ends] - cum < distance)
+        ends[short] += 1
+        early = (ends > starts) & (cum[ends - 1] - cum >= distance)
+        ends[early] -= 1
+        if not (short.any() or early.any()):
+            return ends
+
+def match_piece(cum, t_us, distance, segments=None, ends=None):
+    """
+    Best window for one piece. `cum` is cumulative metres and `t_us` elapsed
+    whole microseconds (numpy arrays). Returns (start, end, time) with time
+    scaled to exactly `distance`, or None if the track never covers it.
+    `segments` are the (lo, hi) stretches the window may use – it must start
+    at or after lo and end at or before hi – sorted and disjoint; by default
+    the whole track. `ends` is window_ends(cum, distance) if already known.
+    """
+    n = len(cum)
+    if n == 0:
+        return None
+    if ends is None:
+        ends = window_ends(cum, distance)
+    if segments is None:
+        segments = [(0, n - 1)]
+
+    best_us = _NOT_FOUND // _US
+    best = None
+    for lo, hi in segments:
+        # ends never decreases, so the starts whose window fits are one slice
+        stop = int(np.searchsorted(ends, hi, side="right"))
+        if stop <= lo:
+            continue
+        s_ends = ends[lo:stop]
+        covered = cum[s_ends] - cum[lo:stop]
+        taken = np.where(covered >= distance, t_us[s_ends] - t_us[lo:stop], _NEVER)
+        # Only windows faster than the best so far can win; check those one
+        # block at a time so the Python loop sees a handful of candidates, not N.
+        for b in range(0, len(taken), _BLOCK):
+            block = taken[b:b + _BLOCK]
+            for j in np.flatnonzero(block < best_us):
+                took = int(block[j])
+                if took < best_us:
+                    k = b + int(j)
+                    time = timedelta(microseconds=took) * distance / float(covered[k])
+                    best, best_us = (lo + k, int(s_ends[k]), time), time // _US
+    return best
+
+class Placements:
+    """
+    Pieces placed so far, kept sorted by position. Because every placement
+    respects Piece_ID order, the list is sorted by Piece_ID as well, so the
+    stretch of track a piece may still use is the gap between its Piece_ID
+    neighbours – one bisect, O(log P), instead of testing every placed piece.
+    """
+
+    __slots__ = ("starts", "ends", "ids")
+
+    def __init__(self):
+        self.starts = []; self.ends = []; self.ids = []
+
+    def gap_index(self, piece_id) -> int:
+        return bisect_left(self.ids, piece_id)
+
+    def gap_bounds(self, index: int, n: int):
+        """(lo, hi) for gap `index`: after the piece before it, before the one after it."""
+        lo = self.ends[index - 1] if index > 0 else 0
+        hi = self.starts[index] if index < len(self.starts) else n - 1
+        return lo, hi
+
+    def add(self, start: int, end: int, piece_id) -> None:
+        i = bisect_left(self.ids, piece_id)
+        self.starts.insert(i, start); self.ends.insert(i, end); self.ids.insert(i, piece_id)
+
+def _free_segments(lo, hi, windows):
+    """(lo, hi) minus the sorted, disjoint (start, end) windows already taken inside it."""
+    segments = []
+    for start, end in windows:
+        segments.append((lo, start))
+        lo = end
+    segments.append((lo, hi))
+    return segments
+
+def match_pieces(cum, t_us, pieces):
+    """
+    Place every piece, longest first, each clear of those already placed and in
+    Piece_ID order with them. Sets 'start'/'end'/'time' on each piece dict
+    (-1/-1/1 day if unmatched) and leaves `pieces` sorted by distance, longest
+    first.
+
+    Pieces of the same distance are interchangeable while searching: the
+    fastest windows are taken one at a time from the gaps (between longer
+    pieces) that still have a piece of that distance to fill, and each gap's
+    windows are then handed to its pieces in Piece_ID order. Unfilled pieces
+    in a gap are the earliest ones, as the old reordering pass had it.
+    """
+    pieces.sort(key=lambda x: x['Distance'], reverse=True)
+    for piece in pieces:
+        piece['start'] = -1; piece['end'] = -1; piece['time'] = _NOT_FOUND
+
+    n = len(cum)
+    placed = Placements()
+    for distance, group in groupby(pieces, key=lambda x: x['Distance']):
+        buckets = {}
+        for piece in sorted(group, key=lambda x: x['Piece_ID']):
+            buckets.setdefault(placed.gap_index(piece['Piece_ID']), []).append(piece)
+        gaps = sorted(buckets)
+        bounds = [placed.gap_bounds(g, n) for g in gaps]
+        taken = [[] for _ in gaps]         # sorted (start, end, time) per gap
+        ends = window_ends(cum, distance) if n else None
+
+        while True:
+            segments = []
+            for g, (lo, hi), windows in zip(gaps, bounds, taken):
+                if len(windows) < len(buckets[g]):
+                    segments += _free_segments(lo, hi, [(w[0], w[1]) for w in windows])
+            found = match_piece(cum, t_us, distance, segments, ends) if segments else None
+            if not found:
+                break
+            k = bisect_right([lo for lo, _ in bounds], found[0]) - 1
+            insort(taken[k], found)
+
+        for g, windows in zip(gaps, taken):
+            members = buckets[g]
+            for piece, (start, end, time) in zip(members[len(members) - len(windows):], windows):
+                piece['start'], piece['end'], piece['time'] = start, end, time
+                placed.add(start, end, piece['Piece_ID'])
+    return pieces
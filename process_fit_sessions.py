@@ -3,26 +3,46 @@
 Tenant-aware FIT/TCX session importer.
 
 - Requires a tenant key when run as a script: --tenant eubc
-- Uses the app's tenants config to derive S3 bucket/prefix (prefix is namespaced by tenant)
+- Uses bootstrap.py's tenants config to derive S3 bucket/prefix (prefix is namespaced by tenant)
 - Binds DB access to the tenant via db.tenant_context
 - Adds configure_storage(...) so callers can set S3 context when importing this module
-- Skips files with session dates before Params.Season_Start (YYYY-MM-DD)
+- Skips files with session dates before Params.Season_Start (YYYY-MM-DD); files last
+  uploaded before it, or whose first S3_PEEK_BYTES date them before it (FIT
+  file_id.time_created, TCX <Id>), are skipped without downloading the rest (SeasonPrefilter)
+- Pins one Params snapshot per run (zone thresholds, weights, sport factors)
+- Time in zone is summed over whole HR arrays (hr_zones.py); optional Params.HR_Max_Gap
+  (seconds) caps the time any one sample can credit, for watches left running through a pause
+- Skips files the import ledger says are unchanged since last run (--force to redo)
+- Reads each athlete's existing Sessions once and writes their new Sessions, Zones and
+  ledger entries in a few multi-row statements (SessionBatch)
+- Lists the tenant's whole prefix once per run (s3_index.py) rather than per athlete
+- Downloads files ahead of the parser on a bounded thread pool (s3_fetcher.py;
+  --fetch-workers / S3_FETCH_WORKERS, S3_FETCH_MAX_MB), retrying with backoff
+- Parses files on a process pool (--workers / IMPORT_WORKERS, --queue-depth /
+  IMPORT_QUEUE_DEPTH) while one writer commits each athlete's batch, in listing order;
+  in this process by default on a single-CPU host
 - Python 3.9 compatible
 """
 
 import argparse
-import io
 import logging
+import multiprocessing
 import os
-import xml.etree.ElementTree as ET
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
 from datetime import datetime, timezone, timedelta, date
 from typing import Iterator, Tuple, Optional, List
 
 import boto3
-from fitparse import FitFile
 
-from db import get_db_connection, get_param, tenant_context
-from run import app  # Flask app that has TENANTS loaded
+from bootstrap import require_tenant, tenant_storage
+from activity import ACTIVITY_CACHE, DecodedActivity, decode_activity, peek_start_time
+from db import get_db_connection, get_param, tenant_context, pinned_params
+from hr_zones import ZONES, zone_seconds
+from import_ledger import ImportLedger, STAGE_SESSIONS, OK, SKIPPED, ERROR
+from s3_fetcher import FETCH_WORKERS, FetchedObject, S3Fetcher, get_object_bytes, shared_client
+from s3_index import S3Index, tenant_index
 
 # ── logging ────────────────────────────────────────────────────────────────
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)-7s %(message)s")
@@ -33,6 +53,12 @@ S3_BUCKET = os.getenv("S3_BUCKET", "eubctrackingdata")
 S3_PREFIX = os.getenv("S3_PREFIX", "fitfiles")  # will become f"{base}/{tenant}"
 s3 = boto3.client("s3")  # will be reused
 
+# ── parallel import (see import_parallel; 0 workers = parse in this process) ─
+_CPUS = os.cpu_count() or 1
+# one CPU gains nothing from a pool but the cost of spawning it
+IMPORT_WORKERS     = int(os.getenv("IMPORT_WORKERS", str(min(4, _CPUS) if _CPUS >= 2 else 0)))
+IMPORT_QUEUE_DEPTH = int(os.getenv("IMPORT_QUEUE_DEPTH", "0"))   # files in flight; 0 = 4 per worker
+
 def configure_storage(bucket: str, prefix: str, client=None) -> None:
     """Allow callers (e.g. get_fitfiles.py) to set S3 bucket/prefix and client."""
     global S3_BUCKET, S3_PREFIX, s3
@@ -82,14 +108,28 @@ def iter_athletes_with_links(cur) -> Iterator[Tuple[int, str]]:
             aid, link = row
         yield int(aid), link
 
-def iter_fit_keys_for_athlete(aid: int) -> Iterator[str]:
-    pref = f"{S3_PREFIX}/{aid}/"
-    paginator = s3.get_paginator("list_objects_v2")
-    for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=pref):
+def iter_fit_objects_for_athlete(aid: int, bucket: Optional[str] = None, prefix: Optional[str] = None,
+                                 client=None, index: Optional[S3Index] = None) -> Iterator[Tuple[str, str]]:
+    """
+    (key, ETag) of FIT/TCX files under <prefix>/<aid>/, from `index` if given
+    (see s3_index.py), else listed; pass bucket/prefix/client to avoid the module globals.
+    """
+    if index is not None:
+        for obj in index.objects(aid, (".fit", ".tcx")):
+            yield obj.key, obj.etag
+        return
+    pref = f"{prefix or S3_PREFIX}/{aid}/"
+    paginator = (client or s3).get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket or S3_BUCKET, Prefix=pref):
         for obj in page.get("Contents", []):
             key = obj["Key"]
             if key.lower().endswith((".fit", ".tcx")):
-                yield key
+                yield key, obj.get("ETag")
+
+def iter_fit_keys_for_athlete(aid: int, bucket: Optional[str] = None, prefix: Optional[str] = None,
+                              client=None, index: Optional[S3Index] = None) -> Iterator[str]:
+    for key, _ in iter_fit_objects_for_athlete(aid, bucket, prefix, client, index):
+        yield key
 
 # ── HR helpers ─────────────────────────────────────────────────────────────
 
@@ -111,59 +151,56 @@ def sport_factor(activity: str) -> float:
     except Exception:
         return float(get_param("Other").value)
 
-def calculate_t2(
-    hr_data: List[Tuple[datetime, int]],
-    rest_hr: Optional[int],
-    max_hr: Optional[int],
-    activity: str
-) -> Tuple[int, List[float], float, List[float]]:
+def _zone_weights() -> List[float]:
+    return [float(get_param(f"HR_Z{i}_W").value) for i in range(ZONES)]
+
+def _max_hr_gap() -> Optional[float]:
+    """Params.HR_Max_Gap (seconds): cap on the time one HR sample can credit; unset = no cap."""
+    raw = get_param("HR_Max_Gap", None).value
+    if raw in (None, ""):
+        return None
+    try:
+        return float(raw)
+    except (TypeError, ValueError):
+        logger.warning("Invalid HR_Max_Gap param value: %r (expected seconds). Ignoring.", raw)
+        return None
+
+def zone_params() -> Tuple[Optional[List[float]], Optional[float]]:
+    """HR_Z0..HR_Z5 thresholds (None if any is unset) and HR_Max_Gap – what zone_seconds() needs from Params."""
+    try:
+        thresholds = [float(get_param(f"HR_Z{i}").value) for i in range(ZONES)]
+    except (TypeError, ValueError):
+        thresholds = None
+    return thresholds, _max_hr_gap()
+
+def session_zones(hr_t, hr, rest_hr: Optional[int], max_hr: Optional[int],
+                  thresholds: Optional[List[float]], max_gap_s: Optional[float] = None) -> List[float]:
+    """Seconds per zone; all zero without a usable Rest_HR/Max_HR. Reads no Params."""
     if not (rest_hr and max_hr and max_hr > rest_hr):
-        return 0, [0]*6, sport_factor(activity), [
-            float(get_param("HR_Z0_W").value),
-            float(get_param("HR_Z1_W").value),
-            float(get_param("HR_Z2_W").value),
-            float(get_param("HR_Z3_W").value),
-            float(get_param("HR_Z4_W").value),
-            float(get_param("HR_Z5_W").value),
-        ]
-
-    zones = [0.0] * 6
-    last_ts: Optional[datetime] = None
-
-    hr_z0 = float(get_param("HR_Z0").value)
-    hr_z1 = float(get_param("HR_Z1").value)
-    hr_z2 = float(get_param("HR_Z2").value)
-    hr_z3 = float(get_param("HR_Z3").value)
-    hr_z4 = float(get_param("HR_Z4").value)
-    hr_z5 = float(get_param("HR_Z5").value)
-
-    for ts, hr in hr_data:
-        if last_ts:
-            dsec = (ts - last_ts).total_seconds()
-            hr_pct = (hr - rest_hr) / (max_hr - rest_hr)
-            if hr_pct >= hr_z0:
-                idx = (
-                    0 if hr_pct < hr_z1 else
-                    1 if hr_pct < hr_z2 else
-                    2 if hr_pct < hr_z3 else
-                    3 if hr_pct < hr_z4 else
-                    4 if hr_pct < hr_z5 else 5
-                )
-                zones[idx] += dsec
-        last_ts = ts
-
-    weights = [
-        float(get_param("HR_Z0_W").value),
-        float(get_param("HR_Z1_W").value),
-        float(get_param("HR_Z2_W").value),
-        float(get_param("HR_Z3_W").value),
-        float(get_param("HR_Z4_W").value),
-        float(get_param("HR_Z5_W").value),
-    ]
+        return [0]*6
+    if thresholds is None:
+        raise ValueError("HR zone thresholds (Params HR_Z0..HR_Z5) are not set")
+    return zone_seconds(hr_t, hr, rest_hr, max_hr, thresholds, max_gap_s)
+
+def session_t2(zones: List[float], activity: str) -> Tuple[int, float, List[float]]:
+    """T2 minutes, sport factor and zone weights for seconds per zone."""
+    weights = _zone_weights()
     activity_factor = sport_factor(activity)
 
     t2_raw = sum(z * w for z, w in zip(zones, weights)) / 60.0
     t2 = int(round(t2_raw * activity_factor))
+    return t2, activity_factor, weights
+
+def calculate_t2(
+    hr_t,
+    hr,
+    rest_hr: Optional[int],
+    max_hr: Optional[int],
+    activity: str
+) -> Tuple[int, List[float], float, List[float]]:
+    """T2 minutes, seconds per zone, sport factor and zone weights for HR samples (epoch seconds, bpm arrays)."""
+    zones = session_zones(hr_t, hr, rest_hr, max_hr, *zone_params())
+    t2, activity_factor, weights = session_t2(zones, activity)
     return t2, zones, activity_factor, weights
 
 def classify_activity(sport: Optional[str], sub: Optional[str]) -> str:
@@ -197,190 +234,562 @@ def classify_activity(sport: Optional[str], sub: Optional[str]) -> str:
 
 # ── FIT / TCX parsing ─────────────────────────────────────────────────────
 
+class SessionSummary:
+    """One file's Sessions fields and seconds per zone – all a pool worker sends back."""
+
+    __slots__ = ("dt", "activity", "dur_s", "dist_m", "comment", "zones")
+
+    def __init__(self, dt, activity, dur_s, dist_m, comment, zones):
+        self.dt = dt
+        self.activity = activity
+        self.dur_s = dur_s
+        self.dist_m = dist_m
+        self.comment = comment
+        self.zones = zones
+
+def summarize_activity(activity: DecodedActivity, rest_hr: Optional[int], max_hr: Optional[int],
+                       thresholds: Optional[List[float]], max_gap_s: Optional[float] = None) -> SessionSummary:
+    """Session fields + zones from a decoded FIT/TCX file; no DB or Params access (see zone_params())."""
+    dt = activity.start_time or datetime.now(timezone.utc)
+
+    if activity.kind == "fit":
+        sport, sub = activity.sport, activity.sub_sport
+        activity_name = classify_activity(sport, sub)
+        comment = f"Sport: {sport} | Sub: {sub or 'n/a'}"
+        dur_s = activity.duration_s
+    else:
+        if not activity.has_summary:
+            raise ValueError("No Activity found in TCX")
+        sport = activity.sport
+        activity_name = sport.title()
+        comment = f"Sport: {sport}"
+        dur_s = int((activity.hr_time(-1) - dt).total_seconds()) if len(activity.hr_t) else 0
+
+    zones = session_zones(activity.hr_t, activity.hr, rest_hr, max_hr, thresholds, max_gap_s)
+    return SessionSummary(dt, activity_name, dur_s, activity.distance_m, comment, zones)
+
+def parse_activity(activity: DecodedActivity, rest_hr: Optional[int], max_hr: Optional[int]):
+    """Session summary + T2/zones from a decoded FIT/TCX file (see activity.py)."""
+    s = summarize_activity(activity, rest_hr, max_hr, *zone_params())
+    t2, act_factor, weights = session_t2(s.zones, s.activity)
+    return s.dt, s.activity, s.dur_s, s.dist_m, s.comment, t2, s.zones, act_factor, weights
+
 def parse_fit_bytes(buf: bytes, rest_hr: Optional[int], max_hr: Optional[int]):
-    fit = FitFile(io.BytesIO(buf)); fit.parse()
-    sport = "unknown"; sub = None; dur_s = 0; dist_m = 0; dt: Optional[datetime] = None
-
-    for msg in fit.get_messages("session"):
-        d = {f.name: f.value for f in msg}
-        sport = str(d.get("sport", sport)).lower()
-        sub   = (str(d.get("sub_sport", "")).lower() or None)
-        dur_s = int(d.get("total_elapsed_time") or d.get("total_timer_time") or 0)
-        dist_m= int(d.get("total_distance") or 0)
-        dt    = d.get("start_time", dt)
-        break
-
-    if not dt:
-        for msg in fit.get_messages("activity"):
-            dt = msg.get_value("timestamp"); break
-    dt = dt or datetime.now(timezone.utc)
-
-    activity = classify_activity(sport, sub)
-    comment  = f"Sport: {sport} | Sub: {sub or 'n/a'}"
-
-    hr_data: List[Tuple[datetime, int]] = []
-    for rec in fit.get_messages("record"):
-        hr = rec.get_value("heart_rate")
-        ts = rec.get_value("timestamp")
-        if hr is not None and ts is not None:
-            hr_data.append((ts, hr))
-
-    t2, zones, act_factor, weights = calculate_t2(hr_data, rest_hr, max_hr, activity)
-    return dt, activity, dur_s, dist_m, comment, t2, zones, act_factor, weights
+    return parse_activity(decode_activity("activity.fit", buf), rest_hr, max_hr)
 
 def parse_tcx_bytes(buf: bytes, rest_hr: Optional[int], max_hr: Optional[int]):
-    ns = {'tcx': 'http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2'}
-    root = ET.fromstring(buf)
-    activity_node = root.find(".//tcx:Activity", ns)
-    if activity_node is None:
-        raise ValueError("No Activity found in TCX")
-
-    sport = activity_node.attrib.get("Sport", "Other")
-    activity = sport.title()
-    comment = f"Sport: {sport}"
-
-    id_node = activity_node.find("tcx:Id", ns)
-    dt = datetime.fromisoformat(id_node.text.replace("Z", "+00:00")) if id_node is not None else datetime.now(timezone.utc)
-
-    dist_m = 0
-    hr_data: List[Tuple[datetime, int]] = []
-
-    for tp in root.findall(".//tcx:Trackpoint", ns):
-        ts_node = tp.find("tcx:Time", ns)
-        hr_node = tp.find("tcx:HeartRateBpm/tcx:Value", ns)
-        dist_node = tp.find("tcx:DistanceMeters", ns)
-
-        if ts_node is None or hr_node is None:
-            continue
-
-        ts = datetime.fromisoformat(ts_node.text.replace("Z", "+00:00"))
-        hr = int(hr_node.text)
-        hr_data.append((ts, hr))
-
-        if dist_node is not None and dist_node.text:
-            dist_m = int(float(dist_node.text))
-
-    dur_s = int((hr_data[-1][0] - dt).total_seconds()) if hr_data else 0
-    t2, zones, act_factor, weights = calculate_t2(hr_data, rest_hr, max_hr, activity)
-    return dt, activity, dur_s, dist_m, comment, t2, zones, act_factor, weights
+    return parse_activity(decode_activity("activity.tcx", buf), rest_hr, max_hr)
 
 def _to_time(seconds: int):
     return (datetime.min + timedelta(seconds=int(seconds))).time()
 
-def insert_zones(cur, session_id: int, zones_sec: List[float],
-                 activity_factor: float, weights: List[float]):
+def zone_rows(session_id: int, zones_sec: List[float], activity_factor: float,
+              weights: List[float]) -> List[tuple]:
+    """The six Zones rows for one session, as insert_zones() writes them."""
+    rows = []
     for zone_idx, sec in enumerate(zones_sec):
         t2_minutes = int(round((sec * weights[zone_idx]) / 60.0 * activity_factor))
+        rows.append((
+            session_id,
+            zone_idx,
+            _to_time(int(sec)),
+            float(activity_factor),
+            float(weights[zone_idx]),
+            t2_minutes,
+        ))
+    return rows
+
+def insert_zone_rows(cur, rows: List[tuple]) -> None:
+    # PyMySQL sends an INSERT ... VALUES executemany as one multi-row statement.
+    cur.executemany(
+        "INSERT INTO Zones (Session_ID, Zone, Time_In_Zone, Activity_Factor, Zone_Factor, `T2 Minutes`)"
+        " VALUES (%s, %s, %s, %s, %s, %s)"
+        " ON DUPLICATE KEY UPDATE "
+        "   Time_In_Zone=VALUES(Time_In_Zone),"
+        "   Activity_Factor=VALUES(Activity_Factor),"
+        "   Zone_Factor=VALUES(Zone_Factor),"
+        "   `T2 Minutes`=VALUES(`T2 Minutes`)",
+        rows,
+    )
+
+def insert_zones(cur, session_id: int, zones_sec: List[float],
+                 activity_factor: float, weights: List[float]):
+    insert_zone_rows(cur, zone_rows(session_id, zones_sec, activity_factor, weights))
+
+# ── UPSERT helpers ─────────────────────────────────────────────────────────
+
+def _source_key(source: Optional[str]) -> str:
+    return (source or "").rsplit("/", 1)[-1].strip().lower()
+
+def _activity_key(activity: Optional[str]) -> str:
+    # Sessions.Activity compares case-insensitively, ignoring trailing spaces, in MySQL
+    return (activity or "").rstrip().casefold()
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+class _PendingSession:
+    __slots__ = ("values", "zones", "act_factor", "weights", "session_id")
+
+    def __init__(self, values: tuple, zones, act_factor, weights):
+        self.values = values          # Sessions INSERT parameters
+        self.zones = zones
+        self.act_factor = act_factor
+        self.weights = weights
+        self.session_id = None
+
+class SessionBatch:
+    """
+    One athlete's Sessions/Zones writes for a run of files. Their existing
+    sessions are read with one query; upsert() applies the usual rules in
+    memory, against those and the sessions queued before it:
+
+      - no session that day for the activity  → insert
+      - one without a Source (manual entry)   → replace it
+      - one from the same source file         → skip
+      - otherwise (another device/file)       → insert alongside
+
+    flush() then writes everything: one DELETE for replaced rows, one
+    multi-row INSERT into Sessions, one SELECT for the new Session_IDs and
+    one executemany for all their Zones. Replaced rows are deleted before the
+    inserts, as they always were.
+    """
+
+    def __init__(self, cur, aid: int):
+        self.cur = cur
+        self.aid = int(aid)
+        self.rest_hr, self.max_hr = get_athlete_hr(cur, aid)
         cur.execute(
-            "INSERT INTO Zones (Session_ID, Zone, Time_In_Zone, Activity_Factor, Zone_Factor, `T2 Minutes`)"
-            " VALUES (%s, %s, %s, %s, %s, %s)"
-            " ON DUPLICATE KEY UPDATE "
-            "   Time_In_Zone=VALUES(Time_In_Zone),"
-            "   Activity_Factor=VALUES(Activity_Factor),"
-            "   Zone_Factor=VALUES(Zone_Factor),"
-            "   `T2 Minutes`=VALUES(`T2 Minutes`)",
-            (
-                session_id,
-                zone_idx,
-                _to_time(int(sec)),
-                float(activity_factor),
-                float(weights[zone_idx]),
-                t2_minutes,
+            "SELECT Session_ID, Session_Date, Activity, Source FROM Sessions "
+            "WHERE Athlete_ID = %s ORDER BY Session_ID",
+            (self.aid,),
+        )
+        self.known_ids = set()        # Session_IDs this batch has seen, so new ones stand out
+        self.existing = {}            # (date, activity key) -> [[Session_ID or None, Source]]
+        for row in cur.fetchall():
+            if isinstance(row, dict):
+                sid, day, act, source = row["Session_ID"], row["Session_Date"], row["Activity"], row["Source"]
+            else:
+                sid, day, act, source = row
+            self.existing.setdefault((_as_date(day), _activity_key(act)), []).append([sid, source])
+            self.known_ids.add(int(sid))
+        self.deletes = []
+        self.pending = []
+
+    def upsert(self, dt: datetime, activity: str, dur_s: int, dist_m: int, comment: str,
+               t2: int, zones: List[float], act_factor: float, weights: List[float],
+               source_raw: str) -> bool:
+        """Queue one file's session; returns False if it duplicates one already there."""
+        source = _source_key(source_raw)
+        rows = self.existing.setdefault((dt.date(), _activity_key(activity)), [])
+
+        manual = next((r for r in rows if r[1] is None), None)
+        if manual is not None:
+            rows.remove(manual)
+            self.deletes.append(manual[0])
+        elif any(_source_key(r[1]) == source for r in rows):
+            logger.debug("    · duplicate (same source) – skipped")
+            return False
+
+        values = (self.aid, dt.date(), activity, (datetime.min + timedelta(seconds=dur_s)).time(),
+                  dist_m, comment, t2, source)
+        self.pending.append(_PendingSession(values, zones, act_factor, weights))
+        rows.append([None, source])
+        return True
+
+    def flush(self) -> int:
+        """Write the queued deletes and sessions; returns how many sessions were inserted."""
+        cur = self.cur
+        if self.deletes:
+            cur.execute(
+                "DELETE FROM Sessions WHERE Session_ID IN (%s)" % ", ".join(["%s"] * len(self.deletes)),
+                tuple(self.deletes),
             )
+            self.known_ids.difference_update(self.deletes)
+            self.deletes = []
+        pending, self.pending = self.pending, []
+        if not pending:
+            return 0
+
+        cur.executemany(
+            """INSERT INTO Sessions (
+                   Athlete_ID, Session_Date, Activity, Duration,
+                   Distance, Comment, T2Minutes, Source)
+               VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+            [p.values for p in pending],
         )
 
-# ── UPSERT helpers ─────────────────────────────────────────────────────────
-
-def insert_session(cur, aid, dt, activity, dur_s, dist_m, comment, t2, source) -> int:
-    cur.execute(
-        """INSERT INTO Sessions (
-               Athlete_ID, Session_Date, Activity, Duration,
-               Distance, Comment, T2Minutes, Source)
-           VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
-        (
-            aid,
-            dt.date(),
-            activity,
-            (datetime.min + timedelta(seconds=dur_s)).time(),
-            dist_m,
-            comment,
-            t2,
-            source,
-        ),
-    )
-    session_id = cur.lastrowid
-    logger.info("    + session saved (src=%s, id=%s)", source, session_id)
-    return session_id
+        # A multi-row INSERT reports one lastrowid, so read the new IDs back:
+        # rows in the batch's date range this batch hasn't seen, paired up by
+        # (date, activity, source) in insert order.
+        waiting = {}
+        for p in pending:
+            waiting.setdefault((p.values[1], p.values[2], p.values[-1]), []).append(p)
+        days = [p.values[1] for p in pending]
+        cur.execute(
+            "SELECT Session_ID, Session_Date, Activity, Source FROM Sessions "
+            "WHERE Athlete_ID = %s AND Session_Date BETWEEN %s AND %s ORDER BY Session_ID",
+            (self.aid, min(days), max(days)),
+        )
+        for row in cur.fetchall():
+            if isinstance(row, dict):
+                sid, day, act, source = row["Session_ID"], row["Session_Date"], row["Activity"], row["Source"]
+            else:
+                sid, day, act, source = row
+            sid = int(sid)
+            if sid in self.known_ids:
+                continue
+            queue = waiting.get((_as_date(day), act, source))
+            if queue:
+                queue.pop(0).session_id = sid
+                self.known_ids.add(sid)
+
+        zones = []
+        for p in pending:
+            if p.session_id is None:
+                raise RuntimeError(f"Inserted session for athlete {self.aid} ({p.values[1]}, "
+                                   f"{p.values[2]}, {p.values[-1]}) not found")
+            logger.info("    + session saved (src=%s, id=%s)", p.values[-1], p.session_id)
+            zones += zone_rows(p.session_id, p.zones, p.act_factor, p.weights)
+            rows = self.existing[(p.values[1], _activity_key(p.values[2]))]
+            for r in rows:
+                if r[0] is None and r[1] == p.values[-1]:
+                    r[0] = p.session_id
+                    break
+        insert_zone_rows(cur, zones)
+        return len(pending)
 
 def upsert_session(cur, aid: int, dt: datetime, activity: str,
                    dur_s: int, dist_m: int, comment: str,
                    t2: int, zones: List[float], act_factor: float, weights: List[float],
                    source_raw: str):
-    source = source_raw.rsplit("/", 1)[-1].strip().lower()
-
-    cur.execute(
-        """SELECT Session_ID, Source
-             FROM Sessions
-            WHERE Athlete_ID = %s
-              AND Session_Date = %s
-              AND Activity = %s""",
-        (aid, dt.date(), activity),
-    )
-    rows = cur.fetchall()
-
-    def col(row, key, idx):
-        return row[key] if isinstance(row, dict) else row[idx]
-
-    if not rows:
-        sid = insert_session(cur, aid, dt, activity, dur_s, dist_m, comment, t2, source)
-        insert_zones(cur, sid, zones, act_factor, weights)
-        return
-
-    for r in rows:
-        if col(r, "Source", 1) is None:
-            cur.execute("DELETE FROM Sessions WHERE Session_ID = %s",
-                        (col(r, "Session_ID", 0),))
-            sid = insert_session(cur, aid, dt, activity, dur_s, dist_m, comment, t2, source)
-            insert_zones(cur, sid, zones, act_factor, weights)
-            return
-
-    if any(((col(r, "Source", 1) or "").rsplit("/", 1)[-1].strip().lower() == source) for r in rows):
-        logger.debug("    · duplicate (same source) – skipped")
-        return
-
-    sid = insert_session(cur, aid, dt, activity, dur_s, dist_m, comment, t2, source)
-    insert_zones(cur, sid, zones, act_factor, weights)
+    """One session on its own; importing many files, use a SessionBatch per athlete."""
+    batch = SessionBatch(cur, aid)
+    batch.upsert(dt, activity, dur_s, dist_m, comment, t2, zones, act_factor, weights, source_raw)
+    batch.flush()
 
 # ── S3 processing ──────────────────────────────────────────────────────────
 
-def process_single_file(cur, aid, key, season_start: Optional[date] = None):
+def import_summary(batch: SessionBatch, summary: SessionSummary, fname: str,
+                   season_start: Optional[date] = None):
+    """Queue one summarized file on its athlete's batch; returns (outcome, session date) for the ledger."""
+    day = summary.dt.date()
+    # ⛔ season filter
+    if season_start and day < season_start:
+        logger.info("    · Skipping %s (session %s < Season_Start %s)", fname, day, season_start)
+        return SKIPPED, day
+
     try:
-        buf = s3.get_object(Bucket=S3_BUCKET, Key=key)["Body"].read()
+        t2, act_factor, weights = session_t2(summary.zones, summary.activity)
     except Exception as e:
-        logger.error("    ! S3 download failed: %s", e)
-        return
-
-    rest_hr, max_hr = get_athlete_hr(cur, aid)
-    fname = key.rsplit("/", 1)[-1].lower()
+        logger.error("    ! File parse failed (%s): %s", fname, e)
+        return ERROR, None
+
+    batch.upsert(summary.dt, summary.activity, summary.dur_s, summary.dist_m, summary.comment,
+                 t2, summary.zones, act_factor, weights, fname)
+    return OK, day
+
+def import_activity(cur, aid, activity: DecodedActivity, season_start: Optional[date] = None,
+                    batch: Optional[SessionBatch] = None):
+    """
+    Session + zones for one decoded file. Returns (outcome, session date) for
+    the ledger. With a batch the session is only queued – the caller flushes it.
+    """
+    own_batch = batch is None
+    if own_batch:
+        batch = SessionBatch(cur, aid)
+    fname = activity.key.rsplit("/", 1)[-1].lower()
 
     try:
-        if fname.endswith(".fit"):
-            dt, act, dur_s, dist_m, comment, t2, zones, act_factor, weights = parse_fit_bytes(buf, rest_hr, max_hr)
-        elif fname.endswith(".tcx"):
-            dt, act, dur_s, dist_m, comment, t2, zones, act_factor, weights = parse_tcx_bytes(buf, rest_hr, max_hr)
-        else:
-            logger.warning("    ! Unsupported file type: %s", fname)
-            return
+        summary = summarize_activity(activity, batch.rest_hr, batch.max_hr, *zone_params())
     except Exception as e:
         logger.error("    ! File parse failed (%s): %s", fname, e)
-        return
+        return ERROR, None
+
+    outcome, day = import_summary(batch, summary, fname, season_start)
+    if own_batch:
+        batch.flush()
+    return outcome, day
+
+def _import_file(cur, aid, key, season_start: Optional[date], etag: Optional[str] = None,
+                 batch: Optional[SessionBatch] = None, fetched: Optional[FetchedObject] = None):
+    """Returns (outcome, ETag, session date) for the ledger. With the listing's
+    ETag, an activity already decoded (by either importer) skips the download;
+    `fetched` is the body if an S3Fetcher already downloaded it."""
+    activity = ACTIVITY_CACHE.get(key, etag)
+    if activity is None:
+        try:
+            if fetched is not None and fetched.fetched:
+                etag, buf = fetched.result()
+            else:
+                etag, buf = get_object_bytes(s3, S3_BUCKET, key)
+        except Exception as e:
+            logger.error("    ! S3 download failed: %s", e)
+            return ERROR, None, None
+
+        try:
+            activity = ACTIVITY_CACHE.decode(key, etag, buf)
+        except Exception as e:
+            logger.error("    ! File parse failed (%s): %s", key.rsplit("/", 1)[-1].lower(), e)
+            return ERROR, etag, None
+
+    outcome, day = import_activity(cur, aid, activity, season_start, batch)
+    return outcome, etag, day
+
+def process_single_file(cur, aid, key, season_start: Optional[date] = None,
+                        ledger: Optional[ImportLedger] = None, etag: Optional[str] = None,
+                        batch: Optional[SessionBatch] = None, fetched: Optional[FetchedObject] = None) -> str:
+    outcome, etag, day = _import_file(cur, aid, key, season_start, etag, batch, fetched)
+    if ledger is not None:
+        ledger.record(key, etag, outcome, day)
+    return outcome
+
+class SeasonPrefilter:
+    """
+    S3Fetcher drop() hook: (reason, session date or None) for a file that must
+    be from before Season_Start, None to download it. An object's LastModified
+    is when it was uploaded, so it can only bound the session from above –
+    anything uploaded before the season is skipped unread. Otherwise the file's
+    first bytes give the activity's start (FIT file_id.time_created, TCX <Id>).
+    Both allow `margin` for time zones; files they can't date are downloaded
+    and filtered on the parsed session as before.
+    """
+
+    __slots__ = ("season_start", "cutoff")
+
+    def __init__(self, season_start: date, margin: timedelta = timedelta(days=1)):
+        self.season_start = season_start
+        self.cutoff = season_start - margin
+
+    def __call__(self, key: str, last_modified: Optional[datetime], head: Optional[bytes]):
+        if head is None:
+            if last_modified is not None and last_modified.date() < self.cutoff:
+                return f"uploaded {last_modified.date()} < Season_Start {self.season_start}", None
+            return None
+        started = peek_start_time(key, head)
+        if started is not None and started.date() < self.cutoff:
+            return f"started {started.date()} < Season_Start {self.season_start}", started.date()
+        return None
 
-    # ⛔ season filter
-    if season_start and dt.date() < season_start:
-        logger.info("    · Skipping %s (session %s < Season_Start %s)", fname, dt.date(), season_start)
-        return
+def record_dropped(ledger: ImportLedger, f: FetchedObject) -> None:
+    """
+    Log a file SeasonPrefilter dropped. Only a dated drop (from the file's
+    first bytes) goes in the ledger – one decided from LastModified costs no
+    request to repeat, and with no date the entry couldn't be re-checked
+    against a later Season_Start.
+    """
+    reason, day = f.dropped
+    logger.info("    · Skipping %s (%s)", f.key.rsplit("/", 1)[-1].lower(), reason)
+    if day is not None:
+        ledger.record(f.key, f.etag, SKIPPED, day)
+
+def still_before_season(entry, season_start: Optional[date]) -> bool:
+    """A SKIPPED ledger entry stands only while its session date is before the current Season_Start."""
+    return season_start is not None and entry.activity_date is not None and \
+        _as_date(entry.activity_date) < season_start
+
+def changed_files(athletes, ledger: ImportLedger, index: Optional[S3Index], unchanged: list,
+                  season_start: Optional[date] = None):
+    """
+    (aid, key, ETag, size, LastModified) of each athlete's files the ledger
+    hasn't seen, for S3Fetcher.fetch(); (aid, None, None, None) marks the
+    start of an athlete. A file skipped as before the season is listed again
+    once Season_Start moves to or before its date. unchanged[0] counts the
+    files skipped.
+    """
+    for aid in athletes:
+        yield aid, None, None, None
+        if index is not None:
+            objects = ((o.key, o.etag, o.size, o.last_modified) for o in index.objects(aid, (".fit", ".tcx")))
+        else:
+            objects = ((key, etag, None, None) for key, etag in iter_fit_objects_for_athlete(aid))
+        for key, etag, size, modified in objects:
+            entry = ledger.get(key)
+            if ledger.is_current(key, etag) and (
+                    entry.outcome != SKIPPED or still_before_season(entry, season_start)):
+                unchanged[0] += 1
+                continue
+            yield aid, key, etag, size, modified
+
+def import_sequential(cur, ledger: ImportLedger, season_start: Optional[date],
+                      index: Optional[S3Index] = None, fetch_workers: int = None) -> int:
+    """Import every athlete's changed files in this process, downloads running ahead on an S3Fetcher."""
+    fetcher = S3Fetcher(s3, S3_BUCKET, fetch_workers or FETCH_WORKERS)
+    athletes = [aid for aid, _ in iter_athletes_with_links(cur)]
+    unchanged = [0]
+    batch = None
+    drop = SeasonPrefilter(season_start) if season_start else None
+    for f in fetcher.fetch(changed_files(athletes, ledger, index, unchanged, season_start), skip=ACTIVITY_CACHE.contains,
+                           drop=drop):
+        if f.key is None:
+            if batch is not None:
+                batch.flush()
+            ledger.flush()
+            batch = None
+            logger.info("Athlete %s", f.tag)
+            continue
+        if f.dropped is not None:
+            record_dropped(ledger, f)
+            continue
+        batch = batch or SessionBatch(cur, f.tag)
+        process_single_file(cur, f.tag, f.key, season_start, ledger, f.etag, batch, f)
+    if batch is not None:
+        batch.flush()
+    ledger.flush()
+    return unchanged[0]
+
+# ── parallel import ────────────────────────────────────────────────────────
+#
+# Decoding and zone maths are CPU-bound and independent per file, so a process
+# pool does them while this process only writes. A producer thread downloads
+# each athlete's changed files on an S3Fetcher and submits them; their futures go through a
+# bounded queue to the writer (the caller's thread, holding the tenant's
+# connection), which takes them in submission order – the same order as a
+# sequential run – and commits each athlete's batch as it completes.
+
+_DONE = object()
+
+def _init_worker(bucket: str, prefix: str) -> None:
+    configure_storage(bucket=bucket, prefix=prefix, client=boto3.client("s3"))
+
+def summarize_file(key: str, etag: Optional[str], rest_hr: Optional[int], max_hr: Optional[int],
+                   thresholds: Optional[List[float]], max_gap_s: Optional[float], buf: Optional[bytes] = None):
+    """
+    Pool worker: one file decoded (from `buf`, the cache, or a download) and
+    summarized. Returns (ETag, SessionSummary or None, error or None); logs and writes nothing.
+    """
+    fname = key.rsplit("/", 1)[-1].lower()
+    activity = ACTIVITY_CACHE.get(key, etag)
+    if activity is None:
+        try:
+            if buf is None:
+                etag, buf = get_object_bytes(s3, S3_BUCKET, key)
+        except Exception as e:
+            return None, None, f"S3 download failed: {e}"
+        try:
+            activity = ACTIVITY_CACHE.decode(key, etag, buf)
+        except Exception as e:
+            return etag, None, f"File parse failed ({fname}): {e}"
+    try:
+        return etag, summarize_activity(activity, rest_hr, max_hr, thresholds, max_gap_s), None
+    except Exception as e:
+        return etag, None, f"File parse failed ({fname}): {e}"
 
-    upsert_session(cur, aid, dt, act, dur_s, dist_m, comment, t2, zones, act_factor, weights, fname)
+def athlete_hr(cur) -> dict:
+    """{Athlete_ID: (Rest_HR, Max_HR)} for every athlete with a link, in one query."""
+    cur.execute("SELECT Athlete_ID, Rest_HR, Max_HR FROM Athletes WHERE DropBox IS NOT NULL")
+    out = {}
+    for row in cur.fetchall():
+        if isinstance(row, dict):
+            out[int(row["Athlete_ID"])] = (row["Rest_HR"], row["Max_HR"])
+        else:
+            out[int(row[0])] = (row[1], row[2])
+    return out
+
+def _put(out: queue.Queue, item, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _produce(pool, athletes, hr: dict, ledger: ImportLedger, zone_args, out: queue.Queue,
+             stop: threading.Event, unchanged: list, index: Optional[S3Index], fetcher: S3Fetcher,
+             season_start: Optional[date] = None) -> None:
+    """
+    Submit each athlete's changed files in listing order; (aid, None, None)
+    marks a new athlete, and a file SeasonPrefilter dropped goes through as its
+    FetchedObject for the writer to record.
+    """
+    try:
+        items = changed_files(athletes, ledger, index, unchanged, season_start)
+        drop = SeasonPrefilter(season_start) if season_start else None
+        for f in fetcher.fetch(items, skip=ACTIVITY_CACHE.contains, drop=drop):
+            if f.key is None:
+                item = (f.tag, None, None)
+            elif f.dropped is not None:
+                item = (f.tag, f.key, f)
+            elif f.error is not None:
+                future = Future()
+                future.set_result((None, None, f"S3 download failed: {f.error}"))
+                item = (f.tag, f.key, future)
+            else:
+                rest_hr, max_hr = hr.get(f.tag, (None, None))
+                future = pool.submit(summarize_file, f.key, f.etag, rest_hr, max_hr, *zone_args, f.body)
+                item = (f.tag, f.key, future)
+            if not _put(out, item, stop):
+                return
+        _put(out, _DONE, stop)
+    except BaseException as exc:        # handed to the writer, which re-raises it
+        _put(out, exc, stop)
+
+def import_parallel(conn, cur, ledger: ImportLedger, season_start: Optional[date],
+                    workers: int = None, queue_depth: int = None, index: Optional[S3Index] = None,
+                    fetch_workers: int = None) -> int:
+    """
+    Import every athlete's changed files with `workers` processes parsing and
+    at most `queue_depth` files in flight; returns how many the ledger skipped.
+    """
+    workers = max(1, workers or IMPORT_WORKERS)
+    queue_depth = max(1, queue_depth or IMPORT_QUEUE_DEPTH or 4 * workers)
+    athletes = [aid for aid, _ in iter_athletes_with_links(cur)]
+    hr = athlete_hr(cur)
+    zone_args = zone_params()
+    logger.info("Parsing with %d worker processes (queue depth %d)", workers, queue_depth)
+
+    out = queue.Queue(maxsize=queue_depth)
+    stop = threading.Event()
+    unchanged = [0]
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker, initargs=(S3_BUCKET, S3_PREFIX))
+    producer = threading.Thread(target=_produce, name="fit-producer", daemon=True,
+                                args=(pool, athletes, hr, ledger, zone_args, out, stop, unchanged, index,
+                                      S3Fetcher(s3, S3_BUCKET, fetch_workers or FETCH_WORKERS), season_start))
+    batch = None
+
+    def finish_athlete():
+        if batch is not None:
+            batch.flush()
+        ledger.flush()
+        conn.commit()
+
+    producer.start()
+    try:
+        while True:
+            item = out.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            aid, key, future = item
+            if key is None:
+                finish_athlete()
+                batch = None
+                logger.info("Athlete %s", aid)
+                continue
+            if isinstance(future, FetchedObject):
+                record_dropped(ledger, future)
+                continue
+
+            try:
+                etag, summary, error = future.result()
+            except Exception as e:          # e.g. a worker process died
+                etag, summary, error = None, None, f"Worker failed: {e}"
+            if error:
+                logger.error("    ! %s", error)
+                outcome, day = ERROR, None
+            else:
+                batch = batch or SessionBatch(cur, aid)
+                outcome, day = import_summary(batch, summary, key.rsplit("/", 1)[-1].lower(), season_start)
+            ledger.record(key, etag, outcome, day)
+        finish_athlete()
+    finally:
+        stop.set()
+        producer.join()
+        pool.shutdown(wait=True, cancel_futures=True)
+    return unchanged[0]
 
 # ── main ───────────────────────────────────────────────────────────────────
 
@@ -389,42 +798,48 @@ def main():
     parser.add_argument('--tenant', required=True, help="Tenant key, e.g. 'eubc' or 'sabc'")
     parser.add_argument('--aid', type=int, help="Athlete ID (optional if processing all)")
     parser.add_argument('--file', help="Specific S3 key to process (optional)")
+    parser.add_argument('--force', action='store_true',
+                        help="Reprocess files the import ledger has already seen")
+    parser.add_argument('--workers', type=int, default=IMPORT_WORKERS,
+                        help="Parser processes (0 = parse in this process)")
+    parser.add_argument('--queue-depth', type=int, default=IMPORT_QUEUE_DEPTH,
+                        help="Max files parsed ahead of the writer (0 = 4 per worker)")
+    parser.add_argument('--fetch-workers', type=int, default=FETCH_WORKERS,
+                        help="Concurrent S3 downloads")
     args = parser.parse_args()
 
-    with app.app_context():
-        tenants = app.config.get("TENANTS", {})
-        if args.tenant not in tenants:
-            raise SystemExit(f"Unknown tenant '{args.tenant}'. Available: {list(tenants.keys())}")
+    require_tenant(args.tenant)
+    bucket, prefix = tenant_storage(args.tenant)
+    configure_storage(bucket=bucket, prefix=prefix, client=shared_client(args.fetch_workers))
 
-        cfg = tenants[args.tenant]
-        bucket = cfg.get("s3_bucket", S3_BUCKET)
-        base   = cfg.get("s3_prefix", "fitfiles")
-        prefix = f"{base}/{args.tenant}"
-
-        configure_storage(bucket=bucket, prefix=prefix)
-
-        with tenant_context(app, args.tenant):
-            # Read once per run
-            season_start = _season_start_date()
-            if season_start:
-                logger.info("Season_Start = %s (files earlier than this will be skipped)", season_start)
-            else:
-                logger.info("No Season_Start set; all files will be considered.")
+    with tenant_context(None, args.tenant), pinned_params():
+        # Read once per run
+        season_start = _season_start_date()
+        if season_start:
+            logger.info("Season_Start = %s (files earlier than this will be skipped)", season_start)
+        else:
+            logger.info("No Season_Start set; all files will be considered.")
 
-            conn = get_db_connection(); cur = conn.cursor()
-            logger.info("Importing FIT sessions from s3://%s/%s → MySQL (%s) …",
-                        S3_BUCKET, S3_PREFIX, args.tenant)
+        conn = get_db_connection(); cur = conn.cursor()
+        logger.info("Importing FIT sessions from s3://%s/%s → MySQL (%s) …",
+                    S3_BUCKET, S3_PREFIX, args.tenant)
 
-            if args.aid and args.file:
-                process_single_file(cur, args.aid, args.file, season_start)
+        ledger = ImportLedger(cur, args.tenant, STAGE_SESSIONS, force=args.force, buffered=True)
+        if args.aid and args.file:
+            process_single_file(cur, args.aid, args.file, season_start, ledger)
+        else:
+            index = tenant_index(S3_BUCKET, S3_PREFIX, s3)
+            if args.workers > 0:
+                unchanged = import_parallel(conn, cur, ledger, season_start, args.workers, args.queue_depth,
+                                            index, args.fetch_workers)
             else:
-                for aid, _ in iter_athletes_with_links(cur):
-                    logger.info("Athlete %s", aid)
-                    for key in iter_fit_keys_for_athlete(aid):
-                        process_single_file(cur, aid, key, season_start)
+                unchanged = import_sequential(cur, ledger, season_start, index, args.fetch_workers)
+            logger.info("%d unchanged files skipped (ledger)", unchanged)
+        ledger.flush()
 
-            conn.commit(); cur.close(); conn.close()
-            logger.info("✓ All done")
+        conn.commit(); cur.close(); conn.close()
+        ACTIVITY_CACHE.prune()
+        logger.info("✓ All done")
 
 if __name__ == "__main__":
     main()
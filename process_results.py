@@ -1,22 +1,23 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
-import io
 import os
 import logging
 import argparse
-import xml.etree.ElementTree as ET
-from math import sin, cos, sqrt, atan2, radians
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timedelta
 from typing import Iterator, Tuple, Optional, List
-from collections import defaultdict
 
 import boto3
-from fitparse import FitFile
 
-# 🔑 CrewOptic app & tenant plumbing
-from run import app                     # Flask app (loads TENANTS)
+# 🔑 CrewOptic tenant plumbing (no Flask app needed)
+from bootstrap import require_tenant, tenant_storage
+from activity import ACTIVITY_CACHE, DecodedActivity, decode_activity
 from db import get_db_connection, tenant_context
+from import_ledger import ImportLedger, STAGE_RESULTS, OK, SKIPPED, NO_MATCH, ERROR
+from piece_matching import match_pieces
+from s3_fetcher import FETCH_WORKERS, FetchedObject, S3Fetcher, get_object_bytes, shared_client
+from s3_index import S3Index, tenant_index
+from track import Track
 
 # ── storage config (overridden per-tenant in main() or by callers) ────────
 S3_BUCKET = os.getenv("S3_BUCKET", "eubctrackingdata")
@@ -31,9 +32,6 @@ def configure_storage(bucket: str, prefix: str, client=None) -> None:
     if client is not None:
         s3 = client
 
-# Helper – FIT stores lat/lon as “semicircles”
-SEMICIRCLES_TO_DEGREES = 180.0 / 2**31
-
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)-7s %(message)s")
 logger = logging.getLogger(__name__)
 
@@ -60,7 +58,12 @@ def iter_athletes_with_links(cur) -> Iterator[Tuple[int, str]]:
             aid, link = row
         yield int(aid), link
 
-def iter_fit_keys_for_athlete(aid: int) -> Iterator[str]:
+def iter_fit_objects_for_athlete(aid: int, index: Optional[S3Index] = None) -> Iterator[Tuple[str, str]]:
+    """(key, ETag) of every FIT file under the athlete's prefix – from `index` if given, else listed."""
+    if index is not None:
+        for obj in index.objects(aid, (".fit",)):
+            yield obj.key, obj.etag
+        return
     # NOTE: S3_PREFIX is tenant-namespaced in main()
     pref = f"{S3_PREFIX}/{aid}/"
     paginator = s3.get_paginator("list_objects_v2")
@@ -68,106 +71,42 @@ def iter_fit_keys_for_athlete(aid: int) -> Iterator[str]:
         for obj in page.get("Contents", []):
             key = obj["Key"]
             if key.lower().endswith(".fit"):
-                yield key
-
-def get_distance(lat1, lon1, lat2, lon2):
-    R = 6371000
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    return R * c
-
-def get_points(points):
-    Smooth_Points = 4
-    total_distance = 0
-    prev_point = None
-
-    for point in points:
-        if point['pt_no'] == 0 or prev_point is None:
-            point['distance'] = 0
-            point['total_distance'] = 0
-            point['pace'] = timedelta(minutes=10)
-            point['smoothed'] = timedelta(hours=1)
+                yield key, obj.get("ETag")
+
+def iter_fit_keys_for_athlete(aid: int, index: Optional[S3Index] = None) -> Iterator[str]:
+    for key, _ in iter_fit_objects_for_athlete(aid, index):
+        yield key
+
+def athlete_piece_days(cur) -> set:
+    """{(Athlete_ID, Outing_Date)} for every outing with pieces the athlete had a seat in."""
+    cur.execute("""
+        SELECT DISTINCT s.Athlete_ID, o.Outing_Date
+          FROM Seats s
+          JOIN Crews c   ON s.Crew_ID   = c.Crew_ID
+          JOIN Outings o ON c.Outing_ID = o.Outing_ID
+          JOIN Pieces p  ON p.Outing_ID = o.Outing_ID
+         WHERE s.Athlete_ID IS NOT NULL
+    """)
+    days = set()
+    for row in cur.fetchall():
+        if isinstance(row, dict):
+            days.add((row["Athlete_ID"], row["Outing_Date"]))
         else:
-            distance = get_distance(
-                radians(point['latitude']),  radians(point['longitude']),
-                radians(prev_point['latitude']), radians(prev_point['longitude'])
-            ) or 0.00001
-
-            point['distance'] = distance
-            total_distance += distance
-            point['total_distance'] = total_distance
-            point['pace'] = (point['time'] - prev_point['time']) * 500 / distance
-
-            if point['pt_no'] >= Smooth_Points:
-                point['smoothed'] = (
-                    (point['time'] - points[point['pt_no']-Smooth_Points]['time']) * 500 /
-                    (total_distance - points[point['pt_no']-Smooth_Points]['total_distance'])
-                )
-            else:
-                point['smoothed'] = point['pace']
-
-        prev_point = point
-    return points
-
-def parse_fit(fitfile):
-    points, pt_no = [], 0
-    for record in fitfile.get_messages('record'):
-        lat_semis = record.get_value('position_lat')
-        lon_semis = record.get_value('position_long')
-        ts        = record.get_value('timestamp')
-        if lat_semis is None or lon_semis is None or ts is None:
-            continue
-        latitude  = lat_semis * SEMICIRCLES_TO_DEGREES
-        longitude = lon_semis * SEMICIRCLES_TO_DEGREES
-        points.append({
-            'pt_no': pt_no, 'latitude': latitude, 'longitude': longitude,
-            'time': ts, 'distance': 0, 'total_distance': 0,
-            'pace': timedelta(minutes=10), 'smoothed': timedelta(hours=1)
-        })
-        pt_no += 1
-    return get_points(points)
-
-def parse_tcx_bytes(buf: bytes):
-    ns = {'tcx': 'http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2'}
-    root = ET.fromstring(buf)
-    trackpoints = root.findall('.//tcx:Trackpoint', ns)
-
-    points = []; pt_no = 0
-    for tp in trackpoints:
-        time_node = tp.find("tcx:Time", ns)
-        pos_node  = tp.find("tcx:Position", ns)
-        if time_node is None or pos_node is None:
-            continue
-        lat_node = pos_node.find("tcx:LatitudeDegrees", ns)
-        lon_node = pos_node.find("tcx:LongitudeDegrees", ns)
-        if lat_node is None or lon_node is None:
-            continue
-        try:
-            timestamp = datetime.fromisoformat(time_node.text.replace("Z", "+00:00"))
-            lat = float(lat_node.text); lon = float(lon_node.text)
-        except Exception:
-            continue
-        points.append({
-            'pt_no': pt_no, 'latitude': lat, 'longitude': lon,
-            'time': timestamp, 'distance': 0, 'total_distance': 0,
-            'pace': timedelta(minutes=10), 'smoothed': timedelta(hours=1),
-        })
-        pt_no += 1
-    return get_points(points)
-
-def parse_fit_bytes(buf: bytes):
-    fit = FitFile(io.BytesIO(buf)); fit.parse()
-    return parse_fit(fit)
-
-def parse_file_bytes(key: str, buf: bytes):
-    if key.lower().endswith(".tcx"):
-        return parse_tcx_bytes(buf)
-    elif key.lower().endswith(".fit"):
-        return parse_fit_bytes(buf)
-    else:
-        raise ValueError(f"Unsupported file type for key: {key}")
+            days.add((row[0], row[1]))
+    return days
+
+def parse_activity(activity: DecodedActivity) -> Track:
+    """GPS track of a decoded FIT/TCX file (see activity.py / track.py)."""
+    return activity.track(smooth_points=4)
+
+def parse_fit_bytes(buf: bytes) -> Track:
+    return parse_activity(decode_activity("activity.fit", buf))
+
+def parse_tcx_bytes(buf: bytes) -> Track:
+    return parse_activity(decode_activity("activity.tcx", buf))
+
+def parse_file_bytes(key: str, buf: bytes) -> Track:
+    return parse_activity(decode_activity(key, buf))
 
 def get_outings(ts: datetime, aid: int, cur):
     dt = ts.date()
@@ -187,69 +126,57 @@ def get_pieces(outingid: int, cur):
     cur.execute("SELECT * FROM Pieces WHERE Outing_ID = %s", (outingid,))
     return cur.fetchall()
 
-def get_gmt(boat_type: str, distance: float, time: timedelta, cur) -> Optional[float]:
-    cur.execute("SELECT GMT FROM GMTs WHERE Boat_Type = %s", (boat_type,))
-    row = cur.fetchone()
-    if not row or ('GMT' not in row if isinstance(row, dict) else False):
+class ResultLookups:
+    """
+    Reference data insert_results needs, read once per run instead of once per
+    piece: GMT per boat type, and the crews that can't be rated (an empty seat
+    or a coach in the boat).
+    """
+
+    __slots__ = ("gmts", "unrateable")
+
+    def __init__(self, gmts: dict, unrateable: set):
+        self.gmts = gmts
+        self.unrateable = unrateable
+
+    @classmethod
+    def load(cls, cur) -> "ResultLookups":
+        cur.execute("SELECT Boat_Type, GMT FROM GMTs")
+        gmts = {}
+        for row in cur.fetchall():
+            if isinstance(row, dict):
+                gmts[row["Boat_Type"]] = row["GMT"]
+            else:
+                gmts[row[0]] = row[1]
+        cur.execute("""
+            SELECT DISTINCT s.Crew_ID
+              FROM Seats s
+              LEFT JOIN Athletes a ON a.Athlete_ID = s.Athlete_ID
+             WHERE s.Athlete_ID IS NULL OR a.Coach = 1
+        """)
+        unrateable = {row_val(row, "Crew_ID" if isinstance(row, dict) else 0) for row in cur.fetchall()}
+        return cls(gmts, unrateable)
+
+    def is_crew_unrateable(self, crew_id: int) -> bool:
+        return crew_id in self.unrateable
+
+def get_gmt(boat_type: str, distance: float, time: timedelta, gmts: dict) -> Optional[float]:
+    gmt_value = gmts.get(boat_type)
+    if gmt_value is None:
         print(f"⚠️ No GMT entry found for Boat_Type '{boat_type}'"); return None
 
-    gmt_value = row['GMT'] if isinstance(row, dict) else row[0]
     gmt_seconds = gmt_value.total_seconds()
     actual_seconds = time.total_seconds()
     if actual_seconds == 0: return None
     # percent of GMT over 2k scaled to piece distance
     return (gmt_seconds * distance) / (actual_seconds * 2000)
 
-def get_results(points, pieces):
-    pieces.sort(key=lambda x: x['Distance'], reverse=True)
-    for piece in pieces:
-        piece['start'] = -1; piece['end'] = -1; piece['time'] = timedelta(days=1)
-
-    for i, piece in enumerate(pieces):
-        for start_index, point in enumerate(points):
-            end_index = start_index
-            while (end_index < len(points) - 1 and
-                   points[end_index]['total_distance'] - point['total_distance'] < piece['Distance']):
-                end_index += 1
-            if end_index >= len(points): continue
-
-            time_taken = points[end_index]['time'] - point['time']
-            distance_covered = points[end_index]['total_distance'] - point['total_distance']
-
-            if time_taken < piece['time'] and distance_covered >= piece['Distance']:
-                proposed_start = point['pt_no']; proposed_end = points[end_index]['pt_no']
-                # avoid overlaps with earlier (longer) pieces we already placed
-                overlap = any(not (proposed_end <= p['start'] or proposed_start >= p['end'])
-                              for p in pieces[:i])
-                if not overlap:
-                    piece['start'] = proposed_start
-                    piece['end']   = proposed_end
-                    piece['time']  = time_taken * piece['Distance'] / (
-                        points[piece['end']]['total_distance'] - points[piece['start']]['total_distance']
-                    )
-    return pieces
-
-def reorder_same_distance_pieces(pieces):
-    groups = defaultdict(list)
-    for piece in pieces: groups[piece['Distance']].append(piece)
-    reordered = []
-    for _, group in groups.items():
-        if len(group) == 1:
-            reordered.extend(group); continue
-        matched_results = [
-            {'start': p['start'], 'end': p['end'], 'time': p['time']}
-            for p in sorted(group, key=lambda p: p['start'])
-        ]
-        sorted_by_id = sorted(group, key=lambda p: p['Piece_ID'])
-        for piece, result in zip(sorted_by_id, matched_results):
-            piece['start'] = result['start']; piece['end'] = result['end']; piece['time'] = result['time']
-        reordered.extend(sorted_by_id)
-    pieces[:] = reordered
-
-def check_chronological_validity(pieces):
-    chronological = sorted(pieces, key=lambda p: p['start'])
-    piece_ids = [p['Piece_ID'] for p in chronological]
-    return piece_ids == sorted(piece_ids), chronological
+def get_results(track: Track, pieces):
+    """
+    Match pieces to the track (see piece_matching): no overlaps, and Piece_IDs
+    in chronological order. Pieces end up longest first.
+    """
+    return match_pieces(track.cum, track.t_us, pieces)
 
 def format_time(dt):
     if isinstance(dt, datetime):
@@ -262,37 +189,28 @@ def format_time(dt):
         return f"{hours:02}:{minutes:02}:{seconds:02}.{centi:02}"
     return None
 
-def is_crew_unrateable(cur, crew_id: int) -> bool:
-    cur.execute("""
-        SELECT EXISTS (
-            SELECT 1
-              FROM Seats s
-              LEFT JOIN Athletes a ON a.Athlete_ID = s.Athlete_ID
-             WHERE s.Crew_ID = %s
-               AND (s.Athlete_ID IS NULL OR a.Coach = 1)
-        ) AS unrateable
-    """, (crew_id,))
-    row = cur.fetchone()
-    val = row["unrateable"] if isinstance(row, dict) else row[0]
-    return bool(val)
-
-def insert_results(cursor, pieces, points, outings, aid):
+def insert_results(cursor, pieces, track: Track, outings, aid, lookups: ResultLookups):
     crew_id = outings[0]['Crew_ID']
-    unrated = 1 if is_crew_unrateable(cursor, crew_id) else 0
+    boat_type = outings[0]['Boat_Type']
+    unrated = 1 if lookups.is_crew_unrateable(crew_id) else 0
 
+    rows = []
     for piece in pieces:
         if piece['start'] < 0 or piece['end'] < 0:  # skip unmatched pieces
             continue
 
-        piece_id   = piece['Piece_ID']
-        start_time = format_time(points[piece['start']]['time'])
-        end_time   = format_time(points[piece['end']]['time'])
-        time_taken = format_time(piece['time'])
-
-        gmt_ratio = get_gmt(outings[0]['Boat_Type'], piece['Distance'], piece['time'], cursor)
-        gmt_percent = 100 * gmt_ratio if gmt_ratio is not None else None
+        gmt_ratio = get_gmt(boat_type, piece['Distance'], piece['time'], lookups.gmts)
+        rows.append((
+            piece['Piece_ID'], crew_id,
+            format_time(track.time(piece['start'])), format_time(track.time(piece['end'])),
+            format_time(piece['time']), aid,
+            100 * gmt_ratio if gmt_ratio is not None else None, unrated,
+        ))
+    if not rows:
+        return
 
-        sql = """
+    # PyMySQL sends an INSERT ... VALUES executemany as one multi-row statement.
+    cursor.executemany("""
         INSERT INTO Results (
             Piece_ID, Crew_ID, Start, Finish, Time, Source, GMT_Percent, Unrated
         ) VALUES (
@@ -305,57 +223,97 @@ def insert_results(cursor, pieces, points, outings, aid):
             Source      = VALUES(Source),
             GMT_Percent = VALUES(GMT_Percent),
             Unrated     = VALUES(Unrated)
-        """
-        cursor.execute(sql, (
-            piece_id, crew_id, start_time, end_time, time_taken,
-            aid, gmt_percent, unrated
-        ))
-
-def process_single_result(cur, aid: int, key: str):
-    try:
-        buf = s3.get_object(Bucket=S3_BUCKET, Key=key)["Body"].read()
-    except Exception as e:
-        logger.error("    ! S3 download failed: %s", e)
-        return
+    """, rows)
 
+def match_activity(cur, aid: int, activity: DecodedActivity, lookups: Optional[ResultLookups] = None):
+    """Match one decoded file against the athlete's pieces. Returns (outcome, activity date) for the ledger."""
     try:
-        points = parse_file_bytes(key, buf)
+        track = parse_activity(activity)
     except Exception as e:
         logger.error("    ! File parsing failed: %s", e)
-        return
+        return ERROR, None
 
-    if not points or len(points) < 2:
-        print("No points"); return
+    if len(track) < 2:
+        print("No points"); return SKIPPED, None
 
-    print("Points:", points[-1]['pt_no'], points[1]['time'])
+    print("Points:", len(track) - 1, track.time(1))
+    day = track.time(1).date()
 
-    outings = get_outings(points[1]['time'], aid, cur)
+    outings = get_outings(track.time(1), aid, cur)
     if not outings:
-        print("No outings"); return
+        print("No outings"); return NO_MATCH, day
 
     print("Outing:", outings[0]['Outing_ID'])
+    if lookups is None:
+        lookups = ResultLookups.load(cur)
 
+    outcome = NO_MATCH
     for outing in outings:
         pieces = get_pieces(outing['Outing_ID'], cur)
         if not pieces:
             print("No pieces"); continue
 
-        pieces = get_results(points, pieces)
-        reorder_same_distance_pieces(pieces)
-
-        is_valid, ordered_pieces = check_chronological_validity(pieces)
-        if is_valid:
-            print("✅ Pieces are in valid chronological order.")
-            for piece in pieces:
-                if piece['start'] >= 0 and piece['end'] >= 0:
-                    print(
-                        f"Piece {piece['Piece_ID']}: start={piece['start']} end={piece['end']} "
-                        f"time={piece['time']} distance={points[piece['end']]['total_distance'] - points[piece['start']]['total_distance']}"
-                    )
-            insert_results(cur, pieces, points, outings, aid)
+        outcome = OK
+        pieces = get_results(track, pieces)
+        for piece in sorted(pieces, key=lambda p: p['Piece_ID']):
+            if piece['start'] >= 0 and piece['end'] >= 0:
+                print(
+                    f"Piece {piece['Piece_ID']}: start={piece['start']} end={piece['end']} "
+                    f"time={piece['time']} distance={track.cum[piece['end']] - track.cum[piece['start']]}"
+                )
+            else:
+                print(f"Piece {piece['Piece_ID']}: not found")
+        insert_results(cur, pieces, track, outings, aid, lookups)
+    return outcome, day
+
+def _match_file(cur, aid: int, key: str, lookups: Optional[ResultLookups], etag: Optional[str] = None,
+                fetched: Optional[FetchedObject] = None):
+    """Returns (outcome, ETag, activity date) for the ledger. With the listing's
+    ETag, an activity already decoded (by either importer) skips the download;
+    `fetched` is the body if an S3Fetcher already downloaded it."""
+    activity = ACTIVITY_CACHE.get(key, etag)
+    if activity is None:
+        try:
+            if fetched is not None and fetched.fetched:
+                etag, buf = fetched.result()
+            else:
+                etag, buf = get_object_bytes(s3, S3_BUCKET, key)
+        except Exception as e:
+            logger.error("    ! S3 download failed: %s", e)
+            return ERROR, None, None
+
+        try:
+            activity = ACTIVITY_CACHE.decode(key, etag, buf)
+        except Exception as e:
+            logger.error("    ! File parsing failed: %s", e)
+            return ERROR, etag, None
+
+    outcome, day = match_activity(cur, aid, activity, lookups)
+    return outcome, etag, day
+
+def process_single_result(cur, aid: int, key: str, lookups: ResultLookups = None,
+                          ledger: Optional[ImportLedger] = None, etag: Optional[str] = None,
+                          fetched: Optional[FetchedObject] = None) -> str:
+    outcome, etag, day = _match_file(cur, aid, key, lookups, etag, fetched)
+    if ledger is not None:
+        ledger.record(key, etag, outcome, day)
+    return outcome
+
+def files_to_match(athletes, ledger: ImportLedger, index: Optional[S3Index], piece_days: set,
+                   unchanged: list):
+    """(aid, key, ETag, size) of the files worth matching (see main()), for S3Fetcher.fetch(); unchanged[0] counts the rest."""
+    for aid in athletes:
+        if index is not None:
+            objects = ((o.key, o.etag, o.size) for o in index.objects(aid, (".fit",)))
         else:
-            print("❌ Pieces are NOT in valid chronological order.")
-            print("Chronological Piece_IDs:", [p['Piece_ID'] for p in ordered_pieces])
+            objects = ((key, etag, None) for key, etag in iter_fit_objects_for_athlete(aid))
+        for key, etag, size in objects:
+            entry = ledger.get(key)
+            if ledger.is_current(key, etag) and not (
+                    entry.outcome == NO_MATCH and (aid, entry.activity_date) in piece_days):
+                unchanged[0] += 1
+                continue
+            yield aid, key, etag, size
 
 # ── main loop ─────────────────────────────────────────────────────────────
 
@@ -364,34 +322,41 @@ def main():
     parser.add_argument("--tenant", required=True, help="Tenant key, e.g. 'eubc' or 'sabc'")
     parser.add_argument("--aid", type=int, help="Athlete ID")
     parser.add_argument("--file", type=str, help="S3 key to process (tenant-namespaced)")
+    parser.add_argument("--force", action="store_true",
+                        help="Rematch files the import ledger has already seen (e.g. after Pieces change)")
+    parser.add_argument("--fetch-workers", type=int, default=FETCH_WORKERS, help="Concurrent S3 downloads")
     args = parser.parse_args()
 
-    with app.app_context():
-        tenants = app.config.get("TENANTS", {})
-        if args.tenant not in tenants:
-            raise SystemExit(f"Unknown tenant '{args.tenant}'. Available: {list(tenants.keys())}")
-
-        cfg   = tenants[args.tenant]
-        bucket= cfg.get("s3_bucket", S3_BUCKET)
-        base  = cfg.get("s3_prefix", "fitfiles")
-        prefix= f"{base}/{args.tenant}"  # namespace keys by tenant
+    require_tenant(args.tenant)
 
-        # Use tenant storage settings
-        configure_storage(bucket=bucket, prefix=prefix)
+    # Use tenant storage settings (prefix is namespaced by tenant)
+    bucket, prefix = tenant_storage(args.tenant)
+    configure_storage(bucket=bucket, prefix=prefix, client=shared_client(args.fetch_workers))
 
-        with tenant_context(app, args.tenant):
-            conn = get_db_connection(); cur = conn.cursor()
-            logger.info("Importing FIT results from s3://%s/%s → MySQL (%s) …", S3_BUCKET, S3_PREFIX, args.tenant)
+    with tenant_context(None, args.tenant):
+        conn = get_db_connection(); cur = conn.cursor()
+        logger.info("Importing FIT results from s3://%s/%s → MySQL (%s) …", S3_BUCKET, S3_PREFIX, args.tenant)
 
-            if args.aid and args.file:
-                process_single_result(cur, args.aid, args.file)
-            else:
-                for aid, _ in iter_athletes_with_links(cur):
-                    for key in iter_fit_keys_for_athlete(aid):
-                        process_single_result(cur, aid, key)
-
-            conn.commit(); cur.close(); conn.close()
-            logger.info("✓ All done")
+        lookups = ResultLookups.load(cur)
+        ledger = ImportLedger(cur, args.tenant, STAGE_RESULTS, force=args.force)
+        if args.aid and args.file:
+            process_single_result(cur, args.aid, args.file, lookups, ledger)
+        else:
+            # A file with nothing to match last time is worth another look once
+            # the athlete has an outing with pieces on that day.
+            piece_days = athlete_piece_days(cur)
+            index = tenant_index(S3_BUCKET, S3_PREFIX, s3)
+            unchanged = [0]
+            athletes = [aid for aid, _ in iter_athletes_with_links(cur)]
+            fetcher = S3Fetcher(s3, S3_BUCKET, args.fetch_workers)
+            for f in fetcher.fetch(files_to_match(athletes, ledger, index, piece_days, unchanged),
+                                   skip=ACTIVITY_CACHE.contains):
+                process_single_result(cur, f.tag, f.key, lookups, ledger, f.etag, f)
+            logger.info("%d unchanged files skipped (ledger)", unchanged[0])
+
+        conn.commit(); cur.close(); conn.close()
+        ACTIVITY_CACHE.prune()
+        logger.info("✓ All done")
 
 if __name__ == "__main__":
     main()
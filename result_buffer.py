@@ -0,0 +1,265 @@
+# result_buffer.py
+"""
+Write-behind buffer for live timing `result_update` events.
+
+timing.html sends an update on every keystroke / stopwatch tap. Rather than one
+connection + one UPDATE per event, updates are coalesced per tenant by
+(Piece_ID, Crew_ID, field) – last value wins – and written in one transaction
+every RESULT_FLUSH_INTERVAL seconds, or as soon as RESULT_FLUSH_MAX cells are
+pending. Buffers are flushed on socket disconnect, before the timing page reads
+Results, and at process exit. Broadcasting to other clients is not delayed.
+
+If a batch fails, its cells are written one at a time, so one bad cell can't
+hold the others back. A cell that still fails is retried on later flushes and
+dropped, with an error logged, after RESULT_WRITE_ATTEMPTS tries.
+
+Values are checked against their column first (clean_result_value), so a
+typo is refused up front rather than failing a flush. Callbacks registered
+with on_result_dropped() hear about any cell that is dropped all the same, so
+the clients that were shown it can be told.
+
+Cells are keyed by integer Piece_ID / Crew_ID, whatever type the client sent.
+A direct write of a cell (the REST update_result) discards its pending value
+first, so an older buffered edit can't land on top of it. flush_results(...,
+strict=True) raises ResultFlushError if edits are still waiting afterwards,
+for callers about to read Results.
+"""
+import os
+import re
+import math
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from db import get_db_connection, tenant_context
+
+logger = logging.getLogger(__name__)
+
+# Columns the timing page is allowed to write.
+RESULT_FIELDS = ("Start", "Finish", "Time", "Comment", "GMT_Percent")
+
+FLUSH_INTERVAL = float(os.getenv("RESULT_FLUSH_INTERVAL", "0.3"))
+MAX_PENDING    = int(os.getenv("RESULT_FLUSH_MAX", "200"))
+RETRY_DELAY    = 2.0
+MAX_ATTEMPTS   = int(os.getenv("RESULT_WRITE_ATTEMPTS", "3"))   # per cell, before it is dropped
+
+TIME_FIELDS = ("Start", "Finish", "Time")
+# what MySQL takes for a TIME: [H]H:MM[:SS[.f]] (the timing page sends HH:MM:SS.t)
+_TIME_VALUE = re.compile(r"^\d{1,3}:[0-5]?\d(:[0-5]?\d(\.\d{1,6})?)?$")
+MAX_COMMENT_BYTES = 65535                                        # Results.Comment is TEXT
+
+def clean_result_value(field: str, value):
+    """
+    The value to store in a Results column for one timing-page edit; raises
+    ValueError if the column wouldn't take it. '' (or None) clears a time or GMT%.
+    """
+    if field in TIME_FIELDS:
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return None
+        if isinstance(value, str) and _TIME_VALUE.match(value.strip()):
+            return value.strip()
+        raise ValueError(f"{field} must be a time like 12:34:56.7, not {value!r}")
+    if field == "GMT_Percent":
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return None
+        try:
+            if isinstance(value, bool):
+                raise ValueError
+            number = float(value.strip().rstrip("%") if isinstance(value, str) else value)
+        except (TypeError, ValueError):
+            raise ValueError(f"GMT_Percent must be a number, not {value!r}")
+        if not math.isfinite(number):
+            raise ValueError(f"GMT_Percent must be a number, not {value!r}")
+        return number
+    if field == "Comment":
+        if value is None:
+            return None
+        if not isinstance(value, str):
+            raise ValueError(f"Comment must be text, not {value!r}")
+        if len(value.encode("utf-8")) > MAX_COMMENT_BYTES:
+            raise ValueError("Comment is too long")
+        return value
+    raise ValueError(f"Invalid field {field!r}")
+
+class ResultFlushError(RuntimeError):
+    """A strict flush left cells pending (to be retried); Results doesn't show them yet."""
+
+class ResultWriteBuffer:
+    """Pending Results cell updates for one tenant."""
+
+    def __init__(self, tenant_key: str):
+        self.tenant_key = tenant_key
+        self._pending = {}                   # (piece_id, crew_id, field) -> value
+        self._attempts = {}                  # cell -> failed writes of its pending value
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one flush at a time keeps writes in order
+        self._timer = None
+
+    def add(self, piece_id, crew_id, field: str, value) -> None:
+        with self._lock:
+            self._pending[(piece_id, crew_id, field)] = value
+            self._attempts.pop((piece_id, crew_id, field), None)
+            full = len(self._pending) >= MAX_PENDING
+            if not full:
+                self._schedule(FLUSH_INTERVAL)
+        if full:
+            self.flush()
+
+    def _schedule(self, delay: float) -> None:
+        # caller holds self._lock
+        if self._timer is None:
+            self._timer = threading.Timer(delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def discard(self, piece_id: int, crew_id: int, field: str) -> None:
+        """Forget the cell's pending value, once any flush already writing it has finished."""
+        with self._flush_lock, self._lock:
+            self._pending.pop((piece_id, crew_id, field), None)
+            self._attempts.pop((piece_id, crew_id, field), None)
+
+    def flush(self, strict: bool = False) -> int:
+        """
+        Write everything pending, in one transaction if it can; returns the
+        number of cells written. With strict=True, raises ResultFlushError if
+        any cell had to be re-queued.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not batch:
+                return 0
+            try:
+                self._write(batch)
+            except Exception:
+                logger.exception("result buffer: flush of %d updates failed for tenant '%s'; "
+                                 "writing them one at a time", len(batch), self.tenant_key)
+                written, requeued = self._write_each(batch)
+                if strict and requeued:
+                    raise ResultFlushError(f"{requeued} result updates for tenant '{self.tenant_key}' "
+                                           f"could not be saved yet")
+                return written
+            with self._lock:
+                for cell in batch:
+                    if cell not in self._pending:
+                        self._attempts.pop(cell, None)
+            return len(batch)
+
+    def _write_each(self, batch: dict):
+        # caller holds self._flush_lock; returns (cells written, cells re-queued)
+        written, failed = 0, {}
+        for cell, value in batch.items():
+            try:
+                self._write({cell: value})
+                written += 1
+            except Exception as exc:
+                failed[cell] = (value, exc)
+
+        with self._lock:
+            for cell in batch:
+                if cell not in failed and cell not in self._pending:
+                    self._attempts.pop(cell, None)
+            requeued = 0
+            dropped = []
+            for cell, (value, exc) in failed.items():
+                if cell in self._pending:       # a newer value arrived meanwhile
+                    continue
+                attempts = self._attempts.get(cell, 0) + 1
+                if attempts >= MAX_ATTEMPTS:
+                    self._attempts.pop(cell, None)
+                    piece_id, crew_id, field = cell
+                    logger.error("result buffer: dropping %s=%r for piece %s crew %s (tenant '%s') "
+                                 "after %d failed writes: %s", field, value, piece_id, crew_id,
+                                 self.tenant_key, attempts, exc)
+                    dropped.append((piece_id, crew_id, field, value, exc))
+                    continue
+                self._attempts[cell] = attempts
+                self._pending[cell] = value
+                requeued += 1
+            if requeued:
+                self._schedule(RETRY_DELAY)
+        for piece_id, crew_id, field, value, exc in dropped:
+            _notify_dropped(self.tenant_key, piece_id, crew_id, field, value, exc)
+        return written, requeued
+
+    def _write(self, batch: dict) -> None:
+        by_field = defaultdict(list)
+        for (piece_id, crew_id, field), value in batch.items():
+            by_field[field].append((value, piece_id, crew_id))
+
+        with tenant_context(None, self.tenant_key):
+            conn = get_db_connection()
+            try:
+                with conn.cursor() as cursor:
+                    for field, rows in by_field.items():
+                        cursor.executemany(
+                            f"UPDATE Results SET {field} = %s WHERE Piece_ID = %s AND Crew_ID = %s",
+                            rows
+                        )
+                conn.commit()
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                raise
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+_drop_callbacks = []
+
+def on_result_dropped(callback) -> None:
+    """Call callback(tenant_key, piece_id, crew_id, field, value, error) for each cell given up on."""
+    _drop_callbacks.append(callback)
+
+def _notify_dropped(tenant_key, piece_id, crew_id, field, value, exc) -> None:
+    for callback in list(_drop_callbacks):
+        try:
+            callback(tenant_key, piece_id, crew_id, field, value, exc)
+        except Exception:
+            logger.exception("result buffer: drop callback failed")
+
+def _buffer_for(tenant_key: str) -> ResultWriteBuffer:
+    buf = _buffers.get(tenant_key)
+    if buf is None:
+        with _buffers_lock:
+            buf = _buffers.setdefault(tenant_key, ResultWriteBuffer(tenant_key))
+    return buf
+
+def _ids(piece_id, crew_id):
+    """(Piece_ID, Crew_ID) as ints, or None if either isn't one."""
+    try:
+        return int(piece_id), int(crew_id)
+    except (TypeError, ValueError):
+        return None
+
+def buffer_result_update(tenant_key: str, piece_id, crew_id, field: str, value) -> bool:
+    """
+    Queue one Results cell update. Returns False (and drops it) for unknown
+    fields or bad IDs; `value` should have been through clean_result_value().
+    """
+    ids = _ids(piece_id, crew_id)
+    if field not in RESULT_FIELDS or ids is None:
+        return False
+    _buffer_for(tenant_key).add(*ids, field, value)
+    return True
+
+def discard_result_update(tenant_key: str, piece_id, crew_id, field: str) -> None:
+    """Drop a pending update of this cell, before writing it directly."""
+    ids = _ids(piece_id, crew_id)
+    buf = _buffers.get(tenant_key)
+    if buf is not None and ids is not None:
+        buf.discard(*ids, field)
+
+def flush_results(tenant_key=None, strict: bool = False) -> int:
+    """Flush one tenant's pending updates, or every tenant's if no key is given."""
+    if tenant_key is not None:
+        buf = _buffers.get(tenant_key)
+        return buf.flush(strict) if buf else 0
+    return sum(buf.flush(strict) for buf in list(_buffers.values()))
+
+atexit.register(flush_results)
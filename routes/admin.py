@@ -0,0 +1,20 @@
+from flask import Blueprint, render_template, request, redirect, url_for, jsonify, flash, g
+from db import query_stats_summary, reset_query_stats, DB_N1_THRESHOLD
+from routes.params import coach_required
+
+admin_bp = Blueprint("admin", __name__)
+
+@admin_bp.route("/admin/db_stats")
+@coach_required
+def db_stats():
+    rows = query_stats_summary(g.tenant_key, limit=request.args.get("limit", 100, type=int))
+    if request.args.get("format") == "json":
+        return jsonify(tenant=g.tenant_key, statements=rows)
+    return render_template("db_stats.html", rows=rows, n1_threshold=DB_N1_THRESHOLD)
+
+@admin_bp.route("/admin/db_stats/reset", methods=["POST"])
+@coach_required
+def reset_db_stats():
+    reset_query_stats(g.tenant_key)
+    flash("Query statistics cleared.", "success")
+    return redirect(url_for("admin.db_stats"))
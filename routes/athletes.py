@@ -9,7 +9,7 @@ from typing import Optional  # add this import
 import datetime
 import pymysql
 from pymysql import IntegrityError
-from db import get_db_connection
+from db import get_db_connection, invalidate_user
 
 athletes_bp = Blueprint('athletes', __name__)
 
@@ -144,6 +144,7 @@ def edit_athlete(athlete_id):
         ))
         conn.commit()
     conn.close()
+    invalidate_user(athlete_id)
     return redirect(url_for('athletes.athletes'))
 
 
@@ -174,6 +175,7 @@ def reset_password(athlete_id):
             hashed  = generate_password_hash(new_pw)
             cur.execute("UPDATE Athletes SET Password_Hash=%s WHERE Athlete_ID=%s", (hashed, athlete_id))
             conn.commit()
+            invalidate_user(athlete_id)
     finally:
         conn.close()
 
@@ -278,6 +280,7 @@ def athlete_detail(athlete_id):
                     )
 
                 conn.commit()
+                invalidate_user(athlete_id)
                 flash("Athlete details updated.", "success")
                 return redirect(url_for('athletes.athletes'))
 
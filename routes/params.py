@@ -1,7 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
 from flask_login import login_required, current_user
 from functools import wraps
-from db import get_db_connection
+from db import get_db_connection, invalidate_params
 
 params_bp = Blueprint("params", __name__)
 
@@ -59,6 +59,7 @@ def new_param():
                     (param, value, desc)
                 )
             conn.commit()
+            invalidate_params()
             flash(f"Parameter '{param}' created.", "success")
             return redirect(url_for("params.list_params"))
         except Exception as e:
@@ -94,6 +95,7 @@ def edit_param(param):
                     (value, desc, param)
                 )
             conn.commit()
+            invalidate_params()
             flash(f"Parameter '{param}' updated.", "success")
             return redirect(url_for("params.list_params"))
 
@@ -116,6 +118,7 @@ def delete_param(param):
         with conn.cursor() as cur:
             cur.execute("DELETE FROM Params WHERE Param=%s", (param,))
         conn.commit()
+        invalidate_params()
         flash(f"Parameter '{param}' deleted.", "success")
     finally:
         conn.close()
@@ -1,9 +1,11 @@
-from flask import Blueprint, render_template, request, redirect, url_for, jsonify,current_app
+from flask import Blueprint, render_template, request, redirect, url_for, jsonify,current_app, g, flash
 from flask_login import login_required, current_user 
-from db import get_db_connection, tenant_context  
+from db import get_db_connection  
 from datetime import timedelta
 from flask_socketio import SocketIO, emit
 from sockets import socketio
+from result_buffer import (ResultFlushError, buffer_result_update, clean_result_value,
+                           discard_result_update, flush_results)
 from urllib.parse import urlparse
 from typing import Optional 
 
@@ -82,6 +84,11 @@ def map_unrateable_for_crews(cursor, crew_ids):
 @timing_bp.route('/timing/<int:piece_id>')
 @login_required
 def timing_view(piece_id):
+    try:
+        flush_results(g.tenant_key, strict=True)  # show edits still waiting in the write-behind buffer
+    except ResultFlushError:
+        flash("Some live timing edits haven't been saved yet – the times below may be out of date.",
+              "warning")
     conn = get_db_connection()
 
     with conn.cursor() as cursor:
@@ -207,6 +214,13 @@ def update_result():
 
     if field not in ['Start', 'Finish', 'Time', 'Comment', 'GMT_Percent']:
         return jsonify({'error': 'Invalid field'}), 400
+    try:
+        value = clean_result_value(field, value)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # don't let an older buffered socket edit of this cell land after this write
+    discard_result_update(g.tenant_key, piece_id, crew_id, field)
 
     conn = get_db_connection()
     with conn.cursor() as cursor:
@@ -237,18 +251,24 @@ def handle_result_update(data):
         print("⚠️ Could not determine tenant (no Referer / club). Update skipped.")
         return
 
-    # Bind DB work to the tenant
-    with tenant_context(current_app, club):
-        conn = get_db_connection()
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute(
-                    f"UPDATE Results SET {field} = %s WHERE Piece_ID = %s AND Crew_ID = %s",
-                    (value, piece_id, crew_id)
-                )
-            conn.commit()
-        finally:
-            conn.close()
+    club = club.strip().lower()
+    if club not in current_app.config.get('TENANTS', {}):
+        print("⚠️ Unknown tenant:", club)
+        return
+
+    try:
+        stored = clean_result_value(field, value)
+    except ValueError as e:
+        print("⚠️ Invalid update:", e)
+        emit('result_error', {'piece_id': piece_id, 'crew_id': crew_id, 'field': field,
+                              'value': value, 'error': str(e)})
+        return
+
+    # Coalesced write-behind (see result_buffer.py); the broadcast below is immediate,
+    # and a write it finally drops is reported to the piece's room (sockets.py).
+    if not buffer_result_update(club, piece_id, crew_id, field, stored):
+        print("⚠️ Invalid field:", field)
+        return
 
     # Fan out to all clients
     emit('result_updated', data, broadcast=True)
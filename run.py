@@ -1,4 +1,4 @@
-from flask import Blueprint, Flask, render_template, request, redirect, url_for, session, flash, g, abort,send_from_directory
+from flask import Blueprint, Flask, Response, render_template, request, redirect, url_for, session, flash, g, abort,send_from_directory
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user, UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.middleware.proxy_fix import ProxyFix
@@ -7,7 +7,7 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from db import get_db_connection  # <-- your new tenant-aware db.py
+from db import get_db_connection, get_user_fields, invalidate_user, init_app as init_db  # <-- your new tenant-aware db.py
 from routes.athletes import athletes_bp
 from routes.hulls import hulls_bp
 from routes.sessions import sessions_bp
@@ -19,6 +19,9 @@ from routes.results import results_bp
 from routes.view_lineups import view_lineups_bp
 from routes.dashboard import dashboard_bp
 from routes.params import params_bp
+from routes.admin import admin_bp
+from bootstrap import TENANTS
+from static_manifest import build_manifest, hashed_url_name, pick_encoding, lookup as static_lookup
 
 from sockets import socketio  # ✅
 
@@ -28,21 +31,12 @@ from sockets import socketio  # ✅
 app = Flask(__name__)
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1)
 app.secret_key = os.getenv('SECRET_KEY')
+init_db(app)  # per-request DB query stats
 
-# If you’re loading tenants from YAML/SSM, inject here; for now assume you did in create_app earlier.
-# Example placeholder (replace with your real loader):
-import yaml, os
-
-def load_tenants():
-    here = os.path.dirname(os.path.abspath(__file__))
-    path = os.path.join(here, 'tenants.yaml')
-    with open(path, 'r') as f:
-        data = yaml.safe_load(f) or {}
-    # normalize to lowercase keys
-    return {str(k).strip().lower(): v for k, v in data.items()}
-
-app.config['TENANTS'] = load_tenants()
+# Tenants come from tenants.yaml via bootstrap.py (shared with the batch jobs).
+app.config['TENANTS'] = TENANTS
 print("TENANTS LOADED:", list(app.config['TENANTS'].keys()))
+app.config['STATIC_MANIFEST'] = build_manifest(app.config['TENANTS'], os.path.dirname(os.path.abspath(__file__)))
 
 def _tenant_exists(club):
     return bool(club) and club in app.config.get('TENANTS', {})
@@ -68,6 +62,10 @@ def add_tenant(endpoint, values):
         return
     if 'club' not in values and hasattr(g, 'tenant_key'):
         values['club'] = g.tenant_key
+    if endpoint == 'club_static' and 'filename' in values:
+        # hand out content-fingerprinted names so browsers can cache forever
+        values['filename'] = hashed_url_name(app.config['STATIC_MANIFEST'],
+                                             values.get('club'), values['filename'])
 
 # ---------------------------
 # Socket.IO
@@ -102,14 +100,11 @@ def load_user(composite_id: str):
     if tenant_key != getattr(g, 'tenant_key', None):
         return None
 
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT * FROM Athletes WHERE Athlete_ID = %s", (user_id,))
-            row = cursor.fetchone()
-            return User(row, tenant_key) if row else None
-    finally:
-        conn.close()
+        row = get_user_fields(user_id)
+    except ValueError:
+        return None
+    return User(row, tenant_key) if row else None
 
 # Optional: ensure redirects to login keep the correct club in the URL
 @login_manager.unauthorized_handler
@@ -250,6 +245,7 @@ def change_password():
                     (hashed_pw, current_user.id)
                 )
             conn.commit()
+            invalidate_user(current_user.id)
             flash('Password changed successfully.', 'success')
             return redirect(url_for('core.app_menu'))
         finally:
@@ -257,6 +253,9 @@ def change_password():
 
     return render_template('change_password.html')
 
+STATIC_MAX_AGE = int(os.getenv('STATIC_MAX_AGE', '3600'))       # plain names
+STATIC_IMMUTABLE_AGE = 365 * 24 * 3600                           # fingerprinted names
+
 @app.route('/<club>/static/<path:filename>')
 def club_static(filename):  # ← remove `club` here
     key = (getattr(g, 'tenant_key', '') or '').strip().lower()
@@ -264,13 +263,34 @@ def club_static(filename):  # ← remove `club` here
     if not tenant:
         abort(404)
 
+    asset, fingerprinted = static_lookup(app.config['STATIC_MANIFEST'], key, filename)
+    if asset is None:
+        return _serve_unlisted_static(tenant, filename)
+
+    max_age = STATIC_IMMUTABLE_AGE if fingerprinted else STATIC_MAX_AGE
+    encoding = pick_encoding(asset, request.accept_encodings)
+    if encoding:
+        resp = Response(asset.variants[encoding], mimetype=asset.mimetype)
+        resp.headers['Content-Encoding'] = encoding
+        resp.set_etag(f"{asset.digest[:20]}-{encoding}")
+    else:
+        root = app.config['STATIC_MANIFEST'][key]['root']
+        resp = send_from_directory(root, asset.filename, conditional=True, etag=asset.digest[:20])
+    if asset.variants:
+        resp.vary.add('Accept-Encoding')
+    resp.cache_control.public = True
+    resp.cache_control.max_age = max_age
+    if fingerprinted:
+        resp.cache_control.immutable = True
+    return resp.make_conditional(request)
+
+def _serve_unlisted_static(tenant, filename):
+    """Files added after startup aren't in the manifest – serve them the old way."""
     root = tenant.get('static_root', '')
     if not os.path.isabs(root):
         root = os.path.join(os.path.dirname(__file__), root)
 
     full_path = os.path.normpath(os.path.join(root, filename))
-    print("SERVE STATIC", {"club": key, "root": root, "file": filename,
-                           "exists": os.path.isfile(full_path)})
 
     # harden against path traversal
     if not os.path.abspath(full_path).startswith(os.path.abspath(root) + os.sep):
@@ -278,7 +298,7 @@ def club_static(filename):  # ← remove `club` here
     if not os.path.isfile(full_path):
         abort(404)
 
-    return send_from_directory(root, filename, conditional=True)
+    return send_from_directory(root, filename, conditional=True, max_age=STATIC_MAX_AGE)
 
 
 # ---------------------------
@@ -299,6 +319,7 @@ app.register_blueprint(timing_bp,        url_prefix='/<club>')
 app.register_blueprint(results_bp,       url_prefix='/<club>')
 app.register_blueprint(dashboard_bp,     url_prefix='/<club>')
 app.register_blueprint(params_bp, url_prefix='/<club>')
+app.register_blueprint(admin_bp,  url_prefix='/<club>')
 
 # ---------------------------
 # Gunicorn/socketio exports
@@ -0,0 +1,207 @@
+# s3_fetcher.py
+"""
+S3 downloads on a bounded thread pool, ahead of the code that parses them.
+
+The importers used to get_object(...).read() one file at a time, so the CPU
+waited out every round trip. S3Fetcher keeps up to `workers` downloads
+running while the caller works on the file before, and hands the bodies back
+in the order they were asked for:
+
+    fetcher = S3Fetcher(client, bucket)
+    for f in fetcher.fetch(items, skip=ACTIVITY_CACHE.contains):
+        etag, body = f.result()          # raises if the download failed
+
+`items` are (tag, key, ETag, size) tuples; `tag` is passed through untouched
+(the importers use the athlete). An item whose key is None, or for which
+skip(key, ETag) is true, comes back in its place without a download. At most
+max_bytes of bodies are held ahead of the caller – sizes come from the
+listing (s3_index.py); an unknown size counts as UNKNOWN_SIZE.
+
+fetch(..., drop=...) adds a prefilter. drop(key, LastModified, head) is
+called first with head=None – an item may carry its listing LastModified as a
+fifth element – and then, unless that settled it, with the object's first
+PEEK_BYTES from a ranged GET. A non-None return drops the object: it comes
+back with `dropped` set to that value, the rest never downloaded. Kept
+objects fetch the rest with a second ranged GET (If-Match the first one's
+ETag), so a kept file costs one extra request and no extra bytes.
+
+A failed download is retried with exponential backoff (plus jitter), unless
+S3 said the object isn't there or isn't ours. All fetchers share one client
+per pool size (shared_client()), so connections are reused across downloads.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+FETCH_WORKERS = int(os.getenv("S3_FETCH_WORKERS", "8"))
+FETCH_MAX_MB  = float(os.getenv("S3_FETCH_MAX_MB", "256"))      # bodies held ahead of the parser
+FETCH_RETRIES = int(os.getenv("S3_FETCH_RETRIES", "4"))
+FETCH_BACKOFF = float(os.getenv("S3_FETCH_BACKOFF", "0.5"))     # seconds before the first retry, then doubled
+PEEK_BYTES    = int(os.getenv("S3_PEEK_BYTES", "4096"))         # head read for a drop() prefilter
+
+UNKNOWN_SIZE = 2**20
+NOT_RETRYABLE = {"NoSuchKey", "NoSuchBucket", "AccessDenied", "InvalidObjectState", "InvalidRange",
+                 "PreconditionFailed", "403", "404", "412", "416"}
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def shared_client(max_pool_connections: int = FETCH_WORKERS):
+    """One S3 client per pool size, its connection pool big enough for that many concurrent downloads."""
+    size = max(10, int(max_pool_connections))       # botocore's default is 10
+    with _clients_lock:
+        client = _clients.get(size)
+        if client is None:
+            client = _clients[size] = boto3.client(
+                "s3", config=Config(max_pool_connections=size, retries={"mode": "standard"}))
+    return client
+
+def _retryable(exc: Exception) -> bool:
+    if isinstance(exc, ClientError):
+        return exc.response.get("Error", {}).get("Code") not in NOT_RETRYABLE
+    return True         # connection resets, timeouts, a body cut short mid-read
+
+def _get(client, bucket: str, key: str, retries: int, backoff: float, **kwargs):
+    """get_object(...) and its body, retrying transient failures; the last error is raised."""
+    attempt = 0
+    while True:
+        try:
+            obj = client.get_object(Bucket=bucket, Key=key, **kwargs)
+            return obj, obj["Body"].read()
+        except Exception as exc:
+            if attempt >= retries or not _retryable(exc):
+                raise
+            delay = backoff * 2 ** attempt * random.uniform(0.5, 1.0)
+            attempt += 1
+            logger.warning("s3 fetch: %s failed (%s); retry %d/%d in %.1fs", key, exc, attempt, retries, delay)
+            time.sleep(delay)
+
+def get_object_bytes(client, bucket: str, key: str, retries: int = FETCH_RETRIES,
+                     backoff: float = FETCH_BACKOFF) -> Tuple[Optional[str], bytes]:
+    """(ETag, body) of one object, retrying transient failures; the last error is raised."""
+    obj, body = _get(client, bucket, key, retries, backoff)
+    return obj.get("ETag"), body
+
+def _object_size(obj: dict, body: bytes) -> int:
+    """Whole object size from a ranged GET's Content-Range ("bytes 0-4095/81234")."""
+    content_range = obj.get("ContentRange") or ""
+    try:
+        return int(content_range.rsplit("/", 1)[1])
+    except (IndexError, ValueError):
+        return len(body)
+
+class FetchedObject:
+    """One item back from S3Fetcher.fetch(): a body, the error that stopped it, or neither if skipped or dropped."""
+
+    __slots__ = ("tag", "key", "etag", "body", "error", "dropped")
+
+    def __init__(self, tag, key, etag, body=None, error=None, dropped=None):
+        self.tag = tag
+        self.key = key
+        self.etag = etag
+        self.body = body
+        self.error = error
+        self.dropped = dropped        # what drop() returned, if it dropped the object
+
+    @property
+    def fetched(self) -> bool:
+        return self.body is not None or self.error is not None
+
+    def result(self) -> Tuple[Optional[str], bytes]:
+        """(ETag, body); raises the download's error."""
+        if self.error is not None:
+            raise self.error
+        if self.body is None:
+            raise ValueError(f"{self.key} was skipped, not downloaded")
+        return self.etag, self.body
+
+class S3Fetcher:
+    """Ordered, bounded prefetch of S3 objects (see module docstring)."""
+
+    def __init__(self, client, bucket: str, workers: int = FETCH_WORKERS, max_bytes: int = None,
+                 retries: int = FETCH_RETRIES, backoff: float = FETCH_BACKOFF):
+        self.client = client
+        self.bucket = bucket
+        self.workers = max(1, workers)
+        self.max_bytes = int(FETCH_MAX_MB * 2**20) if max_bytes is None else max_bytes
+        self.retries = retries
+        self.backoff = backoff
+
+    def _download(self, tag, key: str, etag: Optional[str], size: Optional[int] = None,
+                  last_modified=None, drop=None) -> FetchedObject:
+        try:
+            if drop is None or (size is not None and size <= PEEK_BYTES):
+                etag, body = get_object_bytes(self.client, self.bucket, key, self.retries, self.backoff)
+                return FetchedObject(tag, key, etag, body=body)
+
+            obj, head = _get(self.client, self.bucket, key, self.retries, self.backoff,
+                             Range=f"bytes=0-{PEEK_BYTES - 1}")
+            etag = obj.get("ETag")
+            verdict = drop(key, last_modified, head)
+            if verdict is not None:
+                return FetchedObject(tag, key, etag, dropped=verdict)
+            if _object_size(obj, head) <= len(head):
+                return FetchedObject(tag, key, etag, body=head)
+            try:
+                _, rest = _get(self.client, self.bucket, key, self.retries, self.backoff,
+                               Range=f"bytes={len(head)}-", IfMatch=etag)
+                body = head + rest
+            except ClientError as exc:
+                if exc.response.get("Error", {}).get("Code") not in ("PreconditionFailed", "412"):
+                    raise
+                # replaced between the two requests: take the new version whole
+                etag, body = get_object_bytes(self.client, self.bucket, key, self.retries, self.backoff)
+        except Exception as exc:
+            return FetchedObject(tag, key, etag, error=exc)
+        return FetchedObject(tag, key, etag, body=body)
+
+    def fetch(self, items: Iterable[tuple], skip: Optional[Callable[[str, Optional[str]], bool]] = None,
+              drop: Optional[Callable] = None) -> Iterator[FetchedObject]:
+        """Yield a FetchedObject per (tag, key, ETag, size[, LastModified]) item, in order, downloading ahead."""
+        items = iter(items)
+        window = deque()                # (FetchedObject or Future, bytes reserved), in item order
+        ahead = 4 * self.workers        # items in hand, so a run of skipped ones can't stall the pool
+        state = {"reserved": 0, "next": next(items, None)}
+
+        def top_up(pool):
+            while state["next"] is not None and len(window) < ahead:
+                tag, key, etag, size, *rest = state["next"]
+                last_modified = rest[0] if rest else None
+                verdict = None
+                if key is not None and drop is not None:
+                    verdict = drop(key, last_modified, None)
+                if key is None or verdict is not None or (skip is not None and skip(key, etag)):
+                    window.append((FetchedObject(tag, key, etag, dropped=verdict), 0))
+                else:
+                    cost = size if size is not None else UNKNOWN_SIZE
+                    if window and state["reserved"] + cost > self.max_bytes:
+                        return
+                    window.append((pool.submit(self._download, tag, key, etag, size, last_modified, drop), cost))
+                    state["reserved"] += cost
+                state["next"] = next(items, None)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="s3-fetch") as pool:
+            try:
+                top_up(pool)
+                while window:
+                    item, cost = window.popleft()
+                    if not isinstance(item, FetchedObject):
+                        item = item.result()
+                    state["reserved"] -= cost
+                    top_up(pool)            # refill before the caller starts on this one
+                    yield item
+            finally:
+                for item, _ in window:
+                    if not isinstance(item, FetchedObject):
+                        item.cancel()
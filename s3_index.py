@@ -0,0 +1,204 @@
+# s3_index.py
+"""
+One listing of a tenant's S3 prefix, grouped by athlete.
+
+The importers used to run a list_objects_v2 paginator per athlete – one or
+more LIST requests each, per importer, per run. S3Index walks the tenant's
+whole `<prefix>/` once (1000 keys a request) and serves every athlete's files
+from memory:
+
+    index = tenant_index(bucket, prefix, client)
+    for obj in index.objects(aid, (".fit", ".tcx")):
+        obj.key, obj.etag, obj.size, obj.last_modified
+
+Keys are `<prefix>/<aid>/<file>`; anything else under the prefix is ignored.
+Each athlete's objects come back in key order, as S3 lists them.
+
+With S3_INDEX_DIR set the index is saved there after each listing, and a
+saved index younger than S3_INDEX_MAX_AGE seconds is used without listing at
+all (uploads made through add() keep it current). S3 can't list by time, so
+an older one is listed again in full.
+
+Any client with get_paginator("list_objects_v2") works: boto3 (pointed at
+MinIO/moto with AWS_ENDPOINT_URL_S3) or benchmarks/s3_local.py.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR     = os.getenv("S3_INDEX_DIR", "")                 # '' = memory only
+INDEX_MAX_AGE = float(os.getenv("S3_INDEX_MAX_AGE", "0"))     # seconds a saved listing is trusted
+
+class S3Object:
+    """One listed object."""
+
+    __slots__ = ("key", "size", "etag", "last_modified")
+
+    def __init__(self, key: str, size: int, etag: Optional[str], last_modified: datetime):
+        self.key = key
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+
+def _aware(when) -> datetime:
+    if when is None:
+        return datetime.now(timezone.utc)
+    return when if when.tzinfo else when.replace(tzinfo=timezone.utc)
+
+class S3Index:
+    """
+    Every object under `<prefix>/`, by athlete. Thread-safe: the per-athlete
+    jobs in get_fitfiles share one index and add() their uploads to it.
+    """
+
+    def __init__(self, bucket: str, prefix: str, client=None, path: Optional[str] = None):
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/")
+        self.client = client
+        self.path = path
+        self.listed_at = 0.0          # time.time() of the last full listing, 0 = never
+        self.requests = 0             # LIST requests made by this index
+        self._athletes: Dict[str, Dict[str, S3Object]] = {}
+        self._lock = threading.Lock()
+
+    # ── listing ──
+    def _athlete(self, key: str) -> Optional[str]:
+        rest = key[len(self.prefix) + 1:] if key.startswith(self.prefix + "/") else None
+        if not rest or "/" not in rest:
+            return None
+        aid, name = rest.split("/", 1)
+        return aid if aid and name else None
+
+    def refresh(self) -> int:
+        """List the whole prefix again; returns how many objects it holds."""
+        athletes = {}
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix + "/"):
+            self.requests += 1
+            for obj in page.get("Contents", []):
+                key = obj["Key"]
+                aid = self._athlete(key)
+                if aid is None:
+                    continue
+                item = S3Object(key, int(obj.get("Size") or 0), obj.get("ETag"), _aware(obj.get("LastModified")))
+                athletes.setdefault(aid, {})[key] = item
+        count = sum(len(v) for v in athletes.values())
+        with self._lock:
+            self._athletes = athletes
+            self.listed_at = time.time()
+        logger.info("s3 index: %d objects under s3://%s/%s/ (%d LIST requests)",
+                    count, self.bucket, self.prefix, self.requests)
+        self.save()
+        return count
+
+    def fresh(self, max_age: float) -> bool:
+        return self.listed_at > 0 and time.time() - self.listed_at < max_age
+
+    # ── lookups ──
+    def objects(self, aid, suffixes: Iterable[str] = ()) -> List[S3Object]:
+        """The athlete's objects in key order, optionally only keys ending in one of `suffixes` (any case)."""
+        suffixes = tuple(s.lower() for s in suffixes)
+        with self._lock:
+            items = list((self._athletes.get(str(aid)) or {}).values())
+        items.sort(key=lambda o: o.key)
+        if suffixes:
+            items = [o for o in items if o.key.lower().endswith(suffixes)]
+        return items
+
+    def athletes(self) -> List[str]:
+        with self._lock:
+            return sorted(self._athletes)
+
+    def add(self, key: str, etag: Optional[str], size: int, last_modified: Optional[datetime] = None) -> None:
+        """Record an upload this process made, so the index needn't be listed again to see it."""
+        aid = self._athlete(key)
+        if aid is None:
+            return
+        item = S3Object(key, size, etag, _aware(last_modified))
+        with self._lock:
+            self._athletes.setdefault(aid, {})[key] = item
+
+    # ── persistence ──
+    def _state(self) -> dict:
+        with self._lock:
+            objects = [[o.key, o.size, o.etag, o.last_modified.isoformat()]
+                       for items in self._athletes.values() for o in items.values()]
+            return {"bucket": self.bucket, "prefix": self.prefix, "listed_at": self.listed_at,
+                    "objects": objects}
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(self._state(), f)
+            os.replace(tmp, self.path)
+        except OSError as exc:
+            logger.warning("s3 index: could not write %s (%s)", self.path, exc)
+
+    def load(self) -> bool:
+        """Read the saved index, if there is one for this bucket/prefix; True if it was read."""
+        if not self.path:
+            return False
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+            if state.get("bucket") != self.bucket or state.get("prefix") != self.prefix:
+                return False
+            athletes = {}
+            for key, size, etag, modified in state["objects"]:
+                aid = self._athlete(key)
+                if aid is not None:
+                    athletes.setdefault(aid, {})[key] = S3Object(key, size, etag, datetime.fromisoformat(modified))
+            listed_at = float(state["listed_at"])
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            logger.warning("s3 index: ignoring unreadable %s (%s)", self.path, exc)
+            return False
+        with self._lock:
+            self._athletes = athletes
+            self.listed_at = listed_at
+        return True
+
+def index_path(bucket: str, prefix: str, directory: Optional[str] = INDEX_DIR) -> Optional[str]:
+    if not directory:
+        return None
+    digest = hashlib.sha1(f"{bucket}\0{prefix.rstrip('/')}".encode()).hexdigest()[:16]
+    return os.path.join(directory, f"s3-index-{digest}.json")
+
+_indexes: Dict[tuple, S3Index] = {}
+_indexes_lock = threading.Lock()
+
+def load_index(bucket: str, prefix: str, client, max_age: float = None,
+               directory: Optional[str] = INDEX_DIR) -> S3Index:
+    """A new index for bucket/prefix: read from `directory` if saved less than `max_age` seconds ago, else listed."""
+    max_age = INDEX_MAX_AGE if max_age is None else max_age
+    index = S3Index(bucket, prefix, client, index_path(bucket, prefix, directory))
+    index.load()
+    if index.fresh(max_age):
+        logger.info("s3 index: using saved listing of s3://%s/%s/ (%.0fs old)",
+                    bucket, prefix, time.time() - index.listed_at)
+    else:
+        index.refresh()
+    return index
+
+def tenant_index(bucket: str, prefix: str, client, max_age: float = None,
+                 directory: Optional[str] = INDEX_DIR) -> S3Index:
+    """The process's index for bucket/prefix: load_index() on first use, then shared."""
+    with _indexes_lock:
+        index = _indexes.get((bucket, prefix))
+    if index is not None:
+        return index
+    index = load_index(bucket, prefix, client, max_age, directory)
+    with _indexes_lock:
+        return _indexes.setdefault((bucket, prefix), index)
@@ -1,8 +1,8 @@
 # sockets.py
 from flask_socketio import SocketIO, emit, join_room
 from flask_login import current_user
-from flask import current_app, g, session as sock_session
-from db import get_db_connection, tenant_context
+from flask import g, session as sock_session
+from result_buffer import buffer_result_update, clean_result_value, flush_results, on_result_dropped
 
 # Reuse Flask session for Flask-Login
 socketio = SocketIO(logger=True, engineio_logger=True)  # 👈 verbose logs
@@ -47,16 +47,35 @@ def sio_result_update(data):
     if not tenant or piece_id is None or crew_id is None or not field:
         return
 
-    with tenant_context(current_app, tenant):
-        conn = get_db_connection()
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute(f"UPDATE Results SET {field}=%s WHERE Piece_ID=%s AND Crew_ID=%s",
-                               (value, piece_id, crew_id))
-            conn.commit()
-        finally:
-            conn.close()
+    try:
+        stored = clean_result_value(field, value)
+    except ValueError as e:
+        emit("result_error", {"piece_id": piece_id, "crew_id": crew_id, "field": field,
+                              "value": value, "error": str(e)})
+        return
+
+    # Coalesced write-behind (see result_buffer.py); the broadcast below is immediate,
+    # and a write the buffer finally gives up on is reported to the room (see below).
+    if not buffer_result_update(tenant, piece_id, crew_id, field, stored):
+        return
 
     emit("result_updated", {
         "piece_id": piece_id, "crew_id": crew_id, "field": field, "value": value
     }, room=_piece_room(tenant, piece_id), include_self=False)
+
+def _result_dropped(tenant, piece_id, crew_id, field, value, error):
+    socketio.emit("result_error", {
+        "piece_id": piece_id, "crew_id": crew_id, "field": field, "value": value,
+        "error": f"Not saved: {error}"
+    }, room=_piece_room(tenant, piece_id))
+
+on_result_dropped(_result_dropped)
+
+@socketio.on("disconnect")
+def sio_disconnect(*_args):
+    # Don't leave this client's last edits sitting in the buffer. No tenant means
+    # it never joined a piece; flush_results(None) would flush every tenant.
+    tenant = sock_session.get("tenant_key")
+    if not tenant:
+        return
+    flush_results(tenant)
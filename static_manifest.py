@@ -0,0 +1,122 @@
+# static_manifest.py
+"""
+Per-tenant static asset manifest, built once at startup.
+
+For every file under a tenant's static_root we record a content hash, which gives
+a fingerprinted name (style.css -> style.3f9a1c0b2d.css) that url_for() hands out
+and club_static serves with immutable cache headers. Compressible files (CSS, JS,
+SVG, ...) also get gzip and, if the optional `brotli` package is installed, brotli
+variants kept in memory and picked per request from Accept-Encoding.
+"""
+import os
+import gzip
+import hashlib
+import logging
+import mimetypes
+import posixpath
+
+try:
+    import brotli
+except ImportError:  # optional – gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+HASH_LEN = 10
+# Only keep a compressed variant if it saves at least this much.
+MIN_SAVING = 0.10
+COMPRESSIBLE_TYPES = {
+    "application/javascript", "text/javascript", "application/json",
+    "image/svg+xml", "application/xml", "font/ttf", "application/vnd.ms-fontobject",
+}
+
+class StaticAsset:
+    __slots__ = ("filename", "hashed_name", "digest", "mimetype", "size", "variants")
+
+    def __init__(self, filename, hashed_name, digest, mimetype, size, variants):
+        self.filename = filename          # path relative to static_root, '/'-separated
+        self.hashed_name = hashed_name    # fingerprinted filename
+        self.digest = digest
+        self.mimetype = mimetype
+        self.size = size
+        self.variants = variants          # {"br": bytes, "gzip": bytes}
+
+def _is_compressible(mimetype) -> bool:
+    return bool(mimetype) and (mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES)
+
+def _fingerprint(filename: str, digest: str) -> str:
+    name, ext = posixpath.splitext(filename)
+    return f"{name}.{digest[:HASH_LEN]}{ext}"
+
+def _build_variants(data: bytes) -> dict:
+    variants = {}
+    limit = len(data) * (1 - MIN_SAVING)
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < limit:
+            variants["br"] = br
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < limit:
+        variants["gzip"] = gz
+    return variants
+
+def build_tenant_manifest(root: str) -> dict:
+    """Scan one static_root. Returns {"root", "files": {name: asset}, "hashed": {hashed_name: name}}."""
+    files, hashed = {}, {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        for fname in filenames:
+            if fname.startswith("."):
+                continue
+            full = os.path.join(dirpath, fname)
+            rel = os.path.relpath(full, root).replace(os.sep, "/")
+            with open(full, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            mimetype = mimetypes.guess_type(fname)[0] or "application/octet-stream"
+            variants = _build_variants(data) if _is_compressible(mimetype) else {}
+            asset = StaticAsset(rel, _fingerprint(rel, digest), digest, mimetype, len(data), variants)
+            files[rel] = asset
+            hashed[asset.hashed_name] = rel
+    return {"root": root, "files": files, "hashed": hashed}
+
+def build_manifest(tenants: dict, base_dir: str) -> dict:
+    """{tenant_key: tenant manifest} for every tenant with a static_root."""
+    manifest = {}
+    for key, cfg in (tenants or {}).items():
+        root = (cfg or {}).get("static_root", "")
+        if not root:
+            continue
+        if not os.path.isabs(root):
+            root = os.path.join(base_dir, root)
+        root = os.path.abspath(root)
+        if not os.path.isdir(root):
+            logger.warning("static_root for tenant '%s' does not exist: %s", key, root)
+            continue
+        manifest[key] = build_tenant_manifest(root)
+        logger.info("static manifest: %s – %d files, %d precompressed",
+                    key, len(manifest[key]["files"]),
+                    sum(1 for a in manifest[key]["files"].values() if a.variants))
+    return manifest
+
+def hashed_url_name(manifest: dict, tenant_key: str, filename: str) -> str:
+    """Fingerprinted name for url_for(), or filename unchanged if unknown."""
+    tm = manifest.get(tenant_key)
+    asset = tm and tm["files"].get(filename)
+    return asset.hashed_name if asset else filename
+
+def lookup(manifest: dict, tenant_key: str, filename: str):
+    """Return (asset, is_fingerprinted) for a requested name, or (None, False)."""
+    tm = manifest.get(tenant_key)
+    if not tm:
+        return None, False
+    if filename in tm["hashed"]:
+        return tm["files"][tm["hashed"][filename]], True
+    return tm["files"].get(filename), False
+
+def pick_encoding(asset: StaticAsset, accept_encodings):
+    """Best precompressed variant the client accepts (werkzeug Accept object), or None."""
+    for encoding in ("br", "gzip"):
+        if encoding in asset.variants and accept_encodings[encoding]:
+            return encoding
+    return None
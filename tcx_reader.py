@@ -0,0 +1,160 @@
+# tcx_reader.py
+"""
+Streaming TCX reader.
+
+ET.fromstring / ET.parse hold the whole document as Python objects – several
+times the size of the XML, which for a multi-hour Strava or TrainingPeaks
+export (20-50 MB) is hundreds of MB. read_tcx() runs iterparse instead: each
+Trackpoint is read when its end tag arrives and then removed from the tree,
+so memory stays flat apart from the output columns, one double per value:
+
+    data = read_tcx(path_or_file)         # or read_tcx(io.BytesIO(buf))
+    data.t, data.lat, data.lon, data.hr, data.dist    # one entry per Trackpoint
+
+Missing values are NaN. A Trackpoint without a parseable <Time> is dropped;
+a position needs both LatitudeDegrees and LongitudeDegrees. `sport` and
+`start_time` come from the first <Activity> (its Sport attribute and <Id>).
+"""
+import io
+import re
+import xml.etree.ElementTree as ET
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import numpy as np
+
+TCX_NS = "http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2"
+
+_ACTIVITY   = f"{{{TCX_NS}}}Activity"
+_ID         = f"{{{TCX_NS}}}Id"
+_TRACKPOINT = f"{{{TCX_NS}}}Trackpoint"
+_TIME       = f"{{{TCX_NS}}}Time"
+_HR_VALUE   = f"{{{TCX_NS}}}HeartRateBpm/{{{TCX_NS}}}Value"
+_DISTANCE   = f"{{{TCX_NS}}}DistanceMeters"
+_POSITION   = f"{{{TCX_NS}}}Position"
+_LATITUDE   = f"{{{TCX_NS}}}LatitudeDegrees"
+_LONGITUDE  = f"{{{TCX_NS}}}LongitudeDegrees"
+
+# the first Activity's <Id>, namespace prefix or not, for peek_start_time()
+_ACTIVITY_ID = re.compile(rb"<(?:[\w.-]+:)?Activity\b[^>]*>\s*<(?:[\w.-]+:)?Id>\s*([^<\s]+)\s*</", re.S)
+
+NAN = float("nan")
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def tcx_time(node) -> Optional[datetime]:
+    """An ISO-8601 element text as a datetime, or None if absent or unparseable."""
+    if node is None or not node.text:
+        return None
+    try:
+        return datetime.fromisoformat(node.text.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+def peek_start_time(head: bytes) -> Optional[datetime]:
+    """The first Activity's <Id> from the first bytes of a TCX file, or None if they don't reach it."""
+    m = _ACTIVITY_ID.search(head)
+    if m is None:
+        return None
+    try:
+        return datetime.fromisoformat(m.group(1).decode("ascii").replace("Z", "+00:00"))
+    except (UnicodeDecodeError, ValueError):
+        return None
+
+def _epoch(ts: datetime) -> float:
+    return (ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)).timestamp()
+
+class TcxData:
+    """
+    One TCX file's trackpoints as float64 columns (see module docstring).
+    `hr_tz` / `pos_tz` are the timezones of the first heart-rate / position
+    point's timestamp (None if naive or there is none); `t` is epoch seconds,
+    naive timestamps taken as UTC.
+    """
+
+    __slots__ = ("sport", "start_time", "has_activity", "t", "lat", "lon", "hr", "dist",
+                 "hr_tz", "pos_tz")
+
+    def __init__(self, sport, start_time, has_activity, t, lat, lon, hr, dist, hr_tz, pos_tz):
+        self.sport = sport
+        self.start_time = start_time
+        self.has_activity = has_activity
+        self.t = t; self.lat = lat; self.lon = lon; self.hr = hr; self.dist = dist
+        self.hr_tz = hr_tz
+        self.pos_tz = pos_tz
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    def time(self, i: int) -> datetime:
+        """Timestamp of point i in the position timezone (naive UTC if the file's times are naive)."""
+        when = _EPOCH_UTC + timedelta(microseconds=int(round(float(self.t[i]) * 1e6)))
+        return when.replace(tzinfo=None) if self.pos_tz is None else when.astimezone(self.pos_tz)
+
+def _column(values: array) -> np.ndarray:
+    return np.frombuffer(values, dtype=np.float64) if len(values) else np.zeros(0)
+
+def read_tcx(source) -> TcxData:
+    """Stream a TCX file (path, binary file object or bytes) into columns."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+
+    t = array("d"); lat = array("d"); lon = array("d"); hr = array("d"); dist = array("d")
+    sport = start_time = hr_tz = pos_tz = None
+    activity = None
+    activity_id_seen = False
+    hr_seen = pos_seen = False
+    stack = []                      # open elements, so a finished Trackpoint can be unlinked
+
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            if elem.tag == _ACTIVITY and activity is None:
+                activity = elem
+                sport = elem.attrib.get("Sport", "Other")
+            continue
+
+        stack.pop()
+        tag = elem.tag
+        if tag == _ID:
+            if not activity_id_seen and stack and stack[-1] is activity:
+                activity_id_seen = True
+                start_time = tcx_time(elem)
+            continue
+        if tag != _TRACKPOINT:
+            continue
+
+        ts = tcx_time(elem.find(_TIME))
+        if ts is not None:
+            bpm = d = y = x = NAN
+            hr_node = elem.find(_HR_VALUE)
+            if hr_node is not None:
+                bpm = int(hr_node.text)
+                if not hr_seen:
+                    hr_seen = True; hr_tz = ts.tzinfo
+            dist_node = elem.find(_DISTANCE)
+            if dist_node is not None and dist_node.text:
+                try:
+                    d = float(dist_node.text)
+                except ValueError:
+                    pass
+            pos_node = elem.find(_POSITION)
+            if pos_node is not None:
+                lat_node = pos_node.find(_LATITUDE)
+                lon_node = pos_node.find(_LONGITUDE)
+                if lat_node is not None and lon_node is not None:
+                    try:
+                        y, x = float(lat_node.text), float(lon_node.text)
+                    except (TypeError, ValueError):
+                        y = x = NAN
+                    else:
+                        if not pos_seen:
+                            pos_seen = True; pos_tz = ts.tzinfo
+            t.append(_epoch(ts)); lat.append(y); lon.append(x); hr.append(bpm); dist.append(d)
+
+        elem.clear()
+        if stack:
+            stack[-1].remove(elem)
+
+    return TcxData(sport, start_time, activity is not None,
+                   _column(t), _column(lat), _column(lon), _column(hr), _column(dist), hr_tz, pos_tz)
@@ -1,9 +1,11 @@
-import xml.etree.ElementTree as ET
 import csv
 import argparse
 import os
 from math import radians, cos, sin, sqrt, atan2
-from datetime import datetime
+
+import numpy as np
+
+from tcx_reader import read_tcx
 
 def haversine(lat1, lon1, lat2, lon2):
     # Earth radius in meters
@@ -20,32 +22,18 @@ def tcx_to_csv(tcx_file_path):
     
     csv_file_path = os.path.splitext(tcx_file_path)[0] + '.csv'
 
-    namespaces = {
-        'tcx': 'http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2'
-    }
-
-    tree = ET.parse(tcx_file_path)
-    root = tree.getroot()
+    # Streamed, so a multi-hour export never sits in memory as a whole tree
+    data = read_tcx(tcx_file_path)
 
     trackpoints = []
-    for tp in root.findall('.//tcx:Trackpoint', namespaces):
-        time_str = tp.findtext('tcx:Time', default='', namespaces=namespaces)
-        time = datetime.fromisoformat(time_str.replace('Z', '+00:00')) if time_str else None
-
-        pos = tp.find('tcx:Position', namespaces)
-        lat = float(pos.findtext('tcx:LatitudeDegrees', default='nan', namespaces=namespaces)) if pos is not None else None
-        lon = float(pos.findtext('tcx:LongitudeDegrees', default='nan', namespaces=namespaces)) if pos is not None else None
-
-        hr_elem = tp.find('tcx:HeartRateBpm/tcx:Value', namespaces)
-        hr = int(hr_elem.text) if hr_elem is not None else None
-
-        if time and lat is not None and lon is not None:
-            trackpoints.append({
-                'time': time,
-                'lat': lat,
-                'lon': lon,
-                'hr': hr
-            })
+    for i in np.flatnonzero(~np.isnan(data.lat)).tolist():
+        hr = data.hr[i]
+        trackpoints.append({
+            'time': data.time(i),
+            'lat': float(data.lat[i]),
+            'lon': float(data.lon[i]),
+            'hr': None if np.isnan(hr) else int(hr)
+        })
 
     # Calculate distance, pace, and smoothed pace
     total_distance = 0.0
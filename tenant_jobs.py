@@ -0,0 +1,120 @@
+# tenant_jobs.py
+"""
+Run a batch job for several tenants at once.
+
+    from tenant_jobs import run_for_tenants, format_summary
+
+    runs = run_for_tenants(TENANTS.keys(), nightly_job, workers=4)
+    print(format_summary(runs))
+
+Each tenant's job(key) runs on a bounded pool inside its own
+tenant_context(None, key) – threads by default, or processes for CPU-bound work
+(the job must then be a module-level function). A tenant that raises is logged
+and reported as failed; the others carry on.
+
+Inside a tenant's job, map_in_tenant() fans per-athlete work out over that
+tenant's own limit, set in tenants.yaml:
+
+    eubc:
+      jobs:
+        concurrency: 4     # parallel workers within this tenant
+"""
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from bootstrap import TENANTS
+from db import tenant_context, tenant_task, current_tenant_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS            = int(os.getenv("JOB_WORKERS", "4"))
+DEFAULT_TENANT_CONCURRENCY = int(os.getenv("JOB_TENANT_CONCURRENCY", "2"))
+
+class TenantRun:
+    """Outcome of one tenant's job."""
+
+    __slots__ = ("key", "ok", "seconds", "error")
+
+    def __init__(self, key, ok, seconds, error=None):
+        self.key = key
+        self.ok = ok
+        self.seconds = seconds
+        self.error = error
+
+def tenant_concurrency(tenant_key: str) -> int:
+    """Max parallel workers within one tenant (tenants.yaml jobs.concurrency)."""
+    jobs = (TENANTS.get(tenant_key) or {}).get("jobs") or {}
+    try:
+        return max(1, int(jobs.get("concurrency", DEFAULT_TENANT_CONCURRENCY)))
+    except (TypeError, ValueError):
+        return DEFAULT_TENANT_CONCURRENCY
+
+def _run_tenant(job, tenant_key: str) -> TenantRun:
+    start = time.perf_counter()
+    try:
+        with tenant_context(None, tenant_key):
+            job(tenant_key)
+    except (Exception, SystemExit) as exc:
+        logger.exception("tenant '%s': job failed", tenant_key)
+        return TenantRun(tenant_key, False, time.perf_counter() - start, f"{type(exc).__name__}: {exc}")
+    return TenantRun(tenant_key, True, time.perf_counter() - start)
+
+def run_for_tenants(keys, job, workers: int = None, processes: bool = False) -> list:
+    """Run job(key) for every tenant key, at most `workers` at a time. Returns [TenantRun]."""
+    keys = list(keys)
+    workers = max(1, min(workers or DEFAULT_WORKERS, len(keys) or 1))
+    if workers == 1:
+        return [_run_tenant(job, key) for key in keys]
+
+    executor_cls = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    runs = {}
+    with executor_cls(max_workers=workers) as pool:
+        futures = {pool.submit(_run_tenant, job, key): key for key in keys}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                runs[key] = future.result()
+            except Exception as exc:       # e.g. a worker process died
+                logger.error("tenant '%s': worker failed: %s", key, exc)
+                runs[key] = TenantRun(key, False, 0.0, f"{type(exc).__name__}: {exc}")
+    return [runs[key] for key in keys]
+
+def map_in_tenant(fn, items, limit: int = None) -> int:
+    """
+    Call fn(item) for each item on up to `limit` threads (default: the active
+    tenant's concurrency), each with the tenant bound. Failures are logged and
+    skipped; returns how many items failed.
+    """
+    items = list(items)
+    limit = limit or tenant_concurrency(current_tenant_key())
+    task = tenant_task(fn)
+    failed = 0
+    if limit == 1 or len(items) <= 1:
+        for item in items:
+            try:
+                task(item)
+            except Exception:
+                logger.exception("worker failed for %r", item)
+                failed += 1
+        return failed
+
+    with ThreadPoolExecutor(max_workers=limit) as pool:
+        futures = {pool.submit(task, item): item for item in items}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception:
+                logger.exception("worker failed for %r", futures[future])
+                failed += 1
+    return failed
+
+def format_summary(runs, title: str = "Tenant summary") -> str:
+    lines = [f"{title}:"]
+    for run in runs:
+        status = "ok" if run.ok else f"FAILED ({run.error})"
+        lines.append(f"  {run.key:<12} {run.seconds:>8.1f}s  {status}")
+    lines.append(f"  {len([r for r in runs if r.ok])}/{len(runs)} tenants succeeded, "
+                 f"{sum(r.seconds for r in runs):.1f}s of tenant time")
+    return "\n".join(lines)
@@ -0,0 +1,120 @@
+# track.py
+"""
+Columnar GPS track shared by the FIT/TCX/GPX parsers.
+
+A Track holds one float64 array per column instead of a dict of datetime /
+timedelta objects per point:
+
+    t         epoch seconds
+    lat, lon  degrees
+    dist      metres from the previous point (0 for the first)
+    cum       cumulative metres
+    pace      seconds per 500 m over the last segment
+    smoothed  seconds per 500 m over the last `smooth_points` segments
+
+Distance (haversine) and the rolling pace are computed vectorised, with the
+same conventions the per-point loop had: a zero-length segment counts as
+0.00001 m, the first point gets 10:00 / 1:00:00 pace, and points before the
+smoothing window use their own segment pace.
+"""
+from array import array
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+EARTH_RADIUS_M  = 6371000
+SMOOTH_POINTS   = 4
+MIN_SEGMENT_M   = 0.00001
+FIRST_PACE_S    = 600.0      # 10:00 /500m
+FIRST_SMOOTH_S  = 3600.0     # 1:00:00 /500m
+
+def segment_distances(lat, lon) -> np.ndarray:
+    """Haversine metres between consecutive points; element 0 is 0."""
+    lat = np.radians(lat); lon = np.radians(lon)
+    dist = np.zeros(len(lat))
+    if len(lat) > 1:
+        dlat = lat[1:] - lat[:-1]
+        dlon = lon[1:] - lon[:-1]
+        a = np.sin(dlat / 2)**2 + np.cos(lat[1:]) * np.cos(lat[:-1]) * np.sin(dlon / 2)**2
+        seg = EARTH_RADIUS_M * (2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a)))
+        seg[seg == 0] = MIN_SEGMENT_M
+        dist[1:] = seg
+    return dist
+
+def rolling_pace(t, dist, cum, smooth_points: int = SMOOTH_POINTS):
+    """(pace, smoothed) in seconds per 500 m."""
+    n = len(t)
+    pace = np.full(n, FIRST_PACE_S)
+    smoothed = np.full(n, FIRST_SMOOTH_S)
+    if n > 1:
+        pace[1:] = (t[1:] - t[:-1]) * 500 / dist[1:]
+        k = max(1, int(smooth_points))
+        head = min(k, n)
+        smoothed[1:head] = pace[1:head]
+        if n > k:
+            smoothed[k:] = (t[k:] - t[:-k]) * 500 / (cum[k:] - cum[:-k])
+    return pace, smoothed
+
+class Track:
+    """One activity's GPS points as columns (see module docstring)."""
+
+    __slots__ = ("t", "lat", "lon", "dist", "cum", "pace", "smoothed", "tz", "_t_us")
+
+    def __init__(self, t, lat, lon, tz=timezone.utc, smooth_points: int = SMOOTH_POINTS):
+        self.t   = np.asarray(t, dtype=np.float64)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.tz  = tz                 # for turning t back into datetimes; None = naive local
+        self.dist = segment_distances(self.lat, self.lon)
+        self.cum  = np.cumsum(self.dist)
+        self.pace, self.smoothed = rolling_pace(self.t, self.dist, self.cum, smooth_points)
+        self._t_us = None
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    @property
+    def t_us(self) -> np.ndarray:
+        """Whole microseconds since the first point (exact for µs-resolution input)."""
+        if self._t_us is None:
+            self._t_us = np.rint((self.t - self.t[0]) * 1e6).astype(np.int64) if len(self.t) else \
+                         np.zeros(0, dtype=np.int64)
+        return self._t_us
+
+    def time(self, i: int) -> datetime:
+        """Timestamp of point i, in the timezone the source file used."""
+        if self.tz is None:
+            return datetime.fromtimestamp(float(self.t[i]))
+        return datetime.fromtimestamp(0, self.tz) + timedelta(microseconds=int(round(self.t[i] * 1e6)))
+
+    def elapsed(self, i: int, j: int) -> timedelta:
+        return timedelta(microseconds=int(self.t_us[j] - self.t_us[i]))
+
+    def nbytes(self) -> int:
+        return sum(getattr(self, col).nbytes for col in ("t", "lat", "lon", "dist", "cum", "pace", "smoothed"))
+
+class TrackBuilder:
+    """
+    Append points while parsing, then build() the Track; only three flat double
+    arrays are kept meanwhile. Naive timestamps are taken to be in `naive_tz`
+    (UTC for FIT files), or local time if naive_tz is None.
+    """
+
+    def __init__(self, naive_tz=timezone.utc):
+        self.naive_tz = naive_tz
+        self.tz = None
+        self.t = array("d"); self.lat = array("d"); self.lon = array("d")
+
+    def add(self, when: datetime, lat: float, lon: float) -> None:
+        if when.tzinfo is None and self.naive_tz is not None:
+            when = when.replace(tzinfo=self.naive_tz)
+        if not self.t:
+            self.tz = when.tzinfo
+        self.t.append(when.timestamp()); self.lat.append(lat); self.lon.append(lon)
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    def build(self, smooth_points: int = SMOOTH_POINTS) -> Track:
+        return Track(np.frombuffer(self.t), np.frombuffer(self.lat), np.frombuffer(self.lon),
+                     tz=self.tz, smooth_points=smooth_points)